@@ -0,0 +1,180 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+
+
+class OverloadedError(Exception):
+    """
+    Levée lorsqu'une requête ne peut pas être admise ; retry_after indique quand réessayer.
+    """
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Limite le nombre de traitements coûteux exécutés simultanément dans un worker.
+
+    Au-delà de max_concurrent, une requête attend son tour dans une file bornée
+    à max_waiting places, au plus wait_timeout secondes ; si la file est pleine
+    ou le délai écoulé, elle est refusée immédiatement au lieu d'occuper un
+    thread du serveur, qui reste disponible pour les requêtes légères.
+    """
+
+    def __init__(self, max_concurrent, max_waiting=0, wait_timeout=0.0):
+        """
+        Initialise le limiteur.
+
+        Args:
+            max_concurrent (int): Nombre maximum de traitements simultanés
+            max_waiting (int): Nombre maximum de requêtes en attente d'une place
+            wait_timeout (float): Attente maximale d'une place en secondes
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self.wait_timeout = wait_timeout
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        # Durée moyenne (moyenne mobile exponentielle) d'un traitement, pour estimer Retry-After
+        self._average_duration = 1.0
+        self._counters = {"admitted": 0, "rejected": 0, "timed_out": 0}
+
+    def retry_after(self):
+        """
+        Estime en secondes le délai avant qu'une place se libère.
+        """
+        with self._condition:
+            return self._retry_after()
+
+    def _retry_after(self):
+        backlog = self._waiting + 1
+        return max(1, math.ceil(self._average_duration * backlog / self.max_concurrent))
+
+    def acquire(self):
+        """
+        Réserve une place, en attendant dans la file si elle n'est pas pleine.
+
+        Returns:
+            float: Instant de l'admission, à transmettre à release
+
+        Raises:
+            OverloadedError: Si la file d'attente est pleine ou l'attente trop longue
+        """
+        with self._condition:
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_waiting:
+                    self._counters["rejected"] += 1
+                    raise OverloadedError("Service momentanément surchargé", self._retry_after())
+
+                self._waiting += 1
+                deadline = time.monotonic() + self.wait_timeout
+                try:
+                    while self._active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._counters["timed_out"] += 1
+                            raise OverloadedError("Délai d'attente dépassé, service surchargé", self._retry_after())
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._active += 1
+            self._counters["admitted"] += 1
+        return time.monotonic()
+
+    def release(self, admitted_at=None):
+        """
+        Libère une place et réveille la plus ancienne requête en attente.
+
+        Args:
+            admitted_at (float): Valeur retournée par acquire, pour mesurer la durée du traitement
+        """
+        with self._condition:
+            self._active -= 1
+            if admitted_at is not None:
+                duration = time.monotonic() - admitted_at
+                self._average_duration = 0.8 * self._average_duration + 0.2 * duration
+            self._condition.notify()
+
+    def stats(self):
+        """
+        Retourne l'occupation et les compteurs du limiteur.
+        """
+        with self._condition:
+            stats = dict(self._counters)
+            stats.update({
+                "active": self._active,
+                "waiting": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_waiting": self.max_waiting,
+                "average_duration_seconds": round(self._average_duration, 3)
+            })
+        return stats
+
+
+class TokenBucketLimiter:
+    """
+    Limitation du débit par client avec un seau à jetons en mémoire locale.
+
+    Chaque client dispose de burst jetons, regagnés au rythme de rate jetons
+    par seconde ; une requête consomme un jeton. Les seaux sont conservés dans
+    un dictionnaire LRU borné : un client inactif évincé repart avec un seau
+    plein, ce qu'il aurait de toute façon retrouvé entre-temps.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        """
+        Initialise le limiteur.
+
+        Args:
+            rate (float): Jetons regagnés par seconde
+            burst (int): Capacité du seau (nombre de requêtes consécutives autorisées)
+            max_clients (int): Nombre maximum de clients suivis
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    def acquire(self, client, cost=1):
+        """
+        Consomme des jetons du seau d'un client.
+
+        Args:
+            client (str): Identifiant du client (adresse IP)
+            cost (float): Nombre de jetons consommés
+
+        Returns:
+            tuple: (requête autorisée, délai avant de réessayer en secondes)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            else:
+                self._rejected += 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+
+        if allowed:
+            return True, 0
+        retry_after = math.ceil((cost - tokens) / self.rate) if self.rate > 0 else 60
+        return False, max(1, retry_after)
+
+    def stats(self):
+        """
+        Retourne le nombre de clients suivis et de requêtes refusées.
+        """
+        with self._lock:
+            return {"clients": len(self._buckets), "rejected": self._rejected,
+                    "rate_per_second": self.rate, "burst": self.burst}
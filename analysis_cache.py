@@ -0,0 +1,250 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# Version du format des entrées : l'incrémenter invalide tout le cache
+CACHE_VERSION = 2
+
+
+class AnalysisCache:
+    """
+    Cache à deux niveaux pour l'analyse des descriptions de poste.
+
+    Le premier niveau est un LRU en mémoire propre à chaque processus, avec
+    éviction par taille et par durée de vie. Le second niveau est une base
+    SQLite partagée sur disque, qui permet aux workers gunicorn de réutiliser
+    les résultats calculés par les autres.
+    """
+
+    def __init__(self, db_path=None, max_entries=256, ttl_seconds=3600, max_disk_entries=10000):
+        """
+        Initialise le cache.
+
+        Args:
+            db_path (str): Chemin de la base SQLite partagée (None pour désactiver le niveau disque)
+            max_entries (int): Nombre maximum d'entrées en mémoire
+            ttl_seconds (int): Durée de vie des entrées en secondes
+            max_disk_entries (int): Nombre maximum d'entrées sur disque
+        """
+        self.logger = logging.getLogger('analysis_cache')
+        self.db_path = str(db_path) if db_path else None
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes_since_purge = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "expirations": 0
+        }
+
+        if self.db_path:
+            # Connexion dédiée à l'initialisation : les connexions de travail sont ouvertes par thread
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            try:
+                with conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                        "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_expires ON analysis_cache(expires_at)")
+            finally:
+                conn.close()
+
+    @staticmethod
+    def normalize(job_description):
+        """
+        Normalise une description de poste pour le calcul de la clé.
+
+        Args:
+            job_description (str): Description du poste
+
+        Returns:
+            str: Texte normalisé (Unicode NFC, fins de ligne et espaces de fin uniformisés)
+        """
+        text = unicodedata.normalize('NFC', job_description).replace('\r\n', '\n').replace('\r', '\n')
+        return '\n'.join(line.rstrip() for line in text.split('\n')).strip()
+
+    def make_key(self, namespace, job_description):
+        """
+        Calcule la clé de cache d'une description de poste.
+
+        Args:
+            namespace (str): Type de résultat mis en cache (ex: "keywords")
+            job_description (str): Description du poste
+
+        Returns:
+            str: Empreinte SHA-256 hexadécimale
+        """
+        digest = hashlib.sha256(f"{CACHE_VERSION}:{namespace}:".encode('utf-8'))
+        digest.update(self.normalize(job_description).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_or_compute(self, namespace, job_description, compute):
+        """
+        Retourne le résultat en cache ou le calcule puis le stocke.
+
+        Args:
+            namespace (str): Type de résultat mis en cache
+            job_description (str): Description du poste
+            compute (callable): Fonction sans argument calculant le résultat
+
+        Returns:
+            object: Résultat sérialisable en JSON
+        """
+        key = self.make_key(namespace, job_description)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def get(self, key):
+        """
+        Recherche une entrée, d'abord en mémoire puis sur disque.
+
+        Args:
+            key (str): Clé de cache
+
+        Returns:
+            object: Valeur trouvée ou None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return json.loads(payload)
+                del self._memory[key]
+                self._counters["expirations"] += 1
+
+        if self.db_path:
+            try:
+                with self._connection() as conn:
+                    row = conn.execute(
+                        "SELECT value, expires_at FROM analysis_cache WHERE key = ?", (key,)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Lecture du cache disque impossible: {str(e)}")
+                row = None
+            if row is not None and row[1] > now:
+                with self._lock:
+                    self._counters["disk_hits"] += 1
+                    self._store_in_memory(key, row[0], row[1])
+                return json.loads(row[0])
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        """
+        Stocke une entrée dans les deux niveaux du cache.
+
+        Args:
+            key (str): Clé de cache
+            value (object): Valeur sérialisable en JSON
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store_in_memory(key, payload, expires_at)
+            self._writes_since_purge += 1
+            purge = self._writes_since_purge >= 100
+            if purge:
+                self._writes_since_purge = 0
+
+        if self.db_path:
+            try:
+                with self._connection() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO analysis_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, payload, expires_at)
+                    )
+                if purge:
+                    self.purge_disk()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Écriture du cache disque impossible: {str(e)}")
+
+    def purge_disk(self):
+        """
+        Supprime les entrées expirées du disque et applique la limite de taille.
+
+        Returns:
+            int: Nombre d'entrées supprimées
+        """
+        if not self.db_path:
+            return 0
+        with self._connection() as conn:
+            expired = conn.execute("DELETE FROM analysis_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            overflow = conn.execute(
+                "DELETE FROM analysis_cache WHERE key IN ("
+                "SELECT key FROM analysis_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,)
+            ).rowcount
+        with self._lock:
+            self._counters["expirations"] += expired
+            self._counters["disk_evictions"] += overflow
+        return expired + overflow
+
+    def clear(self):
+        """
+        Vide les deux niveaux du cache.
+        """
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM analysis_cache")
+
+    def stats(self):
+        """
+        Retourne les compteurs du cache.
+
+        Returns:
+            dict: Compteurs de succès, d'échecs et d'évictions, et taille courante
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _store_in_memory(self, key, payload, expires_at):
+        """
+        Insère une entrée dans le LRU mémoire (le verrou doit être détenu).
+        """
+        self._memory[key] = (expires_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["memory_evictions"] += 1
+
+    def _connection(self):
+        """
+        Retourne la connexion SQLite du thread courant.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
@@ -1,12 +1,30 @@
 import os
+import json
 import uuid
+import zipfile
+import time
 import logging
-from docx import Document
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify, session
-from flask_session import Session
+import mimetypes
+import functools
+from io import BytesIO
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, send_file, jsonify, session, g, abort, stream_with_context
+from urllib.parse import quote
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 from cv_processor import CVProcessor
-from storage_manager import StorageManager
+from document_guard import DocumentGuard, DocumentRejectedError, SandboxPool
+from storage_manager import StorageManager, StorageJanitor
+from analysis_cache import AnalysisCache
+from parsed_cv_cache import ParsedCVCache
+from cv_ranking import CVRanker
+from inverted_index import InvertedIndex, QuerySyntaxError
+from job_queue import JobQueue, QueueFullError, KIND_BATCH, STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED
+from batch_processor import BatchProcessor
+from bulk_analysis import BulkAnalyzer, BulkInputError, iter_ndjson, iter_json_array
+from upload_buffer import SpooledUpload, UploadRejectedError
+from admission import ConcurrencyLimiter, TokenBucketLimiter, OverloadedError
+from session_store import ServerSideSessionInterface, MemorySessionStore, SqliteSessionStore
+import metrics
 
 # Configuration du logging
 logging.basicConfig(
@@ -23,20 +41,31 @@ logger.info(f"Gestionnaire de stockage initialisé. Environnement Render: {stora
 UPLOAD_FOLDER = str(storage_manager.get_upload_path())
 DOWNLOAD_FOLDER = str(storage_manager.get_download_path())
 
+# Durée de conservation des fichiers téléchargés et générés
+FILE_TTL_HOURS = int(os.environ.get('FILE_TTL_HOURS', 24))
+
 # Configuration de l'application
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'votre_cle_secrete_ici')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max
-app.config['SESSION_TYPE'] = 'filesystem'
 app.config['PERMANENT_SESSION_LIFETIME'] = 1800  # 30 minutes
-app.config['SESSION_FILE_DIR'] = UPLOAD_FOLDER
-app.config['SESSION_FILE_THRESHOLD'] = 100
-app.config['SESSION_FILE_MODE'] = 0o600
+app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'sqlite')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['DOWNLOAD_FOLDER'] = DOWNLOAD_FOLDER
+# Envoi des fichiers délégué au serveur frontal : X-Sendfile (Apache, lighttpd) ou X-Accel-Redirect (nginx)
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+
+# Durée de mise en cache des fichiers produits par le navigateur
+DOWNLOAD_MAX_AGE = FILE_TTL_HOURS * 3600
 
-# Initialisation de Flask-Session
-Session(app)
+# Sessions côté serveur dans un stockage dédié, hors du dossier des téléchargements.
+# Elles ne contiennent qu'une référence vers la tâche d'adaptation.
+if app.config['SESSION_BACKEND'] == 'memory':
+    session_store = MemorySessionStore()
+else:
+    session_store = SqliteSessionStore(storage_manager.get_state_path() / 'sessions.sqlite')
+app.session_interface = ServerSideSessionInterface(session_store)
 
 # Extensions autorisées
 ALLOWED_EXTENSIONS = {'docx', 'pdf'}
@@ -44,44 +73,236 @@ ALLOWED_EXTENSIONS = {'docx', 'pdf'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Cache des analyses de descriptions de poste, partagé entre les workers via SQLite
+analysis_cache = AnalysisCache(
+    db_path=storage_manager.get_state_path() / 'analysis_cache.sqlite',
+    max_entries=int(os.environ.get('ANALYSIS_CACHE_SIZE', 256)),
+    ttl_seconds=int(os.environ.get('ANALYSIS_CACHE_TTL', 3600))
+)
+
+# Cache des CV analysés, pour adapter un même CV à plusieurs offres sans le réanalyser
+parsed_cv_cache = ParsedCVCache(
+    storage_manager.get_state_path() / 'parsed_cv',
+    max_bytes=int(os.environ.get('PARSED_CV_CACHE_MB', 256)) * 1024 * 1024
+)
+
+# Limites de ressources des documents non fiables, vérifiées avant leur analyse
+document_guard = DocumentGuard(
+    max_uncompressed_bytes=int(os.environ.get('DOCUMENT_MAX_UNCOMPRESSED_MB', 100)) * 1024 * 1024,
+    max_parts=int(os.environ.get('DOCUMENT_MAX_PARTS', 1000)),
+    max_pages=int(os.environ.get('DOCUMENT_MAX_PAGES', 100))
+)
+
+# Analyse des documents dans des processus isolés sous budget mémoire (désactivée avec 0)
+DOCUMENT_MEMORY_LIMIT_MB = int(os.environ.get('DOCUMENT_MEMORY_LIMIT_MB', 1024))
+document_sandbox = None
+if DOCUMENT_MEMORY_LIMIT_MB > 0:
+    document_sandbox = SandboxPool(
+        memory_limit_mb=DOCUMENT_MEMORY_LIMIT_MB,
+        max_workers=int(os.environ.get('DOCUMENT_WORKERS', 2)),
+        timeout=int(os.environ.get('DOCUMENT_TIMEOUT_SECONDS', 120))
+    )
+
 # Initialisation du processeur de CV
-cv_processor = CVProcessor(UPLOAD_FOLDER, DOWNLOAD_FOLDER)
+cv_processor = CVProcessor(
+    UPLOAD_FOLDER, DOWNLOAD_FOLDER,
+    cache=analysis_cache,
+    storage=storage_manager,
+    artifact_ttl_hours=int(os.environ.get('ARTIFACT_TTL_HOURS', FILE_TTL_HOURS)),
+    parsed_cache=parsed_cv_cache,
+    guard=document_guard,
+    sandbox=document_sandbox
+)
+
+# Classement des CV stockés par adéquation à une offre, avec le même analyseur lexical
+cv_ranker = CVRanker(storage_manager.get_state_path() / 'cv_ranking.sqlite', lexer=cv_processor.lexer)
+RANK_MAX_RESULTS = int(os.environ.get('RANK_MAX_RESULTS', 100))
+
+def index_stored_cv(cv_path, original_filename=None):
+    """Ajoute un CV stocké au corpus classé ; son analyse est reprise du cache des CV analysés"""
+    cv_ranker.add(os.path.basename(cv_path), cv_processor.extract_text(cv_path), name=original_filename)
+
+# Index inversé persistant des CV stockés, pour la recherche booléenne par mots-clés
+search_index = InvertedIndex(
+    storage_manager.get_state_path() / 'search_index',
+    extract_text=cv_processor.extract_text,
+    flush_every=int(os.environ.get('SEARCH_FLUSH_EVERY', 100)),
+    max_segments=int(os.environ.get('SEARCH_MAX_SEGMENTS', 8))
+)
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 100))
+
+def queue_stored_cv(path, upload):
+    """Met en file d'indexation un CV persisté ; son texte est extrait en arrière-plan"""
+    search_index.submit(path.name, path, upload.filename)
+
+def forget_deleted_cvs(paths):
+    """Retire du corpus classé et de l'index de recherche les CV supprimés par le nettoyage du stockage"""
+    for path in paths:
+        cv_ranker.remove(path.name)
+        search_index.remove(path.name)
+
+storage_manager.add_store_listener(queue_stored_cv)
+storage_manager.add_deletion_listener(forget_deleted_cvs)
+
+# Adaptation par lots répartie sur un pool de processus
+batch_processor = BatchProcessor(
+    cv_processor,
+    max_workers=int(os.environ.get('BATCH_WORKERS', 0)) or None,
+    max_files=int(os.environ.get('BATCH_MAX_FILES', 500)),
+    max_total_size=int(os.environ.get('BATCH_MAX_TOTAL_MB', 256)) * 1024 * 1024,
+    memory_limit_mb=DOCUMENT_MEMORY_LIMIT_MB or None
+)
+
+def store_batch_result(archive_path, result):
+    """Soumet l'archive produite par un lot au nettoyage du stockage et supprime les CV du lot"""
+    storage_manager.register_file(os.path.join(cv_processor.download_folder, result["filename"]), FILE_TTL_HOURS)
+    os.remove(archive_path)
+
+# File de tâches d'adaptation exécutées en arrière-plan, persistée dans SQLite
+job_queue = JobQueue(
+    db_path=storage_manager.get_state_path() / 'jobs.sqlite',
+    processor=cv_processor,
+    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('JOB_QUEUE_MAX_PENDING', 100)),
+    on_done=index_stored_cv,
+    batch_processor=batch_processor,
+    on_batch_done=store_batch_result
+)
+
+# Analyse en masse des descriptions de poste, diffusée en NDJSON au fil des résultats
+BULK_WORKERS = int(os.environ.get('BULK_WORKERS', 0)) or min(4, os.cpu_count() or 1)
+bulk_analyzer = BulkAnalyzer(
+    cv_processor,
+    max_workers=BULK_WORKERS,
+    max_in_flight=int(os.environ.get('BULK_MAX_IN_FLIGHT', 0)) or 2 * BULK_WORKERS
+)
+
+# Nettoyage périodique du stockage par un seul janitor élu entre les workers
+storage_janitor = StorageJanitor(
+    storage_manager,
+    interval_seconds=int(os.environ.get('CLEANUP_INTERVAL_SECONDS', 3600)),
+    max_age_hours=FILE_TTL_HOURS
+)
+
+# Valeurs publiées par chaque worker gunicorn, additionnées à la collecte de /metrics (hook post_fork)
+METRICS_DIR = storage_manager.get_state_path() / 'metrics'
+
+def start_background_services():
+    """
+    Démarre les threads de la file de tâches, du janitor et de l'index de recherche dans le processus courant.
+    
+    Les threads ne survivent pas à un fork : avec `gunicorn --preload`, l'application est
+    chargée une seule fois dans le processus maître et ce démarrage est différé dans chaque
+    worker (hook post_fork de gunicorn.conf.py).
+    """
+    job_queue.start()
+    storage_janitor.start()
+    search_index.start()
+
+if not os.environ.get('CV_ANALYZER_DEFER_BACKGROUND'):
+    start_background_services()
+
+# Contrôle d'admission propre à chaque worker : les adaptations synchrones disposent d'un nombre
+# borné de threads et d'une file d'attente bornée, les autres threads restent aux requêtes légères
+adaptation_limiter = ConcurrencyLimiter(
+    max_concurrent=int(os.environ.get('ADAPT_MAX_CONCURRENT', 2)),
+    max_waiting=int(os.environ.get('ADAPT_MAX_WAITING', 4)),
+    wait_timeout=float(os.environ.get('ADAPT_WAIT_TIMEOUT', 5))
+)
+
+# Limitation du débit des soumissions de CV par client (seau à jetons en mémoire locale)
+client_rate_limiter = TokenBucketLimiter(
+    rate=float(os.environ.get('RATE_LIMIT_PER_MINUTE', 30)) / 60,
+    burst=int(os.environ.get('RATE_LIMIT_BURST', 10))
+)
+RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', '').lower() in ('1', 'true', 'yes')
+
+def client_key():
+    """Identifie le client : adresse d'origine transmise par le proxy frontal si elle est de confiance"""
+    if RATE_LIMIT_TRUST_PROXY and request.access_route:
+        # Seule la dernière adresse de X-Forwarded-For est ajoutée par le proxy ;
+        # les précédentes sont fournies par le client et peuvent être falsifiées
+        return request.access_route[-1]
+    return request.remote_addr or 'inconnu'
+
+def admission_controlled(limiter=None):
+    """
+    Soumet une vue à la limitation du débit par client (429) puis, si un limiteur est
+    fourni, à sa limite de concurrence (503) ; les refus sont immédiats et indiquent Retry-After.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            allowed, retry_after = client_rate_limiter.acquire(client_key())
+            if not allowed:
+                metrics.REQUESTS_REJECTED.inc(reason="rate_limit")
+                logger.warning(f"Débit maximal atteint pour le client {client_key()}")
+                return jsonify({"error": "Trop de requêtes, veuillez réessayer plus tard"}), 429, {"Retry-After": str(retry_after)}
+            if limiter is None:
+                return view(*args, **kwargs)
+            
+            try:
+                admitted_at = limiter.acquire()
+            except OverloadedError as e:
+                metrics.REQUESTS_REJECTED.inc(reason="overloaded")
+                logger.warning(f"Requête refusée: {str(e)}")
+                return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+            try:
+                return view(*args, **kwargs)
+            finally:
+                limiter.release(admitted_at)
+        return wrapper
+    return decorator
+
+# Métriques instantanées, relevées au moment de la collecte
+JOBS_GAUGE = metrics.REGISTRY.gauge("cv_analyzer_jobs", "Nombre de tâches d'adaptation par état", ("status",))
+CACHE_ENTRIES_GAUGE = metrics.REGISTRY.gauge("cv_analyzer_analysis_cache_entries", "Nombre d'entrées du cache mémoire des analyses")
+UPTIME_GAUGE = metrics.REGISTRY.gauge("cv_analyzer_uptime_seconds", "Durée écoulée depuis le démarrage du processus")
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def log_request_timing(response):
+    """Journalise la durée de chaque requête et alimente l'histogramme des latences"""
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    duration = time.perf_counter() - start
+    metrics.HTTP_REQUEST_DURATION.observe(
+        duration,
+        method=request.method,
+        endpoint=request.endpoint or 'inconnu',
+        status=response.status_code
+    )
+    response.headers['X-Response-Time-Ms'] = f"{duration * 1000:.1f}"
+    logger.info(f"{request.method} {request.path} {response.status_code} {duration * 1000:.1f}ms")
+    return response
 
-# Nettoyage périodique des fichiers anciens
-# Utilisation d'un hook d'initialisation compatible avec les versions récentes de Flask
 @app.route('/cleanup', methods=['POST'])
 def cleanup_files():
-    """Endpoint pour nettoyer les fichiers anciens (protégé par clé d'API)"""
+    """Endpoint pour nettoyer les fichiers expirés (protégé par clé d'API)"""
     api_key = request.headers.get('X-API-Key')
     if not api_key or api_key != os.environ.get('CLEANUP_API_KEY', 'secret_cleanup_key'):
         return jsonify({"error": "Non autorisé"}), 401
     
+    # Le parcours complet des répertoires n'est utile que pour les fichiers antérieurs à l'index
+    full_scan = request.args.get('full_scan', '').lower() in ('1', 'true', 'yes')
     try:
-        deleted_count = storage_manager.cleanup_old_files(max_age_hours=24)
+        deleted_count = storage_manager.cleanup_old_files(max_age_hours=FILE_TTL_HOURS, full_scan=full_scan)
         logger.info(f"Nettoyage manuel: {deleted_count} fichiers supprimés")
         return jsonify({"success": True, "deleted_count": deleted_count})
     except Exception as e:
         logger.error(f"Erreur lors du nettoyage: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-# Fonction pour le nettoyage initial, appelée au démarrage
-def cleanup_on_startup():
-    """Nettoie les fichiers anciens au démarrage de l'application"""
-    logger.info("Nettoyage initial des fichiers anciens")
-    try:
-        deleted_count = storage_manager.cleanup_old_files(max_age_hours=24)
-        logger.info(f"Nettoyage initial: {deleted_count} fichiers supprimés")
-    except Exception as e:
-        logger.error(f"Erreur lors du nettoyage initial: {str(e)}")
-
-# Exécuter le nettoyage initial
-cleanup_on_startup()
-
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/upload', methods=['POST'])
+@admission_controlled()
 def upload_file():
     logger.info("Début du traitement d'une demande d'adaptation de CV")
     
@@ -120,46 +341,250 @@ def upload_file():
         return redirect(request.url)
     
     try:
-        # Sécuriser le nom du fichier
-        filename = secure_filename(file.filename)
-        logger.info(f"Traitement du fichier: {filename}")
-        
-        # Générer un nom unique pour éviter les collisions
-        unique_filename = f"{uuid.uuid4().hex}_{filename}"
-        
-        # Chemin complet du fichier
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        # Sauvegarder le fichier et créer la tâche d'adaptation
+        job_id = _enqueue_upload(file, job_description)
+        session['job_id'] = job_id
         
-        # Sauvegarder le fichier
-        file.save(filepath)
-        logger.info(f"Fichier sauvegardé: {filepath}")
-        
-        # Adapter le CV
-        result = cv_processor.adapt_cv(filepath, job_description)
-        
-        # Stocker les statistiques dans la session pour affichage
-        if isinstance(result, dict) and 'stats' in result:
-            session['stats'] = result['stats']
-            session['keywords'] = result.get('keywords', {})
-        
-        # Rediriger vers la page de téléchargement
-        logger.info(f"CV adapté avec succès: {result['filename']}")
-        return redirect(url_for('download_file', filename=result['filename']))
+        # Rediriger vers la page de suivi de la tâche
+        return redirect(url_for('job_status', job_id=job_id))
+    
+    except UploadRejectedError as e:
+        logger.warning(f"Fichier refusé: {str(e)}")
+        flash(f'Fichier refusé: {str(e)}', 'error')
+        return redirect(request.url)
+    
+    except QueueFullError as e:
+        logger.warning(f"Demande refusée: {str(e)}")
+        flash('Le service est momentanément surchargé. Veuillez réessayer dans quelques instants', 'error')
+        return redirect(request.url)
     
     except Exception as e:
         logger.error(f"Erreur lors du traitement du fichier: {str(e)}")
         flash(f'Erreur lors du traitement du fichier: {str(e)}', 'error')
         return redirect(request.url)
 
+def _enqueue_upload(file, job_description):
+    """Valide un CV téléchargé, le persiste et ajoute sa tâche d'adaptation à la file"""
+    # Sécuriser le nom du fichier
+    filename = secure_filename(file.filename)
+    logger.info(f"Traitement du fichier: {filename}")
+    
+    # Générer un nom unique pour éviter les collisions
+    unique_filename = f"{uuid.uuid4().hex}_{filename}"
+    
+    # Chemin complet du fichier
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+    
+    # Réception bornée, hachée et validée, puis persistance pour la file de tâches
+    with SpooledUpload.from_file_storage(file, app.config['MAX_CONTENT_LENGTH']) as upload:
+        storage_manager.save_upload(upload, filepath, FILE_TTL_HOURS)
+    logger.info(f"Fichier sauvegardé: {filepath}")
+    
+    # Ajouter la tâche à la file
+    return job_queue.enqueue(filepath, job_description, original_filename=filename)
+
+@app.route('/api/adapt', methods=['POST'])
+@admission_controlled(adaptation_limiter)
+def api_adapt():
+    """API endpoint pour adapter un CV de manière synchrone, entièrement en mémoire"""
+    logger.info("Appel de l'API d'adaptation synchrone")
+    
+    file = request.files.get('cv_file')
+    if file is None or file.filename == '':
+        logger.warning("Aucun fichier dans la requête API")
+        return jsonify({"error": "Le fichier CV est requis"}), 400
+    
+    job_description = request.form.get('job_description', '')
+    if not job_description:
+        logger.warning("Description de poste vide dans la requête API")
+        return jsonify({"error": "La description de poste est requise"}), 400
+    
+    filename = secure_filename(file.filename)
+    try:
+        with SpooledUpload.from_file_storage(file, app.config['MAX_CONTENT_LENGTH']) as upload:
+            result = cv_processor.adapt_document(upload.file, upload.extension, job_description, cv_hash=upload.sha256)
+    except (UploadRejectedError, DocumentRejectedError) as e:
+        logger.warning(f"Fichier refusé: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement du fichier: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    stem, ext = os.path.splitext(filename)
+    response = send_file(
+        BytesIO(result["content"]),
+        as_attachment=True,
+        download_name=f"{stem}_adapte{ext}"
+    )
+    response.headers['X-CV-Highlighted-Keywords'] = str(result["stats"]["highlighted_keywords"])
+    response.headers['X-CV-Total-Keywords'] = str(result["stats"]["total_keywords"])
+    return response
+
+@app.route('/api/upload', methods=['POST'])
+@admission_controlled()
+def api_upload():
+    """API endpoint pour soumettre une adaptation de CV en arrière-plan"""
+    logger.info("Appel de l'API d'adaptation de CV")
+    
+    file = request.files.get('cv_file')
+    if file is None or file.filename == '':
+        logger.warning("Aucun fichier dans la requête API")
+        return jsonify({"error": "Le fichier CV est requis"}), 400
+    
+    if not allowed_file(file.filename):
+        logger.warning(f"Format de fichier non autorisé: {file.filename}")
+        return jsonify({"error": "Format de fichier non autorisé (.docx ou .pdf)"}), 400
+    
+    job_description = request.form.get('job_description', '')
+    if not job_description:
+        logger.warning("Description de poste vide dans la requête API")
+        return jsonify({"error": "La description de poste est requise"}), 400
+    
+    try:
+        job_id = _enqueue_upload(file, job_description)
+    except UploadRejectedError as e:
+        logger.warning(f"Fichier refusé: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+    except QueueFullError as e:
+        logger.warning(f"Demande refusée: {str(e)}")
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement du fichier: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": url_for('api_job_status', job_id=job_id)
+    }), 202
+
+@app.route('/api/batch', methods=['POST'])
+@admission_controlled()
+def api_batch():
+    """API endpoint pour soumettre l'adaptation d'un lot de CV (archive ZIP ou fichiers multiples) à une même offre"""
+    logger.info("Appel de l'API d'adaptation par lots")
+    
+    job_description = request.form.get('job_description', '')
+    if not job_description:
+        logger.warning("Description de poste vide dans la requête de lot")
+        return jsonify({"error": "La description de poste est requise"}), 400
+    
+    archive = request.files.get('cv_archive')
+    cv_files = [file for file in request.files.getlist('cv_files') if file.filename]
+    if archive is None and not cv_files:
+        logger.warning("Aucun CV dans la requête de lot")
+        return jsonify({"error": "Une archive ZIP (cv_archive) ou des fichiers (cv_files) sont requis"}), 400
+    
+    try:
+        # Les CV du lot restent en mémoire jusqu'aux processus de traitement
+        files = []
+        if archive is not None and archive.filename:
+            files.extend(batch_processor.extract_archive(archive.stream))
+        for file in cv_files:
+            if allowed_file(file.filename):
+                files.append((secure_filename(file.filename), file.read()))
+        
+        # Le lot validé est enregistré pour être adapté en arrière-plan, hors du délai de la requête
+        archive_path = os.path.join(app.config['UPLOAD_FOLDER'], f"lot_{uuid.uuid4().hex}.zip")
+        batch_processor.save_archive(files, archive_path)
+        storage_manager.register_file(archive_path, FILE_TTL_HOURS)
+        job_id = job_queue.enqueue(archive_path, job_description, kind=KIND_BATCH)
+    except (ValueError, zipfile.BadZipFile) as e:
+        logger.warning(f"Lot refusé: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+    except QueueFullError as e:
+        logger.warning(f"Lot refusé: {str(e)}")
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement du lot: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": "queued",
+        "files": len(files),
+        "status_url": url_for('api_job_status', job_id=job_id)
+    }), 202
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """API endpoint pour suivre l'état d'une tâche d'adaptation"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Tâche inconnue"}), 404
+    
+    response = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+    if job["result"] and job["kind"] == KIND_BATCH:
+        response["filename"] = job["result"]["filename"]
+        response["manifest"] = job["result"]["manifest"]
+        response["download_url"] = url_for('get_file', filename=job["result"]["filename"])
+    elif job["result"]:
+        response["filename"] = job["result"]["filename"]
+        response["stats"] = job["result"]["stats"]
+        response["reused"] = job["result"].get("reused", False)
+        response["download_url"] = url_for('get_file', filename=job["result"]["filename"])
+        response["result_url"] = url_for('download_file', filename=job["result"]["filename"], job=job_id)
+    if job["error"]:
+        response["error"] = job["error"]
+    return jsonify(response)
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Page d'attente affichée pendant l'adaptation du CV"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return render_template('404.html'), 404
+    if job["status"] == 'done':
+        return redirect(url_for('download_file', filename=job["result"]["filename"], job=job_id))
+    return render_template('job_status.html', job=job)
+
 @app.route('/download/<filename>')
 def download_file(filename):
     logger.info(f"Affichage de la page de téléchargement pour: {filename}")
-    return render_template('download.html', filename=filename)
+    stats, keywords = None, None
+    job_id = request.args.get('job')
+    if job_id:
+        job = job_queue.get(job_id)
+        if job and job["result"] and job["result"]["filename"] == filename:
+            stats = job["result"].get("stats")
+            keywords = job["result"].get("keywords")
+    return render_template('download.html', filename=filename, stats=stats, keywords=keywords)
 
 @app.route('/get_file/<filename>')
 def get_file(filename):
     logger.info(f"Téléchargement du fichier: {filename}")
-    return send_from_directory(app.config['DOWNLOAD_FOLDER'], filename, as_attachment=True)
+    path = safe_join(app.config['DOWNLOAD_FOLDER'], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    
+    # Les fichiers produits ne sont jamais réécrits : l'empreinte du contenu sert d'ETag fort
+    etag = storage_manager.file_etag(path)
+    
+    if X_ACCEL_REDIRECT_PREFIX:
+        # Envoi délégué au serveur frontal (nginx), qui gère aussi les requêtes partielles
+        response = Response(status=200, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = f"{X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(filename)}"
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.set_etag(etag)
+        response.make_conditional(request)
+    else:
+        # Requêtes conditionnelles (If-None-Match) et partielles (Range) traitées par Werkzeug
+        response = send_file(path, as_attachment=True, download_name=filename,
+                             conditional=True, etag=etag, max_age=DOWNLOAD_MAX_AGE)
+    
+    # CV personnels : cache du navigateur uniquement, sans revalidation
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = DOWNLOAD_MAX_AGE
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/api/analyze', methods=['POST'])
 def api_analyze():
@@ -187,6 +612,99 @@ def api_analyze():
         logger.error(f"Erreur lors de l'analyse de la description de poste: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/analyze/bulk', methods=['POST'])
+@admission_controlled()
+def api_analyze_bulk():
+    """API endpoint pour analyser un tableau JSON ou un flux NDJSON de descriptions de poste, résultats en NDJSON"""
+    logger.info("Appel de l'API d'analyse en masse")
+    
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = iter_ndjson(request.stream)
+    elif request.mimetype == 'application/json':
+        items = iter_json_array(request.stream)
+    else:
+        logger.warning(f"Type de contenu non pris en charge: {request.mimetype}")
+        return jsonify({"error": "La requête doit être un tableau JSON ou un flux NDJSON (application/x-ndjson)"}), 415
+    
+    def generate():
+        # Chaque résultat est transmis dès qu'il est prêt ; la requête est lue au rythme des analyses
+        count = 0
+        try:
+            for result in bulk_analyzer.analyze(items):
+                count += 1
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        except BulkInputError as e:
+            logger.warning(f"Lecture du lot interrompue: {str(e)}")
+            yield json.dumps({"success": False, "error": str(e)}, ensure_ascii=False) + "\n"
+        logger.info(f"Analyse en masse terminée: {count} descriptions de poste")
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={"X-Accel-Buffering": "no", "Cache-Control": "no-store"})
+
+@app.route('/api/rank', methods=['POST'])
+def api_rank():
+    """API endpoint pour classer les CV stockés selon leur adéquation à une description de poste"""
+    logger.info("Appel de l'API de classement des CV")
+    
+    if not request.is_json:
+        logger.warning("Requête non JSON reçue")
+        return jsonify({"error": "La requête doit être au format JSON"}), 400
+    
+    data = request.get_json()
+    job_description = data.get('job_description', '')
+    
+    if not job_description:
+        logger.warning("Description de poste vide dans la requête API")
+        return jsonify({"error": "La description de poste est requise"}), 400
+    
+    try:
+        top_k = int(data.get('top_k', 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k doit être un entier"}), 400
+    if not 1 <= top_k <= RANK_MAX_RESULTS:
+        return jsonify({"error": f"top_k doit être compris entre 1 et {RANK_MAX_RESULTS}"}), 400
+    
+    try:
+        results = cv_ranker.rank(job_description, top_k=top_k)
+    except Exception as e:
+        logger.error(f"Erreur lors du classement des CV: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify({
+        "success": True,
+        "total_cvs": cv_ranker.stats()["documents"],
+        "results": results
+    })
+
+@app.route('/api/search', methods=['GET', 'POST'])
+def api_search():
+    """API endpoint pour rechercher les CV stockés avec une requête booléenne (AND, OR, NOT, "expression")"""
+    logger.info("Appel de l'API de recherche des CV")
+    
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    query = (data.get('query') or data.get('q') or '').strip()
+    
+    if not query:
+        logger.warning("Requête de recherche vide")
+        return jsonify({"error": "La requête de recherche est requise"}), 400
+    
+    try:
+        limit = int(data.get('limit', 20))
+    except (TypeError, ValueError):
+        return jsonify({"error": "limit doit être un entier"}), 400
+    if not 1 <= limit <= SEARCH_MAX_RESULTS:
+        return jsonify({"error": f"limit doit être compris entre 1 et {SEARCH_MAX_RESULTS}"}), 400
+    
+    try:
+        found = search_index.search(query, limit=limit)
+    except QuerySyntaxError as e:
+        return jsonify({"error": f"Requête invalide: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Erreur lors de la recherche des CV: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify({"success": True, "query": query, "total": found["total"], "results": found["results"]})
+
 @app.errorhandler(404)
 def page_not_found(e):
     logger.warning(f"Page non trouvée: {request.path}")
@@ -201,13 +719,34 @@ def server_error(e):
 def stats():
     """Page de statistiques sur l'utilisation de l'application"""
     logger.info("Affichage de la page de statistiques")
-    # Dans une version plus complète, on pourrait stocker et afficher des statistiques d'utilisation
     return jsonify({
         "status": "ok",
-        "uptime": "Service actif",
-        "version": "1.0.0"
+        "uptime_seconds": round(metrics.uptime_seconds(), 1),
+        "version": "1.0.0",
+        "jobs": job_queue.counts(),
+        "files_processed": {
+            file_type: int(metrics.FILES_PROCESSED.value(file_type=file_type)) for file_type in ('docx', 'pdf')
+        },
+        "analysis_cache": analysis_cache.stats(),
+        "parsed_cv_cache": parsed_cv_cache.stats(),
+        "cv_ranking": cv_ranker.stats(),
+        "search_index": search_index.stats(),
+        "admission": {
+            "adaptation": adaptation_limiter.stats(),
+            "rate_limit": client_rate_limiter.stats()
+        }
     })
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métriques au format texte de Prometheus : totaux de tous les workers une fois partagés, jauges du worker courant"""
+    counts = job_queue.counts()
+    for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED):
+        JOBS_GAUGE.set(counts.get(status, 0), status=status)
+    CACHE_ENTRIES_GAUGE.set(analysis_cache.stats()["memory_entries"])
+    UPTIME_GAUGE.set(round(metrics.uptime_seconds(), 3))
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
     logger.info("Démarrage de l'application CV Analyzer")
     app.run(host='0.0.0.0', debug=False)
@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import asyncio
+import logging
+import contextvars
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.wsgi import FileWrapper
+
+# Les services d'arrière-plan sont démarrés à l'événement lifespan, dans le processus qui sert les requêtes
+os.environ.setdefault('CV_ANALYZER_DEFER_BACKGROUND', '1')
+
+import app as flask_module
+
+logger = logging.getLogger('asgi_app')
+
+# Taille au-delà de laquelle un corps de requête reçu bascule du tampon mémoire vers un fichier local
+BODY_SPOOL_SIZE = 1024 * 1024
+
+# Taille des blocs lus depuis les réponses de l'application
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+
+def _file_wrapper(file, buffer_size=RESPONSE_CHUNK_SIZE):
+    """
+    Lecture des fichiers envoyés (send_file) par blocs d'au moins RESPONSE_CHUNK_SIZE octets.
+    """
+    return FileWrapper(file, max(buffer_size, RESPONSE_CHUNK_SIZE))
+
+
+class ClientDisconnected(Exception):
+    """
+    Levée lorsque le client se déconnecte avant la fin de l'envoi de sa requête.
+    """
+
+
+class AsyncFrontEnd:
+    """
+    Point d'entrée ASGI servant les routes de l'application Flask.
+
+    La boucle d'événements reçoit le corps des requêtes et envoie les réponses
+    bloc par bloc : un client lent, en envoi comme en téléchargement, n'occupe
+    aucun thread. L'application Flask n'est appelée qu'une fois la requête
+    entièrement reçue, dans un pool de threads borné ; les CV sont traités
+    dans le pool de processus isolés (SandboxPool) lorsqu'un budget mémoire
+    est configuré, comme en WSGI.
+    """
+
+    def __init__(self, wsgi_app, max_threads=32, max_body_size=None):
+        """
+        Initialise le point d'entrée.
+
+        Args:
+            wsgi_app: Application WSGI (Flask)
+            max_threads (int): Nombre de threads exécutant les vues
+            max_body_size (int): Taille maximale d'un corps de requête (MAX_CONTENT_LENGTH de Flask par défaut)
+        """
+        self.wsgi_app = wsgi_app
+        self.max_body_size = max_body_size or wsgi_app.config.get('MAX_CONTENT_LENGTH')
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi-view')
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        else:
+            raise RuntimeError(f"Type de connexion non pris en charge: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    flask_module.start_background_services()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                flask_module.bulk_analyzer.shutdown()
+                if flask_module.document_sandbox is not None:
+                    flask_module.document_sandbox.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        headers = {}
+        for name, value in scope.get("headers", []):
+            name, value = name.decode('latin-1').lower(), value.decode('latin-1')
+            if name in headers:
+                # En-têtes répétés combinés comme le ferait un serveur WSGI
+                value = headers[name] + ("; " if name == "cookie" else ", ") + value
+            headers[name] = value
+
+        declared = headers.get("content-length")
+        if self.max_body_size and declared and declared.isdigit() and int(declared) > self.max_body_size:
+            await self._send_error(send, 413, "Requête trop volumineuse")
+            return
+
+        try:
+            body, size = await self._read_body(receive)
+        except ClientDisconnected:
+            return
+        if body is None:
+            await self._send_error(send, 413, "Requête trop volumineuse")
+            return
+
+        try:
+            environ = self._environ(scope, headers, body, size)
+            await self._call_wsgi(environ, send)
+        finally:
+            body.close()
+
+    async def _read_body(self, receive):
+        """
+        Reçoit le corps d'une requête sans bloquer, dans un tampon borné.
+
+        Returns:
+            tuple: (tampon positionné au début, taille), ou (None, taille) si la limite est dépassée
+        """
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_SIZE)
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                body.close()
+                raise ClientDisconnected()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if self.max_body_size and size > self.max_body_size:
+                body.close()
+                return None, size
+            if chunk:
+                body.write(chunk)
+            if not message.get("more_body", False):
+                break
+        body.seek(0)
+        return body, size
+
+    @staticmethod
+    def _environ(scope, headers, body, size):
+        """
+        Construit l'environnement WSGI d'une requête ASGI entièrement reçue.
+        """
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        # Les chemins WSGI sont des octets UTF-8 décodés en latin-1 (PEP 3333)
+        path = scope["path"].encode('utf-8').decode('latin-1')
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode('utf-8').decode('latin-1'),
+            "PATH_INFO": path,
+            "QUERY_STRING": scope.get("query_string", b"").decode('latin-1'),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "CONTENT_LENGTH": str(size),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.file_wrapper": _file_wrapper,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False
+        }
+        for name, value in headers.items():
+            if name == "content-length":
+                continue
+            if name == "content-type":
+                environ["CONTENT_TYPE"] = value
+                continue
+            environ["HTTP_" + name.upper().replace("-", "_")] = value
+        return environ
+
+    async def _call_wsgi(self, environ, send):
+        """
+        Exécute l'application WSGI dans le pool de threads et transmet sa réponse bloc par bloc.
+
+        Chaque étape (vue, blocs suivants, fermeture) peut s'exécuter dans un thread
+        différent : toutes le sont dans le même contexte (contextvars), où Flask
+        conserve le contexte de la requête d'une réponse diffusée (stream_with_context).
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response_headers
+            ]
+            return None
+
+        def call():
+            iterable = self.wsgi_app(environ, start_response)
+            return iterable, iter(iterable)
+
+        iterable, iterator = await loop.run_in_executor(self.executor, context.run, call)
+        try:
+            # Chaque bloc est lu dans un thread puis envoyé par la boucle, au rythme du client
+            chunk = await loop.run_in_executor(self.executor, context.run, next, iterator, None)
+            await send({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+            while chunk is not None:
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await loop.run_in_executor(self.executor, context.run, next, iterator, None)
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, context.run, close)
+
+    @staticmethod
+    async def _send_error(send, status, message):
+        body = json.dumps({"error": message}, ensure_ascii=False).encode('utf-8')
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode('ascii'))
+        ]})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+
+
+app = AsyncFrontEnd(flask_module.app, max_threads=int(os.environ.get('ASGI_THREADS', 32)))
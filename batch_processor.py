@@ -0,0 +1,301 @@
+import os
+import json
+import uuid
+import logging
+import zipfile
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.utils import secure_filename
+from cv_processor import CVProcessor
+from document_guard import DocumentGuard, limit_memory, RATIO_CHECK_MIN_BYTES
+
+# Extensions des CV acceptées dans un lot
+BATCH_EXTENSIONS = ('.docx', '.pdf')
+
+# Processeur propre à chaque processus du pool
+_worker_processor = None
+
+
+def _init_worker(upload_folder, download_folder, memory_limit_bytes=None, guard_limits=None):
+    """
+    Initialise le processeur de CV d'un processus du pool, sous budget mémoire
+    et avec les mêmes limites de documents que le processus principal.
+    """
+    global _worker_processor
+    limit_memory(memory_limit_bytes)
+    # Le lot est déjà réparti par fichier : les pages d'un PDF sont traitées dans ce processus
+    os.environ['PDF_PAGE_WORKERS'] = '1'
+    logging.getLogger('CVProcessor').setLevel(logging.WARNING)
+    guard = DocumentGuard(**guard_limits) if guard_limits else None
+    _worker_processor = CVProcessor(upload_folder, download_folder, guard=guard)
+
+
+def _adapt_in_worker(data, file_ext, keywords):
+    """
+    Adapte en mémoire un CV dans un processus du pool avec des mots-clés déjà extraits.
+    """
+    return _worker_processor.adapt_document(BytesIO(data), file_ext, None, keywords=keywords)
+
+
+class BatchProcessor:
+    """
+    Adaptation d'un lot de CV à une même description de poste.
+
+    Les mots-clés sont extraits une seule fois, puis l'adaptation de chaque CV
+    est répartie sur un pool de processus dimensionné selon le nombre de cœurs.
+    Une erreur sur un fichier est consignée dans le manifeste sans interrompre le lot.
+    """
+
+    def __init__(self, processor, max_workers=None, max_files=500, max_file_size=16 * 1024 * 1024,
+                 memory_limit_mb=None, max_total_size=256 * 1024 * 1024, max_compression_ratio=200):
+        """
+        Initialise le processeur de lots.
+
+        Args:
+            processor (CVProcessor): Processeur utilisé pour l'extraction des mots-clés
+            max_workers (int): Nombre de processus du pool (nombre de cœurs par défaut)
+            max_files (int): Nombre maximum de CV par lot
+            max_file_size (int): Taille maximale d'un CV extrait de l'archive en octets
+            memory_limit_mb (int): Budget mémoire de chaque processus du pool en Mo (illimité par défaut)
+            max_total_size (int): Taille décompressée maximale de l'ensemble des CV de l'archive en octets
+            max_compression_ratio (int): Taux de compression maximal d'un CV volumineux de l'archive
+        """
+        self.logger = logging.getLogger('batch_processor')
+        self.processor = processor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_files = max_files
+        self.max_file_size = max_file_size
+        self.memory_limit_mb = memory_limit_mb
+        self.max_total_size = max_total_size
+        self.max_compression_ratio = max_compression_ratio
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        """
+        Crée le pool de processus au premier lot, puis le réutilise.
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(
+                        self.processor.upload_folder, self.processor.download_folder,
+                        self.memory_limit_mb * 1024 * 1024 if self.memory_limit_mb else None,
+                        self.processor.guard.limits()
+                    )
+                )
+                self.logger.info(f"Pool de {self.max_workers} processus créé pour les lots")
+            return self._pool
+
+    def _discard(self, pool):
+        """
+        Remplace le pool après la perte d'un processus (BrokenProcessPool).
+        """
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        for process in list((getattr(pool, '_processes', None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """
+        Arrête le pool de processus.
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def extract_archive(self, archive):
+        """
+        Lit en mémoire les CV d'une archive ZIP.
+
+        Seuls les fichiers .docx et .pdf sont retenus ; les noms sont aplatis et sécurisés.
+        Les tailles déclarées par l'archive sont toutes vérifiées avant la première
+        lecture (taille de chaque CV, taille totale, taux de compression) : zipfile
+        ne décompresse jamais au-delà de la taille déclarée d'une entrée.
+
+        Args:
+            archive: Fichier ZIP (chemin ou objet fichier)
+
+        Returns:
+            list: Liste de tuples (nom sécurisé, contenu)
+        """
+        selected = []
+        total = 0
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                name = secure_filename(os.path.basename(info.filename))
+                if info.is_dir() or not name or info.filename.startswith('__MACOSX/'):
+                    continue
+                if not name.lower().endswith(BATCH_EXTENSIONS):
+                    continue
+                if len(selected) >= self.max_files:
+                    raise ValueError(f"Le lot dépasse le nombre maximum de {self.max_files} CV")
+                if info.file_size > self.max_file_size:
+                    raise ValueError(f"Le fichier {name} dépasse la taille maximale de {self.max_file_size} octets")
+                if info.file_size > RATIO_CHECK_MIN_BYTES and \
+                        info.file_size > self.max_compression_ratio * max(info.compress_size, 1):
+                    raise ValueError(f"Taux de compression anormal pour le fichier {name}")
+                total += info.file_size
+                if total > self.max_total_size:
+                    raise ValueError(f"Le lot décompressé dépasse la taille maximale de {self.max_total_size} octets")
+                selected.append((name, info))
+            return [(name, zip_file.read(info)) for name, info in selected]
+
+    def check_files(self, files):
+        """
+        Vérifie qu'un lot contient au moins un CV et pas plus que le maximum autorisé.
+
+        Args:
+            files (list): Liste de tuples (nom du fichier, contenu)
+
+        Raises:
+            ValueError: Si le lot est vide ou trop grand
+        """
+        if not files:
+            raise ValueError("Aucun CV .docx ou .pdf dans le lot")
+        if len(files) > self.max_files:
+            raise ValueError(f"Le lot dépasse le nombre maximum de {self.max_files} CV")
+
+    def save_archive(self, files, path):
+        """
+        Enregistre les CV d'un lot dans une archive ZIP non compressée, pour la file de tâches.
+
+        Args:
+            files (list): Liste de tuples (nom du fichier, contenu)
+            path (str): Chemin de l'archive à écrire
+        """
+        self.check_files(files)
+        used_names = set()
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+            for name, content in files:
+                archive.writestr(self._unique_name(name, used_names), content)
+
+    def process_archive(self, path, job_description):
+        """
+        Adapte les CV d'une archive enregistrée par save_archive.
+
+        Args:
+            path (str): Chemin de l'archive des CV du lot
+            job_description (str): Description du poste
+
+        Returns:
+            dict: Nom de l'archive produite et manifeste par fichier
+        """
+        return self.process(self.extract_archive(path), job_description)
+
+    def process(self, files, job_description):
+        """
+        Adapte un lot de CV et produit une archive ZIP des résultats.
+
+        Les CV circulent en mémoire jusqu'aux processus du pool ; seule
+        l'archive finale est écrite sur disque.
+
+        Args:
+            files (list): Liste de tuples (nom du fichier, contenu)
+            job_description (str): Description du poste
+
+        Returns:
+            dict: Nom de l'archive produite et manifeste par fichier
+        """
+        self.check_files(files)
+
+        self.logger.info(f"Adaptation d'un lot de {len(files)} CV")
+
+        # Extraction unique des mots-clés pour tout le lot
+        keywords = self.processor.extract_keywords_from_job_description(job_description)
+
+        results = self._adapt_all(files, keywords)
+
+        archive_name = f"lot_adapte_{uuid.uuid4().hex}.zip"
+        archive_path = os.path.join(self.processor.download_folder, archive_name)
+        manifest = []
+        used_names = set()
+
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, result, error in results:
+                entry = {"file": name}
+                if error is not None:
+                    self.logger.warning(f"Échec de l'adaptation de {name}: {error}")
+                    entry.update({"status": "error", "error": error})
+                    manifest.append(entry)
+                    continue
+
+                stem, ext = os.path.splitext(name)
+                output_name = self._unique_name(f"{stem}_adapte{ext}", used_names)
+                archive.writestr(output_name, result["content"])
+
+                entry.update({"status": "ok", "output": output_name, "stats": result["stats"]})
+                manifest.append(entry)
+
+            archive.writestr("manifest.json", json.dumps({
+                "total_keywords": len({word for words in keywords.values() for word in words}),
+                "files": manifest
+            }, ensure_ascii=False, indent=2))
+
+        succeeded = sum(1 for entry in manifest if entry["status"] == "ok")
+        self.logger.info(f"Lot terminé: {succeeded}/{len(manifest)} CV adaptés ({archive_name})")
+        return {"filename": archive_name, "manifest": manifest}
+
+    def _adapt_all(self, files, keywords):
+        """
+        Adapte les CV d'un lot sur le pool de processus.
+
+        Si un processus est perdu (CV provoquant un arrêt brutal, budget mémoire
+        dépassé), le pool est reconstruit et les CV sans résultat sont repris un
+        par un, pour n'attribuer l'échec qu'au fichier qui l'a provoqué.
+
+        Returns:
+            list: Tuples (nom du fichier, résultat ou None, message d'erreur ou None), dans l'ordre du lot
+        """
+        results = {}
+        pool = self._get_pool()
+        futures = [(index, pool.submit(_adapt_in_worker, data, os.path.splitext(name)[1], keywords))
+                   for index, (name, data) in enumerate(files)]
+        retry = []
+        for index, future in futures:
+            try:
+                results[index] = (future.result(), None)
+            except BrokenProcessPool:
+                retry.append(index)
+            except Exception as e:
+                results[index] = (None, str(e))
+
+        if retry:
+            self.logger.warning(f"Processus du pool perdu, reprise individuelle de {len(retry)} CV")
+            self._discard(pool)
+            for index in retry:
+                name, data = files[index]
+                pool = self._get_pool()
+                try:
+                    results[index] = (pool.submit(_adapt_in_worker, data, os.path.splitext(name)[1], keywords).result(),
+                                      None)
+                except BrokenProcessPool:
+                    self._discard(pool)
+                    results[index] = (None, "Le traitement du CV a été interrompu (processus arrêté)")
+                except Exception as e:
+                    results[index] = (None, str(e))
+
+        return [(name,) + results[index] for index, (name, _) in enumerate(files)]
+
+    @staticmethod
+    def _unique_name(name, used_names):
+        """
+        Évite les collisions de noms dans l'archive produite.
+        """
+        candidate = name
+        index = 1
+        while candidate in used_names:
+            stem, ext = os.path.splitext(name)
+            candidate = f"{stem}_{index}{ext}"
+            index += 1
+        used_names.add(candidate)
+        return candidate
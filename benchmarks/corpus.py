@@ -0,0 +1,162 @@
+import random
+import numpy as np
+from io import BytesIO
+from docx import Document
+from docx.enum.text import WD_BREAK
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+
+# Compétences techniques injectées dans les CV et les descriptions de poste
+TECHNICAL_TERMS = [
+    "python", "django", "flask", "fastapi", "javascript", "typescript", "react",
+    "angular", "docker", "kubernetes", "terraform", "postgresql", "mongodb",
+    "redis", "kafka", "spark", "airflow", "pandas", "tensorflow", "pytorch",
+    "linux", "jenkins", "gitlab", "ansible", "microservices", "graphql",
+    "elasticsearch", "rabbitmq", "scrum", "devops", "architecture", "sécurité"
+]
+
+# Vocabulaire courant servant de remplissage
+FILLER_WORDS = [
+    "équipe", "projet", "client", "développement", "conception", "analyse",
+    "gestion", "production", "qualité", "service", "application", "données",
+    "solution", "plateforme", "entreprise", "mission", "environnement", "outil",
+    "processus", "performance", "utilisateur", "suivi", "amélioration", "mise",
+    "place", "réalisation", "participation", "animation", "documentation",
+    "le", "la", "les", "des", "et", "pour", "avec", "dans", "sur", "une", "du"
+]
+
+SECTION_TITLES = ["Missions", "Compétences requises", "Profil", "Formation", "Expérience"]
+
+
+def _sentence(rng, words, keyword_density):
+    """
+    Produit une phrase mêlant vocabulaire courant et compétences techniques.
+    """
+    tokens = [
+        rng.choice(TECHNICAL_TERMS) if rng.random() < keyword_density else rng.choice(FILLER_WORDS)
+        for _ in range(words)
+    ]
+    tokens[0] = tokens[0].capitalize()
+    return " ".join(tokens) + "."
+
+
+def generate_job_description(words=300, keyword_density=0.1, seed=0):
+    """
+    Génère une description de poste synthétique.
+
+    Args:
+        words (int): Nombre approximatif de mots
+        keyword_density (float): Proportion de compétences techniques parmi les mots
+        seed (int): Graine du générateur, pour un corpus reproductible
+
+    Returns:
+        str: Description de poste
+    """
+    rng = random.Random(seed)
+    lines = ["Développeur Python Senior (CDI)", ""]
+    section_words = max(words // len(SECTION_TITLES), 12)
+    for title in SECTION_TITLES:
+        lines.append(f"{title}:")
+        produced = 0
+        while produced < section_words:
+            length = rng.randint(8, 16)
+            lines.append(f"- {_sentence(rng, length, keyword_density)}")
+            produced += length
+        lines.append("")
+    lines.append("5+ ans d'expérience, Bac+5 ou diplôme d'ingénieur.")
+    return "\n".join(lines)
+
+
+def generate_docx_cv(pages=2, paragraphs=40, tables=1, keyword_density=0.1, seed=0):
+    """
+    Génère un CV Word synthétique.
+
+    Args:
+        pages (int): Nombre de pages (sauts de page répartis entre les paragraphes)
+        paragraphs (int): Nombre total de paragraphes
+        tables (int): Nombre de tableaux de compétences
+        keyword_density (float): Proportion de compétences techniques parmi les mots
+        seed (int): Graine du générateur
+
+    Returns:
+        bytes: Contenu du fichier .docx
+    """
+    rng = random.Random(seed)
+    doc = Document()
+    doc.add_heading("Jean Dupont - Ingénieur logiciel", level=1)
+    per_page = max(paragraphs // max(pages, 1), 1)
+    per_table = max(paragraphs // (tables + 1), 1) if tables else None
+
+    for index in range(paragraphs):
+        paragraph = doc.add_paragraph()
+        # Plusieurs runs par paragraphe, comme dans un CV mis en forme
+        for run_index in range(rng.randint(1, 3)):
+            run = paragraph.add_run(_sentence(rng, rng.randint(10, 25), keyword_density) + " ")
+            run.bold = run_index == 0 and index % 5 == 0
+        if per_table and tables and (index + 1) % per_table == 0:
+            table = doc.add_table(rows=4, cols=3)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = _sentence(rng, 4, keyword_density)
+            tables -= 1
+        if (index + 1) % per_page == 0 and index + 1 < paragraphs:
+            paragraph.add_run().add_break(WD_BREAK.PAGE)
+
+    output = BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+def generate_pdf_cv(pages=2, lines_per_page=40, keyword_density=0.1, seed=0):
+    """
+    Génère un CV PDF synthétique.
+
+    Args:
+        pages (int): Nombre de pages
+        lines_per_page (int): Nombre de lignes de texte par page
+        keyword_density (float): Proportion de compétences techniques parmi les mots
+        seed (int): Graine du générateur
+
+    Returns:
+        bytes: Contenu du fichier .pdf
+    """
+    rng = random.Random(seed)
+    output = BytesIO()
+    can = canvas.Canvas(output, pagesize=A4)
+    width, height = A4
+    line_height = (height - 100) / max(lines_per_page, 1)
+    for _ in range(pages):
+        can.setFont("Helvetica-Bold", 14)
+        can.drawString(50, height - 40, "Jean Dupont - Ingénieur logiciel")
+        can.setFont("Helvetica", 9)
+        for line in range(lines_per_page):
+            can.drawString(50, height - 70 - line * line_height, _sentence(rng, rng.randint(8, 14), keyword_density))
+        can.showPage()
+    can.save()
+    return output.getvalue()
+
+
+def generate_cv_terms(documents, words=200, vocabulary=20000, seed=0):
+    """
+    Génère les termes d'un corpus de CV, tels que les découpe l'analyseur lexical.
+
+    Les fréquences suivent une loi de Zipf : compétences techniques et vocabulaire
+    courant en tête, puis un long vocabulaire rare propre à quelques CV.
+
+    Args:
+        documents (int): Nombre de CV
+        words (int): Nombre de mots de chaque CV
+        vocabulary (int): Nombre de termes distincts du corpus
+        seed (int): Graine du générateur
+
+    Yields:
+        dict: Nombre d'occurrences de chaque terme d'un CV
+    """
+    terms = TECHNICAL_TERMS + FILLER_WORDS
+    terms = terms + [f"terme{index}" for index in range(max(vocabulary - len(terms), 0))]
+    cumulative = np.cumsum(1.0 / np.arange(1, len(terms) + 1))
+    rng = np.random.default_rng(seed)
+    for _ in range(documents):
+        drawn = np.searchsorted(cumulative, rng.random(words) * cumulative[-1])
+        columns, counts = np.unique(drawn, return_counts=True)
+        yield {terms[column]: int(count) for column, count in zip(columns, counts)}
@@ -0,0 +1,371 @@
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import logging
+import sqlite3
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from io import BytesIO
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cv_processor import CVProcessor
+from cv_ranking import CVRanker
+from keyword_matcher import KeywordMatcher
+from document_backends import get_backend
+from metrics import STAGE_DURATION
+from benchmarks.corpus import generate_job_description, generate_docx_cv, generate_pdf_cv, generate_cv_terms
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# Scénarios mesurés : taille du CV et de la description de poste
+SCENARIOS = {
+    "docx_small": {"format": "docx", "cv": {"pages": 2, "paragraphs": 40, "tables": 1},
+                   "job": {"words": 300, "keyword_density": 0.1}},
+    "docx_large": {"format": "docx", "cv": {"pages": 10, "paragraphs": 400, "tables": 5},
+                   "job": {"words": 1500, "keyword_density": 0.2}},
+    "pdf_small": {"format": "pdf", "cv": {"pages": 2, "lines_per_page": 40},
+                  "job": {"words": 300, "keyword_density": 0.1}},
+    "pdf_large": {"format": "pdf", "cv": {"pages": 20, "lines_per_page": 50},
+                  "job": {"words": 1500, "keyword_density": 0.2}}
+}
+
+# Scénarios du classement des CV stockés : taille du corpus, part des CV supprimés
+# (marqueurs non encore compactés) et nombre de descriptions de poste classées
+RANKING_SCENARIOS = {
+    "ranking_100k": {"documents": 100000, "words": 200, "removed": 0.2, "queries": 5}
+}
+
+# En dessous de ces seuils absolus, les écarts relèvent du bruit de mesure
+MIN_SECONDS = 0.005
+MIN_PEAK_KB = 256
+
+_WORD = re.compile(r"\w+")
+
+
+def calibrate(repeat=5):
+    """
+    Mesure la vitesse de la machine sur un travail de référence fixe.
+
+    Le travail est de même nature que l'adaptation (expressions régulières,
+    dictionnaires, compression) ; les durées de référence sont mises à
+    l'échelle par le rapport entre cette mesure et celle enregistrée avec
+    elles, si bien que les références restent valables sur une autre machine.
+
+    Returns:
+        float: Durée médiane du travail de référence en secondes
+    """
+    text = generate_job_description(words=20000, keyword_density=0.2, seed=0)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        counts = {}
+        for word in _WORD.findall(text.lower()):
+            counts[word] = counts.get(word, 0) + 1
+        zlib.compress(json.dumps(counts, sort_keys=True).encode('utf-8') + text.encode('utf-8'), 6)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+class _DiscardedOutput:
+    """
+    Flux de sortie qui ne conserve rien, pour mesurer la mémoire du document produit.
+    """
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        pass
+
+
+class StageRecorder:
+    """
+    Mesure la durée et le pic mémoire de chaque étape d'un scénario.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.seconds = {}
+        self.peak_kb = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = time.perf_counter() - start
+            if self.trace_memory:
+                self.peak_kb[name] = (tracemalloc.get_traced_memory()[1] - baseline) / 1024
+
+
+# Étapes internes des moteurs, relevées dans l'histogramme des métriques
+ENGINE_STAGES = (("parsing", "parse"), ("highlighting", "highlight"), ("saving", "write"))
+
+
+def _run(processor, recorder, data, file_type, job_description):
+    with recorder.stage("extraction"):
+        keywords = processor.extract_keywords_from_job_description(job_description)
+    highlighter = get_backend(f".{file_type}")(KeywordMatcher({word for words in keywords.values() for word in words}))
+
+    # Les moteurs chronomètrent eux-mêmes leurs étapes, entrelacées lors d'un traitement en flux
+    before = {stage: STAGE_DURATION.sum(stage=stage, file_type=file_type) for _, stage in ENGINE_STAGES}
+    with recorder.stage("adaptation"):
+        highlighter.highlight(BytesIO(data), BytesIO())
+    for name, stage in ENGINE_STAGES:
+        recorder.seconds[name] = STAGE_DURATION.sum(stage=stage, file_type=file_type) - before[stage]
+
+
+def _trace_engine_stages(processor, recorder, data, file_type, job_description):
+    """
+    Mesure séparément le pic mémoire des étapes des moteurs, entrelacées lors d'une adaptation.
+
+    La lecture est mesurée sur l'analyse du document, la mise en évidence sur
+    la production d'un document aussitôt abandonné, et l'enregistrement sur la
+    mémoire supplémentaire du document produit conservé en mémoire.
+    """
+    keywords = processor.extract_keywords_from_job_description(job_description)
+    highlighter = get_backend(f".{file_type}")(KeywordMatcher({word for words in keywords.values() for word in words}))
+    with recorder.stage("parsing"):
+        parsed = highlighter.parse(BytesIO(data))
+    with recorder.stage("highlighting"):
+        highlighter.render(BytesIO(data), parsed, _DiscardedOutput())
+    with recorder.stage("saving"):
+        highlighter.render(BytesIO(data), parsed, BytesIO())
+    recorder.peak_kb["saving"] = max(0.0, recorder.peak_kb["saving"] - recorder.peak_kb["highlighting"])
+
+
+def build_corpus(scenario, seed=0):
+    """
+    Génère le CV et la description de poste d'un scénario.
+
+    Returns:
+        tuple: (contenu du CV, description de poste)
+    """
+    density = scenario["job"]["keyword_density"]
+    if scenario["format"] == "docx":
+        data = generate_docx_cv(keyword_density=density, seed=seed, **scenario["cv"])
+    else:
+        data = generate_pdf_cv(keyword_density=density, seed=seed, **scenario["cv"])
+    return data, generate_job_description(seed=seed + 1, **scenario["job"])
+
+
+def run_scenario(processor, scenario, repeat=5):
+    """
+    Exécute un scénario et mesure chaque étape.
+
+    Les durées sont les médianes de plusieurs exécutions sans traçage mémoire ;
+    le pic mémoire de chaque étape est mesuré lors d'exécutions supplémentaires
+    sous tracemalloc.
+
+    Returns:
+        dict: Par étape, durée médiane en secondes et pic mémoire en Ko (si mesuré)
+    """
+    data, job_description = build_corpus(scenario)
+    timings = []
+    for _ in range(repeat):
+        recorder = StageRecorder()
+        _run(processor, recorder, data, scenario["format"], job_description)
+        timings.append(recorder.seconds)
+
+    recorder = StageRecorder(trace_memory=True)
+    tracemalloc.start()
+    try:
+        _run(processor, recorder, data, scenario["format"], job_description)
+        _trace_engine_stages(processor, recorder, data, scenario["format"], job_description)
+    finally:
+        tracemalloc.stop()
+
+    results = {}
+    for stage in timings[0]:
+        results[stage] = {"seconds": round(statistics.median(timing[stage] for timing in timings), 6)}
+        if stage in recorder.peak_kb:
+            results[stage]["peak_kb"] = round(recorder.peak_kb[stage], 1)
+    return results
+
+
+def run_ranking_scenario(scenario, repeat=5):
+    """
+    Exécute un scénario de classement sur un corpus de CV synthétique.
+
+    Le journal des CV est rempli en une transaction (comme par une succession
+    d'appels à CVRanker.add et CVRanker.remove), puis intégré par sync. La
+    première requête, qui construit la vue par colonnes, n'est pas chronométrée.
+
+    Returns:
+        dict: Par étape (intégration, classement), durée médiane en secondes et pic mémoire en Ko
+    """
+    queries = [generate_job_description(words=300, keyword_density=0.2, seed=seed)
+               for seed in range(scenario["queries"])]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ranker = CVRanker(os.path.join(temp_dir, 'ranking.sqlite'), snapshot_every=sys.maxsize)
+        now = time.time()
+        removed = int(scenario["documents"] * scenario["removed"])
+        conn = sqlite3.connect(ranker.db_path)
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO cv_documents (doc_id, name, terms, created_at) VALUES (?, ?, ?, ?)",
+                    ((f"cv-{index}", f"cv-{index}.pdf", json.dumps(terms), now) for index, terms in
+                     enumerate(generate_cv_terms(scenario["documents"], words=scenario["words"])))
+                )
+                conn.executemany("DELETE FROM cv_documents WHERE doc_id = ? AND removed = 0",
+                                 ((f"cv-{index}",) for index in range(0, 5 * removed, 5)))
+                conn.executemany("INSERT INTO cv_documents (doc_id, removed, created_at) VALUES (?, 1, ?)",
+                                 ((f"cv-{index}", now) for index in range(0, 5 * removed, 5)))
+        finally:
+            conn.close()
+
+        recorder = StageRecorder()
+        with recorder.stage("indexing"):
+            ranker.sync()
+        ranker.rank(queries[0])
+
+        timings = []
+        for _ in range(repeat):
+            for query in queries:
+                start = time.perf_counter()
+                ranker.rank(query)
+                timings.append(time.perf_counter() - start)
+
+        tracer = StageRecorder(trace_memory=True)
+        tracemalloc.start()
+        try:
+            with tracer.stage("ranking"):
+                ranker.rank(queries[-1])
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "indexing": {"seconds": round(recorder.seconds["indexing"], 6)},
+        "ranking": {"seconds": round(statistics.median(timings), 6), "peak_kb": round(tracer.peak_kb["ranking"], 1)}
+    }
+
+
+def compare(results, baselines, time_tolerance=0.5, memory_tolerance=0.25, speed=1.0):
+    """
+    Compare les mesures aux références enregistrées.
+
+    Args:
+        results (dict): Mesures par scénario et par étape
+        baselines (dict): Références par scénario et par étape
+        time_tolerance (float): Dépassement relatif toléré sur les durées
+        memory_tolerance (float): Dépassement relatif toléré sur le pic mémoire
+        speed (float): Rapport entre la calibration de la machine courante et celle des
+            références (voir calibrate), appliqué aux durées de référence
+
+    Returns:
+        list: Messages décrivant chaque régression
+    """
+    regressions = []
+    for name, stages in results.items():
+        for stage, measure in stages.items():
+            reference = baselines.get(name, {}).get(stage)
+            if not reference:
+                continue
+            expected = reference["seconds"] * speed
+            limit = max(expected * (1 + time_tolerance), MIN_SECONDS * speed)
+            if measure["seconds"] > limit:
+                regressions.append(
+                    f"{name}/{stage}: {measure['seconds']:.4f}s > {limit:.4f}s (référence {expected:.4f}s)"
+                )
+            if "peak_kb" not in reference or "peak_kb" not in measure:
+                continue
+            limit = max(reference["peak_kb"] * (1 + memory_tolerance), MIN_PEAK_KB)
+            if measure["peak_kb"] > limit:
+                regressions.append(
+                    f"{name}/{stage}: {measure['peak_kb']:.0f} Ko > {limit:.0f} Ko (référence {reference['peak_kb']:.0f} Ko)"
+                )
+    return regressions
+
+
+def load_baselines(path):
+    """
+    Lit les références : calibration de la machine qui les a mesurées et mesures par scénario.
+    """
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesure des performances de l'adaptation des CV")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS) + sorted(RANKING_SCENARIOS),
+                        help="Scénario à exécuter (tous par défaut, option répétable)")
+    parser.add_argument('--repeat', type=int, default=5, help="Nombre d'exécutions chronométrées")
+    parser.add_argument('--baselines', default=BASELINES_PATH, help="Fichier des références")
+    parser.add_argument('--update-baselines', action='store_true', help="Enregistre les mesures comme références")
+    parser.add_argument('--time-tolerance', type=float, default=0.5)
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('CVProcessor').setLevel(logging.WARNING)
+
+    calibration = calibrate()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Sans cache, l'extraction des mots-clés est mesurée à chaque exécution
+        processor = CVProcessor(temp_dir, temp_dir)
+        logging.getLogger('CVProcessor').setLevel(logging.WARNING)
+        results = {name: run_scenario(processor, SCENARIOS[name], args.repeat)
+                   for name in (args.scenario or sorted(SCENARIOS)) if name in SCENARIOS}
+    for name in (args.scenario or sorted(RANKING_SCENARIOS)):
+        if name in RANKING_SCENARIOS:
+            results[name] = run_ranking_scenario(RANKING_SCENARIOS[name], args.repeat)
+
+    print(f"calibration     {calibration * 1000:>10.2f} ms")
+    for name, stages in results.items():
+        print(name)
+        for stage, measure in stages.items():
+            peak = f"{measure['peak_kb']:>12.1f} Ko" if "peak_kb" in measure else ""
+            print(f"  {stage:<14}{measure['seconds'] * 1000:>10.2f} ms{peak}")
+
+    if args.update_baselines:
+        scenarios = {}
+        if args.scenario and os.path.exists(args.baselines):
+            # Les références des autres scénarios sont conservées, ramenées à la calibration courante
+            previous = load_baselines(args.baselines)
+            scenarios = previous["scenarios"]
+            speed = calibration / previous["calibration_seconds"]
+            for stages in scenarios.values():
+                for measure in stages.values():
+                    measure["seconds"] = round(measure["seconds"] * speed, 6)
+        scenarios.update(results)
+        with open(args.baselines, 'w', encoding='utf-8') as f:
+            json.dump({"calibration_seconds": round(calibration, 6), "scenarios": scenarios}, f,
+                      ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Références enregistrées dans {args.baselines}")
+        return 0
+
+    if not os.path.exists(args.baselines):
+        print("Aucune référence enregistrée : utilisez --update-baselines")
+        return 0
+
+    baselines = load_baselines(args.baselines)
+    speed = calibration / baselines["calibration_seconds"]
+    print(f"Machine {speed:.2f} fois plus lente que celle des références")
+    regressions = compare(results, baselines["scenarios"], args.time_tolerance, args.memory_tolerance, speed)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+import os
+import json
+import codecs
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from cv_processor import CVProcessor
+
+# Taille des blocs lus depuis le corps de la requête
+READ_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+# Processeur propre à chaque processus du pool
+_worker_processor = None
+
+
+def _init_worker(upload_folder, download_folder):
+    """
+    Initialise le processeur d'un processus du pool, sans cache : le cache reste dans le processus principal.
+    """
+    global _worker_processor
+    logging.getLogger('CVProcessor').setLevel(logging.WARNING)
+    _worker_processor = CVProcessor(upload_folder, download_folder)
+
+
+def _analyze_in_worker(job_description):
+    """
+    Analyse une description de poste dans un processus du pool.
+    """
+    return _worker_processor._build_analysis(job_description)
+
+
+class BulkInputError(ValueError):
+    """
+    Levée lorsque le corps d'une requête d'analyse en masse ne peut plus être lu.
+    """
+
+
+def iter_ndjson(stream):
+    """
+    Lit un flux NDJSON ligne par ligne, sans le charger entièrement.
+
+    Args:
+        stream: Flux binaire (corps de la requête)
+
+    Yields:
+        tuple: (numéro de ligne, objet décodé ou None, message d'erreur ou None)
+    """
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f"Ligne {number}: JSON invalide ({str(e)})"
+
+
+def iter_json_array(stream, chunk_size=READ_CHUNK_SIZE):
+    """
+    Lit un tableau JSON élément par élément, sans le charger entièrement.
+
+    Seul l'élément en cours de lecture est conservé en mémoire ; la taille des
+    lectures double tant qu'il n'est pas complet, pour ne pas le relire trop souvent.
+
+    Args:
+        stream: Flux binaire (corps de la requête)
+        chunk_size (int): Taille des lectures en octets
+
+    Yields:
+        tuple: (position dans le tableau, élément décodé, None)
+
+    Raises:
+        BulkInputError: Si le corps n'est pas un tableau JSON valide
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='strict')
+    buffer, position, exhausted = "", 0, False
+    read_size = chunk_size
+
+    def fill():
+        nonlocal buffer, position, exhausted, read_size
+        data = stream.read(read_size)
+        exhausted = not data
+        buffer = buffer[position:] + decoder.decode(data or b"", final=exhausted)
+        position = 0
+
+    def next_char():
+        # Premier caractère significatif, en complétant le tampon si besoin
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or exhausted:
+                return buffer[position] if position < len(buffer) else None
+            fill()
+
+    try:
+        if next_char() != "[":
+            raise BulkInputError("Le corps doit être un tableau JSON ou un flux NDJSON")
+        position += 1
+        if next_char() == "]":
+            return
+
+        index = 0
+        while True:
+            next_char()
+            try:
+                item, end = _decoder.raw_decode(buffer, position)
+                # Un nombre coupé en fin de tampon serait décodé à tort : l'élément doit être suivi d'un caractère
+                if end == len(buffer) and not exhausted:
+                    raise ValueError("élément incomplet")
+            except ValueError:
+                if exhausted:
+                    raise BulkInputError(f"Élément {index} du tableau JSON invalide")
+                read_size = max(read_size, 2 * (len(buffer) - position))
+                fill()
+                continue
+            read_size = chunk_size
+            position = end
+            yield index, item, None
+            index += 1
+
+            separator = next_char()
+            position += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise BulkInputError(f"Séparateur attendu après l'élément {index - 1} du tableau JSON")
+    except UnicodeDecodeError:
+        raise BulkInputError("Le corps de la requête n'est pas encodé en UTF-8")
+
+
+class BulkAnalyzer:
+    """
+    Analyse en masse de descriptions de poste, avec des résultats diffusés au fil de l'eau.
+
+    Les descriptions sont lues une à une depuis la requête. Le cache des analyses
+    est consulté dans le processus courant ; les descriptions absentes du cache
+    sont analysées par un pool de processus commun à toutes les requêtes, qui
+    répartit l'analyse lexicale sur plusieurs cœurs, et leur résultat est mis en
+    cache au retour. Chaque requête n'a jamais plus de max_in_flight
+    descriptions en cours : la lecture de la suivante attend qu'un résultat
+    soit produit, si bien que la mémoire reste constante quelle que soit la
+    taille du lot. Les résultats sont produits dans l'ordre où ils se terminent.
+    """
+
+    def __init__(self, processor, max_workers=None, max_in_flight=8):
+        """
+        Initialise l'analyseur.
+
+        Args:
+            processor (CVProcessor): Processeur dont le cache des analyses est utilisé
+            max_workers (int): Nombre de processus analysant les descriptions (nombre de cœurs par défaut)
+            max_in_flight (int): Nombre maximum d'analyses en cours par requête
+        """
+        self.logger = logging.getLogger('bulk_analysis')
+        self.processor = processor
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.max_in_flight = max(1, max_in_flight)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        """
+        Crée le pool de processus à la première analyse, puis le réutilise.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.processor.upload_folder, self.processor.download_folder)
+                )
+                self.logger.info(f"Pool de {self.max_workers} processus créé pour l'analyse en masse")
+            return self._executor
+
+    def _discard(self, executor):
+        """
+        Remplace le pool après la perte d'un processus (BrokenProcessPool).
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """
+        Arrête le pool de processus.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def analyze(self, items):
+        """
+        Analyse des descriptions de poste en parallèle.
+
+        Args:
+            items (iterable): Tuples (position, élément décodé, erreur de lecture) produits
+                par iter_ndjson ou iter_json_array ; un élément est un objet
+                {"id": ..., "job_description": "..."}, l'identifiant valant la position par défaut
+
+        Yields:
+            dict: {"id", "success", "analysis"} ou {"id", "success", "error"}, dans l'ordre de fin
+        """
+        cache = self.processor.cache
+        executor = self._get_executor()
+        pending = {}
+        items = iter(items)
+        try:
+            while True:
+                # Lecture des éléments suivants tant que la fenêtre n'est pas pleine
+                while len(pending) < self.max_in_flight:
+                    entry = next(items, None)
+                    if entry is None:
+                        break
+                    position, item, error = entry
+                    item_id = item.get("id", position) if isinstance(item, dict) else position
+                    job_description = item.get("job_description") if isinstance(item, dict) else None
+                    if error is None and (not isinstance(job_description, str) or not job_description.strip()):
+                        error = "La description de poste est requise"
+                    if error is not None:
+                        yield {"id": item_id, "success": False, "error": error}
+                        continue
+                    key = cache.make_key("analysis", job_description) if cache is not None else None
+                    analysis = cache.get(key) if key is not None else None
+                    if analysis is not None:
+                        yield {"id": item_id, "success": True, "analysis": analysis}
+                        continue
+                    try:
+                        future = executor.submit(_analyze_in_worker, job_description)
+                    except BrokenProcessPool:
+                        self._discard(executor)
+                        executor = self._get_executor()
+                        future = executor.submit(_analyze_in_worker, job_description)
+                    pending[future] = (item_id, key, executor)
+
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item_id, key, source = pending.pop(future)
+                    try:
+                        analysis = future.result()
+                    except Exception as e:
+                        if isinstance(e, BrokenProcessPool):
+                            # Processus perdu : les analyses suivantes partent sur un nouveau pool
+                            self._discard(source)
+                            executor = self._get_executor()
+                        self.logger.warning(f"Échec de l'analyse {item_id}: {str(e)}")
+                        yield {"id": item_id, "success": False, "error": str(e)}
+                        continue
+                    if key is not None:
+                        cache.set(key, analysis)
+                    yield {"id": item_id, "success": True, "analysis": analysis}
+        finally:
+            # Client déconnecté ou lecture interrompue : les analyses non commencées sont abandonnées
+            for future in pending:
+                future.cancel()
@@ -1,59 +1,112 @@
 import os
-import re
+import json
 import uuid
+import hashlib
 import logging
 from collections import Counter
-from docx import Document
-import PyPDF2
 from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.colors import yellow
+from keyword_matcher import KeywordMatcher, normalize_token
+from document_backends import get_backend
+from job_description_lexer import JobDescriptionLexer, FRENCH_STOPWORDS
+from analysis_cache import AnalysisCache
+from parsed_cv_cache import ParsedCVCache
+from document_guard import DocumentGuard, DocumentRejectedError, address_space_peak, budget_exhausted
+from metrics import stage_timer, REGISTRY, ADAPT_DURATION, FILES_PROCESSED, KEYWORDS_EXTRACTED, KEYWORDS_HIGHLIGHTED
+
+# Termes importants pour les CV
+CV_IMPORTANT_TERMS = (
+    "expérience", "compétence", "formation", "diplôme", "certification",
+    "projet", "responsabilité", "gestion", "développement", "analyse",
+    "conception", "mise en œuvre", "coordination", "direction", "management",
+    "leadership", "stratégie", "objectif", "résultat", "performance"
+)
+
+# Version du moteur d'adaptation : l'incrémenter invalide les CV adaptés réutilisables
+ENGINE_VERSION = 4
+
+# Processeur propre à chaque processus isolé, construit à partir de la configuration du processeur parent
+_sandbox_processor = None
+
+
+def _run_in_sandbox(config, method, *args):
+    """
+    Exécute une méthode du processeur de CV dans un processus isolé.
+    
+    Args:
+        config (tuple): Configuration du processeur parent (voir CVProcessor._sandbox_config)
+        method (str): Nom de la méthode à appeler
+        *args: Arguments de la méthode ; un contenu (bytes) est transmis sous forme de flux
+    
+    Returns:
+        dict: Résultat ("result") ou exception levée ("error"), et métriques enregistrées
+            pendant l'appel ("metrics"), que seul le processus parent expose
+    """
+    global _sandbox_processor
+    if _sandbox_processor is None or _sandbox_processor[0] != config:
+        upload_folder, download_folder, parsed_cache_config, limits = config
+        parsed_cache = ParsedCVCache(*parsed_cache_config) if parsed_cache_config else None
+        processor = CVProcessor(upload_folder, download_folder, parsed_cache=parsed_cache,
+                                guard=DocumentGuard(**dict(limits)))
+        _sandbox_processor = (config, processor)
+    args = [BytesIO(arg) if isinstance(arg, bytes) else arg for arg in args]
+    before = REGISTRY.snapshot()
+    peak = address_space_peak()
+    try:
+        outcome = {"result": getattr(_sandbox_processor[1], method)(*args)}
+    except MemoryError:
+        # Budget dépassé : transmis tel quel, SandboxPool.run le convertit en refus explicite
+        raise
+    except Exception as e:
+        if budget_exhausted(peak):
+            raise MemoryError(str(e)) from e
+        # Les refus sont aussi comptés ici : l'exception est relevée dans le parent avec les métriques
+        outcome = {"error": e}
+    outcome["metrics"] = REGISTRY.delta(before)
+    return outcome
+
 
 class CVProcessor:
     """
     Classe pour le traitement avancé des CV en fonction des descriptions de poste.
     """
     
-    def __init__(self, upload_folder, download_folder):
+    def __init__(self, upload_folder, download_folder, cache=None, storage=None, artifact_ttl_hours=24,
+                 parsed_cache=None, guard=None, sandbox=None):
         """
         Initialise le processeur de CV avec les dossiers de stockage.
         
         Args:
             upload_folder (str): Chemin vers le dossier de téléchargement des CV
             download_folder (str): Chemin vers le dossier de stockage des CV adaptés
+            cache (AnalysisCache): Cache optionnel des analyses de descriptions de poste
+            storage (StorageManager): Gestionnaire de stockage optionnel pour réutiliser les CV déjà adaptés
+            artifact_ttl_hours (int): Durée de vie d'un CV adapté, prolongée à chaque réutilisation
+            parsed_cache (ParsedCVCache): Cache optionnel des CV analysés, pour adapter un même CV à plusieurs offres
+            guard (DocumentGuard): Limites vérifiées avant l'analyse d'un document (limites par défaut sinon)
+            sandbox (SandboxPool): Pool optionnel de processus isolés sous budget mémoire, où sont traités les documents
         """
         self.upload_folder = upload_folder
         self.download_folder = download_folder
+        self.cache = cache
+        self.storage = storage
+        self.artifact_ttl_hours = artifact_ttl_hours
+        self.parsed_cache = parsed_cache
+        self.guard = guard if guard is not None else DocumentGuard()
+        self.sandbox = sandbox
         
-        # Configuration du logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
         self.logger = logging.getLogger('CVProcessor')
         
         # Assurer que les dossiers existent
         os.makedirs(upload_folder, exist_ok=True)
         os.makedirs(download_folder, exist_ok=True)
         
-        # Mots vides français
-        self.stopwords = [
-            "le", "la", "les", "un", "une", "des", "et", "ou", "de", "du", "au", "aux",
-            "ce", "cette", "ces", "mon", "ton", "son", "notre", "votre", "leur",
-            "pour", "par", "sur", "sous", "dans", "avec", "sans", "en", "à", "qui",
-            "que", "quoi", "dont", "où", "comment", "pourquoi", "quand", "est", "sont",
-            "sera", "seront", "été", "avoir", "être", "faire", "plus", "moins", "très",
-            "si", "tout", "tous", "toute", "toutes", "autre", "autres", "même", "aussi",
-            "alors", "donc", "car", "mais", "ou", "ni", "ne", "pas", "plus", "moins"
-        ]
-        
-        # Termes importants pour les CV
-        self.cv_important_terms = [
-            "expérience", "compétence", "formation", "diplôme", "certification",
-            "projet", "responsabilité", "gestion", "développement", "analyse",
-            "conception", "mise en œuvre", "coordination", "direction", "management",
-            "leadership", "stratégie", "objectif", "résultat", "performance"
-        ]
+        # Mots vides français et analyseur lexical des descriptions de poste
+        self.stopwords = FRENCH_STOPWORDS
+        self.lexer = JobDescriptionLexer(self.stopwords)
+        
+        # Termes importants pour les CV, recherchés dans les descriptions y compris sur plusieurs mots
+        self.cv_important_terms = CV_IMPORTANT_TERMS
+        self.cv_terms_matcher = KeywordMatcher(self.cv_important_terms)
     
     def extract_keywords_from_job_description(self, job_description):
         """
@@ -66,266 +119,348 @@ class CVProcessor:
             dict: Dictionnaire des mots-clés par catégorie avec leur score d'importance
         """
         self.logger.info("Extraction des mots-clés de la description de poste")
+        with stage_timer("keyword_extraction"):
+            if self.cache is not None:
+                return self.cache.get_or_compute(
+                    "keywords", job_description,
+                    lambda: self._build_keywords(self.lexer.lex(job_description), job_description)
+                )
+            return self._build_keywords(self.lexer.lex(job_description), job_description)
+    
+    def _build_keywords(self, lexed, job_description):
+        """
+        Construit le dictionnaire des mots-clés à partir du résultat de l'analyse lexicale.
         
-        # Nettoyage du texte
-        job_description = job_description.lower()
-        
-        # Extraction des mots
-        words = re.findall(r'\b\w{3,}\b', job_description)
-        
-        # Filtrage des mots vides et comptage des occurrences
-        filtered_words = [word for word in words if word not in self.stopwords]
-        word_counts = Counter(filtered_words)
+        Les variantes d'un même mot (accents, casse, pluriel) sont comptées ensemble
+        sous leur première forme rencontrée.
         
-        # Identification des sections importantes
-        sections = {
-            "compétences": self._extract_section(job_description, ["compétences", "qualifications", "profil", "requis"]),
-            "responsabilités": self._extract_section(job_description, ["responsabilités", "missions", "tâches", "rôle"]),
-            "formation": self._extract_section(job_description, ["formation", "diplôme", "études", "éducation"]),
-            "expérience": self._extract_section(job_description, ["expérience", "parcours", "antécédents"])
-        }
+        Args:
+            lexed (dict): Résultat de JobDescriptionLexer.lex
+            job_description (str): Description du poste, où sont recherchés les termes de plusieurs mots
+            
+        Returns:
+            dict: Dictionnaire des mots-clés par catégorie avec leur score d'importance
+        """
+        filtered_words = lexed["words"]
+        forms = {}
+        key_counts = Counter()
+        for word in filtered_words:
+            key = normalize_token(word)
+            forms.setdefault(key, word)
+            key_counts[key] += 1
         
         # Analyse des mots-clés par section
         keywords = {}
         
         # Mots-clés généraux (apparaissant au moins 2 fois)
-        keywords["général"] = {word: count for word, count in word_counts.items() if count >= 2}
+        keywords["général"] = {forms[key]: count for key, count in key_counts.items() if count >= 2}
         
         # Mots-clés par section
-        for section_name, section_text in sections.items():
-            if section_text:
-                section_words = re.findall(r'\b\w{3,}\b', section_text.lower())
-                section_filtered = [word for word in section_words if word not in self.stopwords]
-                section_counts = Counter(section_filtered)
-                keywords[section_name] = {word: count for word, count in section_counts.items()}
+        for section_name, section_words in lexed["sections"].items():
+            keywords[section_name] = dict(Counter(section_words))
         
         # Mots longs (potentiellement importants)
-        long_words = {word: 1 for word in filtered_words if len(word) > 7 and word not in keywords["général"]}
+        long_words = {word: 1 for word in filtered_words if len(word) > 7 and key_counts[normalize_token(word)] < 2}
         keywords["termes_spécifiques"] = long_words
         
-        # Termes importants pour les CV
-        cv_terms = {word: 2 for word in self.cv_important_terms if word in filtered_words}
-        keywords["termes_cv"] = cv_terms
+        # Termes importants pour les CV, recherchés dans le texte pour reconnaître les expressions
+        keywords["termes_cv"] = {term: 2 for term in sorted(self.cv_terms_matcher.find_keywords(job_description))}
         
-        self.logger.info(f"Extraction terminée: {sum(len(v) for v in keywords.values())} mots-clés trouvés")
+        total = sum(len(v) for v in keywords.values())
+        KEYWORDS_EXTRACTED.inc(total)
+        self.logger.info(f"Extraction terminée: {total} mots-clés trouvés")
         return keywords
     
-    def _extract_section(self, text, section_markers):
+    def adapt_cv(self, cv_source, job_description, keywords=None, file_ext=None):
         """
-        Extrait une section spécifique du texte basée sur des marqueurs.
+        Adapte un CV en fonction d'une description de poste avec mise en évidence avancée.
+        
+        Le CV adapté est écrit une seule fois dans le dossier de stockage.
         
         Args:
-            text (str): Texte complet
-            section_markers (list): Liste des marqueurs de section
+            cv_source (str ou fichier): Chemin vers le fichier CV ou objet fichier binaire
+            job_description (str): Description du poste
+            keywords (dict): Mots-clés déjà extraits de la description, pour éviter une nouvelle extraction
+            file_ext (str): Extension du CV (obligatoire pour un objet fichier)
             
         Returns:
-            str: Texte de la section ou chaîne vide si non trouvée
-        """
-        for marker in section_markers:
-            pattern = rf'{marker}\s*:(.+?)(?:\n\n|\Z)'
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-            if match:
-                return match.group(1).strip()
-        return ""
+            dict: Informations sur le CV adapté (nom du fichier, statistiques)
+        """
+        if isinstance(cv_source, (str, os.PathLike)):
+            self.logger.info(f"Adaptation du CV: {cv_source}")
+            
+            # Vérifier que le fichier existe
+            if not os.path.exists(cv_source):
+                error_msg = f"Le fichier CV n'existe pas: {cv_source}"
+                self.logger.error(error_msg)
+                raise FileNotFoundError(error_msg)
+            
+            file_ext = file_ext or os.path.splitext(cv_source)[1]
+        file_ext = (file_ext or '').lower()
+        
+        # L'empreinte du CV est calculée une fois pour les deux caches
+        cv_hash = None
+        if self.storage is not None or self.parsed_cache is not None:
+            cv_hash = self._content_hash(cv_source)
+        
+        # Réutiliser le CV adapté si ce même CV a déjà été adapté à cette même offre
+        content_key = None
+        if self.storage is not None:
+            content_key = self._artifact_key(cv_source, file_ext, job_description, keywords, cv_hash=cv_hash)
+            artifact = self.storage.acquire_artifact(content_key, self.artifact_ttl_hours)
+            if artifact is not None:
+                self.logger.info(f"CV adapté réutilisé: {artifact['filename']}")
+                return {
+                    "filename": artifact["filename"],
+                    "stats": artifact["result"]["stats"],
+                    "keywords": artifact["result"]["keywords"],
+                    "reused": True
+                }
+        
+        result = self.adapt_document(cv_source, file_ext, job_description, keywords=keywords, cv_hash=cv_hash)
+        
+        try:
+            # Nom dérivé du contenu lorsqu'il est connu, unique sinon
+            output_filename = f"cv_adapte_{content_key[:32] if content_key else uuid.uuid4().hex}{file_ext}"
+            output_path = os.path.join(self.download_folder, output_filename)
+            
+            # Étape de persistance : une seule écriture du document produit,
+            # rendue visible de manière atomique en cas de demandes simultanées
+            temp_path = f"{output_path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(temp_path, 'wb') as output_file:
+                output_file.write(result["content"])
+            os.replace(temp_path, output_path)
+        except OSError as e:
+            error_msg = f"Échec de la création du fichier adapté: {str(e)}"
+            self.logger.error(error_msg)
+            raise IOError(error_msg)
+        
+        if content_key is not None:
+            self.storage.register_artifact(
+                content_key, output_filename,
+                {"stats": result["stats"], "keywords": result["keywords"]},
+                self.artifact_ttl_hours
+            )
+        
+        self.logger.info(f"CV adapté avec succès: {output_filename}")
+        
+        return {
+            "filename": output_filename,
+            "stats": result["stats"],
+            "keywords": result["keywords"],
+            "reused": False
+        }
     
-    def _annotate_pdf_page(self, page, text, keywords):
+    @staticmethod
+    def _content_hash(cv_source):
         """
-        Ajoute des annotations sur une page PDF pour mettre en évidence les mots-clés.
+        Calcule l'empreinte du contenu d'un CV sans modifier la position d'un flux.
         
         Args:
-            page: Page PDF à annoter
-            text (str): Texte extrait de la page
-            keywords (list): Liste des mots-clés à mettre en évidence
-        """
-        # Créer un canvas pour les annotations
-        packet = BytesIO()
-        can = canvas.Canvas(packet, pagesize=page.mediabox)
-        
-        # Trouver les positions des mots-clés dans le texte
-        for keyword in keywords:
-            start = 0
-            while True:
-                pos = text.lower().find(keyword.lower(), start)
-                if pos == -1:
-                    break
-                    
-                # Calculer la position approximative sur la page
-                # Note: Cette méthode est simplifiée et pourrait être améliorée
-                x = pos * 7  # Approximation grossière
-                y = page.mediabox.height - (pos // 50 * 12)  # Approximation grossière
-                
-                # Ajouter une annotation en surbrillance
-                can.setFillColor(yellow, alpha=0.3)
-                can.rect(x, y, len(keyword) * 7, 12, fill=True)
-                
-                start = pos + 1
-        
-        can.save()
-        packet.seek(0)
-        
-        # Créer une nouvelle page avec les annotations
-        new_pdf = PyPDF2.PdfReader(packet)
-        page.merge_page(new_pdf.pages[0])
-        
-        return page
-
-    def adapt_cv(self, cv_path, job_description):
+            cv_source (str ou fichier): Chemin vers le fichier CV ou objet fichier binaire
+            
+        Returns:
+            str: Empreinte SHA-256 hexadécimale
         """
-        Adapte un CV en fonction d'une description de poste avec mise en évidence avancée.
+        digest = hashlib.sha256()
+        if isinstance(cv_source, (str, os.PathLike)):
+            with open(cv_source, 'rb') as cv_file:
+                for chunk in iter(lambda: cv_file.read(64 * 1024), b''):
+                    digest.update(chunk)
+        else:
+            position = cv_source.tell()
+            for chunk in iter(lambda: cv_source.read(64 * 1024), b''):
+                digest.update(chunk)
+            cv_source.seek(position)
+        return digest.hexdigest()
+    
+    def _artifact_key(self, cv_source, file_ext, job_description, keywords=None, cv_hash=None):
+        """
+        Calcule la clé de contenu d'un CV adapté.
+        
+        La clé combine l'empreinte du CV, la description de poste normalisée
+        (ou les mots-clés fournis) et la version du moteur d'adaptation.
         
         Args:
-            cv_path (str): Chemin vers le fichier CV
+            cv_source (str ou fichier): Chemin vers le fichier CV ou objet fichier binaire
+            file_ext (str): Extension du CV
             job_description (str): Description du poste
+            keywords (dict): Mots-clés déjà extraits de la description
+            cv_hash (str): Empreinte du CV si elle est déjà connue
             
         Returns:
-            dict: Informations sur le CV adapté (nom du fichier, statistiques)
+            str: Empreinte SHA-256 hexadécimale
         """
-        self.logger.info(f"Adaptation du CV: {cv_path}")
+        digest = hashlib.sha256(f"{ENGINE_VERSION}:{file_ext}:".encode('utf-8'))
+        digest.update((cv_hash or self._content_hash(cv_source)).encode('utf-8'))
+        
+        if job_description is not None:
+            target = AnalysisCache.normalize(job_description)
+        else:
+            target = json.dumps(keywords, sort_keys=True, ensure_ascii=False)
+        digest.update(b'\0' + target.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def adapt_document(self, cv_source, file_ext, job_description, keywords=None, cv_hash=None):
+        """
+        Adapte un CV entièrement en mémoire, sans écriture sur disque.
         
-        # Vérifier que le fichier existe
-        if not os.path.exists(cv_path):
-            error_msg = f"Le fichier CV n'existe pas: {cv_path}"
-            self.logger.error(error_msg)
-            raise FileNotFoundError(error_msg)
-            
-        # Extraire les mots-clés de la description du poste
-        keywords_dict = self.extract_keywords_from_job_description(job_description)
+        Avec un cache des CV analysés, l'analyse du document n'est faite qu'à sa
+        première adaptation ; les suivantes ne paient que la recherche des
+        mots-clés et la production du document.
         
-        # Créer une liste plate de tous les mots-clés
-        all_keywords = []
-        for category, words in keywords_dict.items():
-            all_keywords.extend(words.keys())
+        Args:
+            cv_source (str ou fichier): Chemin vers le fichier CV ou objet fichier binaire
+            file_ext (str): Extension du CV ('.docx' ou '.pdf')
+            job_description (str): Description du poste
+            keywords (dict): Mots-clés déjà extraits de la description, pour éviter une nouvelle extraction
+            cv_hash (str): Empreinte du CV si elle est déjà connue
+            
+        Returns:
+            dict: Contenu du CV adapté (bytes), statistiques et mots-clés
+        """
+        # Détecter le type de fichier
+        file_ext = (file_ext or '').lower()
+        file_type = file_ext.lstrip('.') or 'inconnu'
+        
+        with ADAPT_DURATION.time(file_type=file_type):
+            # Extraire les mots-clés de la description du poste
+            if keywords is None:
+                keywords_dict = self.extract_keywords_from_job_description(job_description)
+            else:
+                keywords_dict = keywords
+            
+            if self.sandbox is not None:
+                # Le document est analysé dans un processus isolé, sous budget mémoire
+                content, stats = self._run_sandboxed(
+                    '_render_document', self._sandbox_source(cv_source), file_ext, keywords_dict, cv_hash
+                )
+            else:
+                content, stats = self._render_document(cv_source, file_ext, keywords_dict, cv_hash)
+        
+        FILES_PROCESSED.inc(file_type=file_type)
+        KEYWORDS_HIGHLIGHTED.inc(stats["highlighted_keywords"], file_type=file_type)
+        self.logger.info(f"Statistiques: {stats}")
+        
+        return {
+            "content": content,
+            "stats": stats,
+            "keywords": keywords_dict
+        }
+    
+    def _render_document(self, cv_source, file_ext, keywords_dict, cv_hash=None):
+        """
+        Produit en mémoire le CV adapté à des mots-clés déjà extraits.
         
-        # Éliminer les doublons
-        all_keywords = list(set(all_keywords))
+        Étape exécutée dans un processus isolé lorsqu'un pool est configuré ;
+        les totaux par document sont enregistrés par adapt_document.
         
-        # Détecter le type de fichier
-        file_ext = os.path.splitext(cv_path)[1].lower()
+        Returns:
+            tuple: (contenu du CV adapté en bytes, statistiques)
+        """
+        # Créer une liste plate de tous les mots-clés, sans doublons
+        all_keywords = list({word for words in keywords_dict.values() for word in words})
+        output = BytesIO()
         
         try:
-            # Détecter et traiter selon le type de fichier
-            if file_ext == '.docx':
-                # Traitement des fichiers Word
-                doc = Document(cv_path)
-                
-                # Statistiques
-                stats = {
-                    "total_keywords": len(all_keywords),
-                    "highlighted_keywords": 0,
-                    "paragraphs_modified": 0
-                }
-                
-                # Adapter le CV en mettant en évidence les compétences pertinentes
-                for paragraph in doc.paragraphs:
-                    paragraph_modified = False
-                    
-                    for keyword in all_keywords:
-                        if keyword in paragraph.text.lower():
-                            # Mettre en gras les mots-clés trouvés
-                            pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-                            
-                            # Sauvegarde du texte original
-                            original_text = paragraph.text
-                            
-                            # Effacer le contenu du paragraphe
-                            paragraph.clear()
-                            
-                            # Trouver toutes les occurrences du mot-clé
-                            matches = list(pattern.finditer(original_text))
-                            
-                            # Si aucune correspondance, continuer
-                            if not matches:
-                                paragraph.add_run(original_text)
-                                continue
-                            
-                            # Ajouter le texte avec les mots-clés en gras
-                            last_end = 0
-                            for match in matches:
-                                # Ajouter le texte avant le mot-clé
-                                if match.start() > last_end:
-                                    paragraph.add_run(original_text[last_end:match.start()])
-                                
-                                # Ajouter le mot-clé souligné
-                                paragraph.add_run(original_text[match.start():match.end()]).underline = True
-                                stats["highlighted_keywords"] += 1
-                                
-                                last_end = match.end()
-                            
-                            # Ajouter le reste du texte
-                            if last_end < len(original_text):
-                                paragraph.add_run(original_text[last_end:])
-                            
-                            paragraph_modified = True
-                    
-                    if paragraph_modified:
-                        stats["paragraphs_modified"] += 1
-                
-            elif file_ext == '.pdf':
-                # Traitement des fichiers PDF
-                with open(cv_path, 'rb') as pdf_file:
-                    pdf_reader = PyPDF2.PdfReader(pdf_file)
-                    pdf_writer = PyPDF2.PdfWriter()
-                    
-                    # Statistiques
-                    stats = {
-                        "total_keywords": len(all_keywords),
-                        "highlighted_keywords": 0,
-                        "pages_modified": 0
-                    }
-                    
-                    # Traiter chaque page du PDF
-                    for page_num in range(len(pdf_reader.pages)):
-                        page = pdf_reader.pages[page_num]
-                        text = page.extract_text()
-                        
-                        if text:
-                            # Vérifier les mots-clés dans le texte
-                            for keyword in all_keywords:
-                                if keyword in text.lower():
-                                    stats["highlighted_keywords"] += text.lower().count(keyword)
-                            
-                            if stats["highlighted_keywords"] > 0:
-                                # Annoter la page avec les mots-clés trouvés
-                                page = self._annotate_pdf_page(page, text, all_keywords)
-                                stats["pages_modified"] += 1
-                            
-                            # Ajouter la page au writer
-                            pdf_writer.add_page(page)
-            
-            # Générer un nom de fichier unique pour le CV adapté
-            output_filename = f"cv_adapte_{uuid.uuid4().hex}{file_ext}"
-            output_path = os.path.join(self.download_folder, output_filename)
-            
-            # Assurer que le dossier de destination existe
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            # Sauvegarder le document modifié selon le type de fichier
-            if file_ext == '.docx':
-                doc.save(output_path)
-            elif file_ext == '.pdf':
-                # Pour les PDF, on sauvegarde le fichier modifié
-                with open(output_path, 'wb') as output_file:
-                    pdf_writer.write(output_file)
-            
-            # Vérifier que le fichier a bien été créé
-            if not os.path.exists(output_path):
-                error_msg = f"Échec de la création du fichier adapté: {output_path}"
-                self.logger.error(error_msg)
-                raise IOError(error_msg)
-            
-            self.logger.info(f"CV adapté avec succès: {output_filename}")
-            self.logger.info(f"Statistiques: {stats}")
-            
-            return {
-                "filename": output_filename,
-                "stats": stats,
-                "keywords": keywords_dict
-            }
-            
+            # Moteur du format, importé au premier usage
+            highlighter = get_backend(file_ext)(KeywordMatcher(all_keywords))
+            stats = {"total_keywords": len(all_keywords)}
+            if self.parsed_cache is not None:
+                stats.update(self._render_cached(highlighter, cv_source, file_ext, output, cv_hash))
+            else:
+                self.guard.inspect(cv_source, file_ext)
+                stats.update(highlighter.highlight(cv_source, output))
+        
+        except (DocumentRejectedError, MemoryError):
+            # Refus explicites, transmis tels quels (y compris depuis un processus isolé)
+            raise
         except Exception as e:
             error_msg = f"Erreur lors de l'adaptation du CV: {str(e)}"
             self.logger.error(error_msg)
             raise Exception(error_msg)
+        
+        return output.getvalue(), stats
+    
+    def extract_text(self, cv_source, file_ext=None, cv_hash=None):
+        """
+        Extrait le texte d'un CV, en réutilisant sa représentation analysée si elle est en cache.
+        
+        Args:
+            cv_source (str ou fichier): Chemin vers le fichier CV ou objet fichier binaire
+            file_ext (str): Extension du CV (déduite du chemin par défaut)
+            cv_hash (str): Empreinte du CV si elle est déjà connue
+            
+        Returns:
+            str: Texte du CV
+        """
+        if file_ext is None and isinstance(cv_source, (str, os.PathLike)):
+            file_ext = os.path.splitext(cv_source)[1]
+        file_ext = (file_ext or '').lower()
+        if self.sandbox is not None:
+            return self._run_sandboxed('extract_text', self._sandbox_source(cv_source), file_ext, cv_hash)
+        
+        backend = get_backend(file_ext)(KeywordMatcher([]))
+        if self.parsed_cache is None:
+            return backend.parsed_text(self._guarded_parse(backend, cv_source, file_ext))
+        key = self.parsed_cache.make_key(cv_hash or self._content_hash(cv_source), file_ext)
+        position = None if isinstance(cv_source, (str, os.PathLike)) else cv_source.tell()
+        parsed = self.parsed_cache.get_or_parse(key, lambda: self._guarded_parse(backend, cv_source, file_ext))
+        if position is not None:
+            cv_source.seek(position)
+        return backend.parsed_text(parsed)
+    
+    def _guarded_parse(self, backend, cv_source, file_ext):
+        """
+        Analyse un document après l'inspection de ses limites de ressources.
+        """
+        self.guard.inspect(cv_source, file_ext)
+        return backend.parse(cv_source)
+    
+    def _render_cached(self, highlighter, cv_source, file_ext, output, cv_hash=None):
+        """
+        Produit le CV adapté à partir de sa représentation analysée, mise en cache au premier usage.
+        
+        Un document déjà en cache a été inspecté lors de sa première analyse.
+        """
+        key = self.parsed_cache.make_key(cv_hash or self._content_hash(cv_source), file_ext)
+        position = None if isinstance(cv_source, (str, os.PathLike)) else cv_source.tell()
+        parsed = self.parsed_cache.get_or_parse(key, lambda: self._guarded_parse(highlighter, cv_source, file_ext))
+        if position is not None:
+            cv_source.seek(position)
+        return highlighter.render(cv_source, parsed, output)
+    
+    def _sandbox_config(self):
+        """
+        Configuration sérialisable permettant de reconstruire ce processeur dans un processus isolé.
+        """
+        parsed_cache_config = None
+        if self.parsed_cache is not None:
+            parsed_cache_config = (self.parsed_cache.directory, self.parsed_cache.max_bytes)
+        return (self.upload_folder, self.download_folder, parsed_cache_config,
+                tuple(sorted(self.guard.limits().items())))
+    
+    def _run_sandboxed(self, method, *args):
+        """
+        Exécute une méthode dans le pool de processus isolés et enregistre ici les métriques qu'elle a produites.
+        """
+        outcome = self.sandbox.run(_run_in_sandbox, self._sandbox_config(), method, *args)
+        REGISTRY.merge(outcome["metrics"])
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+    
+    @staticmethod
+    def _sandbox_source(cv_source):
+        """
+        Chemin du CV, ou contenu d'un flux (sans modifier sa position), à transmettre à un processus isolé.
+        """
+        if isinstance(cv_source, (str, os.PathLike)):
+            return os.fspath(cv_source)
+        position = cv_source.tell()
+        data = cv_source.read()
+        cv_source.seek(position)
+        return data
     
     def analyze_job_description(self, job_description):
         """
@@ -339,45 +474,36 @@ class CVProcessor:
         """
         self.logger.info("Analyse de la description de poste")
         
-        # Extraction des compétences techniques potentielles
-        tech_skills_pattern = r'compétences\s+techniques.*?:(.*?)(?:\n\n|\Z)'
-        tech_skills_match = re.search(tech_skills_pattern, job_description, re.IGNORECASE | re.DOTALL)
-        tech_skills = []
-        if tech_skills_match:
-            tech_skills_text = tech_skills_match.group(1)
-            tech_skills = [skill.strip() for skill in re.split(r'[,;•]', tech_skills_text) if skill.strip()]
-        
-        # Extraction du niveau d'expérience requis
-        experience_pattern = r'(\d+)[+]?\s+ans?\s+d\'expérience'
-        experience_match = re.search(experience_pattern, job_description, re.IGNORECASE)
-        experience_years = experience_match.group(1) if experience_match else None
-        
-        # Extraction du niveau d'études requis
-        education_patterns = [
-            r'(bac\s*[+]\s*\d+)',
-            r'(master|licence|doctorat)',
-            r'(diplôme\s+d\'ingénieur)'
-        ]
-        education = None
-        for pattern in education_patterns:
-            match = re.search(pattern, job_description, re.IGNORECASE)
-            if match:
-                education = match.group(1)
-                break
-        
-        # Extraction du type de contrat
-        contract_pattern = r'\b(cdi|cdd|stage|alternance|freelance|intérim)\b'
-        contract_match = re.search(contract_pattern, job_description, re.IGNORECASE)
-        contract_type = contract_match.group(1).upper() if contract_match else None
-        
-        # Résultats de l'analyse
-        analysis = {
-            "keywords": self.extract_keywords_from_job_description(job_description),
-            "technical_skills": tech_skills,
-            "experience_years": experience_years,
-            "education": education,
-            "contract_type": contract_type
-        }
+        # Analyse lexicale d'un texte : traitée dans ce processus, même lorsque les documents sont isolés
+        if self.cache is not None:
+            analysis = self.cache.get_or_compute(
+                "analysis", job_description,
+                lambda: self._build_analysis(job_description)
+            )
+        else:
+            analysis = self._build_analysis(job_description)
         
         self.logger.info("Analyse de la description de poste terminée")
         return analysis
+    
+    def _build_analysis(self, job_description):
+        """
+        Construit l'analyse structurée d'une description de poste.
+        
+        Args:
+            job_description (str): Description du poste
+            
+        Returns:
+            dict: Informations extraites de la description du poste
+        """
+        # Un seul parcours du texte alimente les mots-clés et les informations structurées
+        lexed = self.lexer.lex(job_description)
+        
+        # Résultats de l'analyse
+        return {
+            "keywords": self._build_keywords(lexed, job_description),
+            "technical_skills": lexed["technical_skills"],
+            "experience_years": lexed["experience_years"],
+            "education": lexed["education"],
+            "contract_type": lexed["contract_type"]
+        }
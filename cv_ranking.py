@@ -0,0 +1,520 @@
+import os
+import json
+import math
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import Counter
+import numpy as np
+from job_description_lexer import JobDescriptionLexer
+from metrics import stage_timer
+
+
+class _GrowableArray:
+    """
+    Tableau NumPy extensible par ajouts successifs, à capacité doublée.
+    """
+
+    def __init__(self, dtype, capacity=1024):
+        self._data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        end = self.size + len(values)
+        if end > len(self._data):
+            grown = np.empty(max(end, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+        self._data[self.size:end] = values
+        self.size = end
+
+    def replace(self, values):
+        self._data = np.array(values, dtype=self._data.dtype)
+        self.size = len(values)
+
+    @property
+    def view(self):
+        return self._data[:self.size]
+
+
+def _row_sums(values, indptr):
+    """
+    Somme des valeurs de chaque ligne d'une matrice CSR, lignes vides comprises.
+    """
+    rows = len(indptr) - 1
+    if rows == 0:
+        return np.zeros(0, dtype=np.float64)
+    if len(values) == 0:
+        return np.zeros(rows, dtype=np.float64)
+    starts = np.minimum(indptr[:-1], len(values) - 1)
+    sums = np.add.reduceat(values, starts, dtype=np.float64)
+    # reduceat retourne l'élément de départ pour une ligne vide
+    sums[indptr[:-1] == indptr[1:]] = 0.0
+    return sums
+
+
+class CVRanker:
+    """
+    Classement des CV stockés par adéquation à une description de poste.
+
+    Les CV sont découpés avec le même analyseur lexical que les descriptions de
+    poste, puis représentés dans une matrice creuse CSR (une ligne par CV, une
+    colonne par terme, poids 1 + log(tf)). Les pondérations IDF sont appliquées
+    au moment de la requête, si bien qu'un ajout ne réécrit jamais la matrice :
+    il s'ajoute en fin de tableaux. Une vue par colonnes de la matrice (listes
+    des CV actifs contenant chaque terme) est construite à la première requête :
+    une description de poste n'est évaluée que sur les colonnes de ses propres
+    termes, et les lignes ajoutées depuis la construction de la vue sont
+    évaluées sur la matrice par lignes jusqu'à sa reconstruction.
+
+    Les documents sont persistés dans SQLite sous forme de journal (ajouts et
+    suppressions ordonnés) : chaque worker rattrape les entrées qu'il n'a pas
+    encore vues avant de répondre, et les suppressions sont des marqueurs dont
+    les lignes sont compactées lorsqu'elles deviennent trop nombreuses. Un
+    instantané de la matrice (.npz) est enregistré régulièrement, si bien qu'un
+    worker qui démarre ne rejoue que la fin du journal.
+    """
+
+    def __init__(self, db_path, lexer=None, compact_ratio=0.25, tombstone_ttl=7 * 86400, sync_batch_size=1000,
+                 snapshot_every=1000, norm_refresh_ratio=0.05, postings_refresh_ratio=0.1):
+        """
+        Initialise le classement.
+
+        Args:
+            db_path (str): Chemin de la base SQLite des documents
+            lexer (JobDescriptionLexer): Analyseur lexical partagé avec l'extraction des mots-clés
+            compact_ratio (float): Proportion de lignes supprimées déclenchant un compactage
+            tombstone_ttl (int): Durée de conservation des marqueurs de suppression en secondes
+            sync_batch_size (int): Nombre d'entrées du journal intégrées par bloc
+            snapshot_every (int): Nombre minimum d'entrées intégrées entre deux instantanés
+            norm_refresh_ratio (float): Proportion de CV modifiés au-delà de laquelle toutes les normes sont recalculées
+            postings_refresh_ratio (float): Proportion de CV ajoutés au-delà de laquelle la vue par colonnes est reconstruite
+        """
+        self.logger = logging.getLogger('cv_ranking')
+        self.db_path = str(db_path)
+        self.lexer = lexer or JobDescriptionLexer()
+        self.compact_ratio = compact_ratio
+        self.tombstone_ttl = tombstone_ttl
+        self.sync_batch_size = sync_batch_size
+        self.snapshot_path = os.path.splitext(self.db_path)[0] + '.npz'
+        self.snapshot_every = snapshot_every
+        self.norm_refresh_ratio = norm_refresh_ratio
+        self.postings_refresh_ratio = postings_refresh_ratio
+
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._last_seq = 0
+        self._since_snapshot = 0
+
+        # Vocabulaire et fréquences documentaires des CV actifs
+        self._terms = {}
+        self._vocabulary = []
+        self._df = _GrowableArray(np.int64)
+
+        # Matrice CSR des CV : pointeurs de lignes, colonnes et poids
+        self._indptr = _GrowableArray(np.int64)
+        self._indptr.extend([0])
+        self._indices = _GrowableArray(np.int32)
+        self._weights = _GrowableArray(np.float32)
+
+        self._doc_ids = []
+        self._names = []
+        self._rows = {}
+        self._alive = _GrowableArray(np.bool_)
+        self._dead = 0
+
+        # Normes des lignes, complétées pour les nouveaux CV et recalculées
+        # intégralement lorsque le corpus a suffisamment changé
+        self._norms = None
+        self._norms_basis = 0
+        self._changes = 0
+
+        # Vue par colonnes des lignes actives lors de sa construction :
+        # (pointeurs de colonnes, lignes, poids, nombre de lignes couvertes)
+        self._postings = None
+
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cv_documents ("
+                    "seq INTEGER PRIMARY KEY AUTOINCREMENT, doc_id TEXT NOT NULL, name TEXT, "
+                    "terms TEXT, removed INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_cv_documents_doc ON cv_documents(doc_id)")
+        finally:
+            conn.close()
+
+        self._load_snapshot()
+
+    def _connection(self):
+        """
+        Retourne la connexion SQLite du thread courant.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def tokenize(self, text):
+        """
+        Découpe un texte en termes avec l'analyseur des descriptions de poste.
+
+        Returns:
+            Counter: Nombre d'occurrences de chaque terme
+        """
+        return Counter(self.lexer.lex(text or "")["words"])
+
+    def add(self, doc_id, text, name=None):
+        """
+        Ajoute (ou remplace) un CV dans le corpus classé.
+
+        Args:
+            doc_id (str): Identifiant du CV stocké
+            text (str): Texte extrait du CV
+            name (str): Nom affiché du CV
+
+        Returns:
+            int: Nombre de termes distincts du CV
+        """
+        terms = self.tokenize(text)
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM cv_documents WHERE doc_id = ? AND removed = 0", (doc_id,))
+            conn.execute(
+                "INSERT INTO cv_documents (doc_id, name, terms, created_at) VALUES (?, ?, ?, ?)",
+                (doc_id, name, json.dumps(terms, ensure_ascii=False), time.time())
+            )
+        return len(terms)
+
+    def remove(self, doc_id):
+        """
+        Retire un CV du corpus classé.
+
+        Args:
+            doc_id (str): Identifiant du CV stocké
+        """
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            deleted = conn.execute("DELETE FROM cv_documents WHERE doc_id = ? AND removed = 0", (doc_id,)).rowcount
+            if deleted:
+                # Marqueur destiné aux workers ayant déjà chargé le CV
+                conn.execute(
+                    "INSERT INTO cv_documents (doc_id, removed, created_at) VALUES (?, 1, ?)", (doc_id, now)
+                )
+            conn.execute(
+                "DELETE FROM cv_documents WHERE removed = 1 AND created_at < ?", (now - self.tombstone_ttl,)
+            )
+
+    def sync(self):
+        """
+        Intègre les ajouts et suppressions enregistrés depuis la dernière synchronisation.
+
+        Returns:
+            int: Nombre d'entrées du journal appliquées
+        """
+        conn = self._connection()
+        with self._lock:
+            cursor = conn.execute(
+                "SELECT seq, doc_id, name, terms, removed FROM cv_documents WHERE seq > ? ORDER BY seq",
+                (self._last_seq,)
+            )
+            applied = 0
+            while True:
+                rows = cursor.fetchmany(self.sync_batch_size)
+                if not rows:
+                    break
+                # Les ajouts d'un lot sont intégrés en un seul bloc ; une entrée plus
+                # récente du même CV remplace la précédente
+                pending = {}
+                for seq, doc_id, name, terms, removed in rows:
+                    pending.pop(doc_id, None)
+                    self._discard(doc_id)
+                    if not removed:
+                        pending[doc_id] = (name, json.loads(terms))
+                    self._last_seq = seq
+                self._append(pending)
+                applied += len(rows)
+            if not applied:
+                return 0
+
+            if self._dead > self.compact_ratio * max(len(self._doc_ids), 1):
+                self._compact()
+            self._since_snapshot += applied
+            if self._since_snapshot >= max(self.snapshot_every, 0.1 * len(self._rows)):
+                self.save_snapshot()
+            return applied
+
+    def _append(self, documents):
+        """
+        Ajoute des lignes à la matrice : les tableaux existants ne sont pas recopiés.
+
+        Args:
+            documents (dict): Nom et termes de chaque CV, par identifiant
+        """
+        if not documents:
+            return
+        columns = []
+        weights = []
+        lengths = []
+        lookup = self._terms.get
+        for doc_id, (name, terms) in documents.items():
+            row_columns = list(map(lookup, terms))
+            if None in row_columns:
+                for term in terms:
+                    if term not in self._terms:
+                        self._terms[term] = len(self._vocabulary)
+                        self._vocabulary.append(term)
+                row_columns = list(map(lookup, terms))
+            columns.extend(row_columns)
+            weights.extend(terms.values())
+            lengths.append(len(terms))
+            self._rows[doc_id] = len(self._doc_ids)
+            self._doc_ids.append(doc_id)
+            self._names.append(name)
+
+        columns = np.asarray(columns, dtype=np.int32)
+        self._df.extend(np.zeros(len(self._vocabulary) - self._df.size))
+        self._df.view[:] += np.bincount(columns, minlength=len(self._vocabulary))
+        self._indices.extend(columns)
+        self._weights.extend(1.0 + np.log(np.asarray(weights, dtype=np.float32)))
+        self._indptr.extend(self._indices.size - len(columns) + np.cumsum(lengths))
+        self._alive.extend(np.ones(len(lengths), dtype=np.bool_))
+        self._changes += len(lengths)
+
+    def _discard(self, doc_id):
+        """
+        Marque la ligne d'un CV comme supprimée.
+        """
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        indptr = self._indptr.view
+        self._df.view[self._indices.view[indptr[row]:indptr[row + 1]]] -= 1
+        self._alive.view[row] = False
+        self._dead += 1
+        self._changes += 1
+
+    def _compact(self):
+        """
+        Réécrit la matrice sans les lignes supprimées.
+        """
+        alive = self._alive.view
+        indptr = self._indptr.view
+        lengths = np.diff(indptr)
+        keep = np.repeat(alive, lengths)
+
+        self._indices.replace(self._indices.view[keep])
+        self._weights.replace(self._weights.view[keep])
+        self._indptr.replace(np.concatenate(([0], np.cumsum(lengths[alive]))))
+        self._doc_ids = [doc_id for doc_id, kept in zip(self._doc_ids, alive) if kept]
+        self._names = [name for name, kept in zip(self._names, alive) if kept]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._doc_ids)}
+        self._alive.replace(np.ones(len(self._doc_ids), dtype=np.bool_))
+        self._dead = 0
+        self._norms = None
+        self._postings = None
+        self.logger.info(f"Matrice des CV compactée: {len(self._doc_ids)} CV actifs")
+
+    def save_snapshot(self):
+        """
+        Enregistre la matrice et le vocabulaire pour accélérer le démarrage des workers.
+        """
+        with self._lock:
+            meta = json.dumps({
+                "last_seq": self._last_seq,
+                "vocabulary": self._vocabulary,
+                "doc_ids": self._doc_ids,
+                "names": self._names
+            }, ensure_ascii=False).encode('utf-8')
+            temp_path = f"{self.snapshot_path}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                with open(temp_path, 'wb') as f:
+                    np.savez(
+                        f, indptr=self._indptr.view, indices=self._indices.view, weights=self._weights.view,
+                        alive=self._alive.view, df=self._df.view, meta=np.frombuffer(meta, dtype=np.uint8)
+                    )
+                os.replace(temp_path, self.snapshot_path)
+            except OSError as e:
+                self.logger.warning(f"Enregistrement de l'instantané du classement impossible: {str(e)}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return
+            self._since_snapshot = 0
+
+    def _load_snapshot(self):
+        """
+        Charge le dernier instantané, puis écarte les CV supprimés depuis.
+
+        Les marqueurs de suppression ayant une durée de vie limitée, la table des
+        documents fait foi : un CV de l'instantané qui n'y figure plus est écarté.
+        """
+        if not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with np.load(self.snapshot_path, allow_pickle=False) as snapshot:
+                meta = json.loads(snapshot["meta"].tobytes().decode('utf-8'))
+                self._indptr.replace(snapshot["indptr"])
+                self._indices.replace(snapshot["indices"])
+                self._weights.replace(snapshot["weights"])
+                self._alive.replace(snapshot["alive"])
+                self._df.replace(snapshot["df"])
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"Instantané du classement illisible, reconstruction depuis le journal: {str(e)}")
+            self._indptr.replace([0])
+            self._indices.replace([])
+            self._weights.replace([])
+            self._alive.replace([])
+            self._df.replace([])
+            return
+
+        self._vocabulary = meta["vocabulary"]
+        self._terms = {term: column for column, term in enumerate(self._vocabulary)}
+        self._doc_ids = meta["doc_ids"]
+        self._names = meta["names"]
+        alive = self._alive.view
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._doc_ids) if alive[row]}
+        self._dead = len(self._doc_ids) - len(self._rows)
+        self._last_seq = meta["last_seq"]
+        self._postings = None
+
+        conn = self._connection()
+        present = {row[0] for row in conn.execute(
+            "SELECT doc_id FROM cv_documents WHERE removed = 0 AND seq <= ?", (self._last_seq,)
+        )}
+        for doc_id in [doc_id for doc_id in self._rows if doc_id not in present]:
+            self._discard(doc_id)
+        self.logger.info(f"Instantané du classement chargé: {len(self._rows)} CV")
+
+    def _refresh_norms(self, idf):
+        """
+        Calcule les normes TF-IDF des lignes qui n'en ont pas encore.
+
+        Les normes existantes ne sont recalculées que lorsque les ajouts et
+        suppressions dépassent une fraction du corpus : la dérive des IDF est
+        négligeable en deçà.
+        """
+        indptr = self._indptr.view
+        start = 0
+        if self._norms is not None and self._changes <= self.norm_refresh_ratio * max(self._norms_basis, 1):
+            start = len(self._norms)
+        else:
+            self._norms = np.zeros(0, dtype=np.float64)
+            self._norms_basis = len(self._rows)
+            self._changes = 0
+        if start == len(indptr) - 1:
+            return
+        offset = indptr[start]
+        values = self._weights.view[offset:] * idf[self._indices.view[offset:]]
+        self._norms = np.concatenate((self._norms, np.sqrt(_row_sums(np.square(values), indptr[start:] - offset))))
+
+    def _refresh_postings(self):
+        """
+        Construit la vue par colonnes des lignes actives, lorsque trop de lignes ont été ajoutées depuis.
+
+        Les lignes supprimées après la construction y restent, et sont écartées
+        au moment de la requête ; elles disparaissent au compactage suivant.
+        """
+        rows = len(self._indptr.view) - 1
+        if self._postings is not None and rows - self._postings[3] <= self.postings_refresh_ratio * self._postings[3]:
+            return
+        lengths = np.diff(self._indptr.view)
+        keep = np.repeat(self._alive.view, lengths)
+        columns = self._indices.view[keep]
+        order = np.argsort(columns, kind='stable')
+        pointers = np.zeros(len(self._vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(columns, minlength=len(self._vocabulary)), out=pointers[1:])
+        row_numbers = np.repeat(np.arange(rows, dtype=np.int32), lengths)[keep]
+        self._postings = (pointers, row_numbers[order], self._weights.view[keep][order], rows)
+
+    def _idf(self):
+        count = len(self._rows)
+        return (np.log((1.0 + count) / (1.0 + self._df.view)) + 1.0).astype(np.float32)
+
+    def rank(self, job_description, top_k=10):
+        """
+        Classe les CV stockés selon leur adéquation à une description de poste.
+
+        Le score est la similarité cosinus entre les vecteurs TF-IDF de la
+        description et de chaque CV.
+
+        Args:
+            job_description (str): Description du poste
+            top_k (int): Nombre maximum de CV retournés
+
+        Returns:
+            list: CV les mieux classés (identifiant, nom, score, mots-clés communs)
+        """
+        self.sync()
+        query = self.tokenize(job_description)
+
+        with self._lock, stage_timer("ranking"):
+            columns = [self._terms[term] for term in query if term in self._terms]
+            if not columns or not self._rows or top_k <= 0:
+                return []
+
+            idf = self._idf()
+            indices = self._indices.view
+            weights = self._weights.view
+            indptr = self._indptr.view
+
+            self._refresh_norms(idf)
+
+            # Vecteur de la requête, déjà multiplié par l'IDF appliqué aux CV
+            query_weights = np.zeros(len(self._vocabulary), dtype=np.float32)
+            query_weights[columns] = [(1.0 + math.log(query[self._vocabulary[column]])) * idf[column]
+                                      for column in columns]
+            query_norm = float(np.linalg.norm(query_weights))
+            query_weights *= idf
+
+            # Seules les colonnes des termes de la requête sont parcourues
+            self._refresh_postings()
+            pointers, posting_rows, posting_weights, covered = self._postings
+            scores = np.zeros(len(indptr) - 1, dtype=np.float64)
+            for column in columns:
+                if column + 1 < len(pointers):
+                    start, end = pointers[column], pointers[column + 1]
+                    scores[posting_rows[start:end]] += posting_weights[start:end] * query_weights[column]
+            if covered < len(indptr) - 1:
+                # Lignes ajoutées depuis la construction de la vue par colonnes
+                offset = indptr[covered]
+                scores[covered:] = _row_sums(weights[offset:] * query_weights[indices[offset:]], indptr[covered:] - offset)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = np.where(self._norms > 0, scores / (self._norms * query_norm), 0.0)
+            scores[~self._alive.view] = 0.0
+
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > top_k:
+                candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+            results = []
+            for row in candidates:
+                row_columns = indices[indptr[row]:indptr[row + 1]]
+                contributions = weights[indptr[row]:indptr[row + 1]] * query_weights[row_columns]
+                order = np.argsort(-contributions, kind='stable')
+                results.append({
+                    "cv_id": self._doc_ids[row],
+                    "name": self._names[row],
+                    "score": round(float(scores[row]), 4),
+                    "matched_keywords": [self._vocabulary[row_columns[i]] for i in order if contributions[i] > 0]
+                })
+            return results
+
+    def stats(self):
+        """
+        Retourne la taille du corpus classé.
+        """
+        with self._lock:
+            return {
+                "documents": len(self._rows),
+                "terms": len(self._vocabulary),
+                "nonzeros": int(self._indices.size),
+                "removed_rows": self._dead
+            }
@@ -0,0 +1,72 @@
+import logging
+import threading
+from importlib import import_module
+
+# Moteurs de mise en évidence par extension : (module, classe), importés au premier usage.
+# Les processus qui n'adaptent pas de document (analyse d'offre seule) ne chargent ni
+# lxml, ni PyPDF2, ni reportlab.
+_BACKENDS = {
+    '.docx': ('docx_highlighter', 'DocxHighlighter'),
+    '.pdf': ('pdf_highlighter', 'PdfHighlighter')
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+logger = logging.getLogger('document_backends')
+
+
+def register_backend(extension, module_name, class_name):
+    """
+    Déclare le moteur de mise en évidence d'un format de document.
+
+    Args:
+        extension (str): Extension du format (par exemple '.docx')
+        module_name (str): Module contenant le moteur
+        class_name (str): Classe du moteur, construite avec un KeywordMatcher
+    """
+    with _lock:
+        _BACKENDS[extension.lower()] = (module_name, class_name)
+        _loaded.pop(extension.lower(), None)
+
+
+def supported_extensions():
+    """
+    Retourne les extensions des formats pris en charge.
+    """
+    return tuple(_BACKENDS)
+
+
+def is_loaded(extension):
+    """
+    Indique si le moteur d'un format a déjà été importé.
+    """
+    return extension.lower() in _loaded
+
+
+def get_backend(extension):
+    """
+    Retourne la classe du moteur de mise en évidence d'un format, en l'important au premier usage.
+
+    Args:
+        extension (str): Extension du document
+
+    Returns:
+        type: Classe du moteur
+
+    Raises:
+        ValueError: Si le format n'est pas pris en charge
+    """
+    extension = (extension or '').lower()
+    backend = _loaded.get(extension)
+    if backend is not None:
+        return backend
+
+    with _lock:
+        if extension not in _loaded:
+            if extension not in _BACKENDS:
+                raise ValueError(f"Format de fichier non pris en charge: {extension or 'inconnu'}")
+            module_name, class_name = _BACKENDS[extension]
+            _loaded[extension] = getattr(import_module(module_name), class_name)
+            logger.info(f"Moteur {class_name} chargé pour les fichiers {extension}")
+        return _loaded[extension]
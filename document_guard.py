@@ -0,0 +1,426 @@
+import os
+import zlib
+import signal
+import logging
+import zipfile
+import threading
+import multiprocessing
+from metrics import DOCUMENTS_REJECTED
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Nombre maximum de caractères extraits d'une page PDF
+MAX_PAGE_TEXT = 200000
+
+# Taille décompressée au-delà de laquelle le taux de compression d'une partie est contrôlé
+RATIO_CHECK_MIN_BYTES = 1024 * 1024
+
+
+class DocumentRejectedError(ValueError):
+    """
+    Levée lorsqu'un document dépasse les limites de ressources autorisées.
+    """
+
+    def __init__(self, message, reason="limit"):
+        super().__init__(message)
+        self.reason = reason
+
+    def __reduce__(self):
+        # Le motif est conservé lorsque l'erreur est transmise depuis un autre processus
+        return type(self), (str(self), self.reason)
+
+
+def reject(reason, message):
+    """
+    Comptabilise le refus d'un document et retourne l'exception à lever.
+    """
+    DOCUMENTS_REJECTED.inc(reason=reason)
+    return DocumentRejectedError(message, reason)
+
+
+def _inflated_size(data, limit):
+    """
+    Mesure la taille décompressée d'un flux Flate sans dépasser limit octets en mémoire.
+
+    Returns:
+        int: Taille décompressée, ou une valeur supérieure à limit dès qu'elle est dépassée
+    """
+    decompressor = zlib.decompressobj()
+    total = 0
+    chunk = data
+    while chunk:
+        total += len(decompressor.decompress(chunk, 1024 * 1024))
+        if total > limit:
+            return total
+        chunk = decompressor.unconsumed_tail
+    return total + len(decompressor.flush())
+
+
+class DocumentGuard:
+    """
+    Inspection préalable des documents non fiables, avant toute analyse complète.
+
+    Un .docx est une archive ZIP : seul son répertoire central est lu, pour borner
+    le nombre de parties, leur taille décompressée totale et leur taux de
+    compression (les lectures ultérieures sont elles-mêmes bornées par les tailles
+    déclarées). Pour un PDF, seuls la table des références croisées et l'arbre des
+    pages sont lus ; le contenu de chaque page est décompressé par blocs, sans être
+    conservé, pour en borner la taille avant l'extraction du texte.
+    """
+
+    def __init__(self, max_uncompressed_bytes=100 * 1024 * 1024, max_parts=1000, max_compression_ratio=200,
+                 max_pages=100, max_page_content_bytes=16 * 1024 * 1024):
+        """
+        Initialise les limites.
+
+        Args:
+            max_uncompressed_bytes (int): Taille décompressée maximale d'une archive .docx
+            max_parts (int): Nombre maximum de parties d'une archive .docx
+            max_compression_ratio (int): Taux de compression maximal d'une partie volumineuse
+            max_pages (int): Nombre maximum de pages d'un PDF
+            max_page_content_bytes (int): Taille décompressée maximale du contenu d'une page PDF
+        """
+        self.max_uncompressed_bytes = max_uncompressed_bytes
+        self.max_parts = max_parts
+        self.max_compression_ratio = max_compression_ratio
+        self.max_pages = max_pages
+        self.max_page_content_bytes = max_page_content_bytes
+
+    def limits(self):
+        """
+        Retourne les limites, pour reconstruire le même garde dans un autre processus.
+        """
+        return {
+            "max_uncompressed_bytes": self.max_uncompressed_bytes,
+            "max_parts": self.max_parts,
+            "max_compression_ratio": self.max_compression_ratio,
+            "max_pages": self.max_pages,
+            "max_page_content_bytes": self.max_page_content_bytes
+        }
+
+    def inspect(self, source, file_ext):
+        """
+        Vérifie qu'un document respecte les limites, sans l'analyser complètement.
+
+        La position d'un flux est restaurée après l'inspection.
+
+        Args:
+            source (str ou fichier): Chemin ou flux du document
+            file_ext (str): Extension du document ('.docx' ou '.pdf')
+
+        Returns:
+            dict: Caractéristiques relevées (parties et taille, ou pages)
+
+        Raises:
+            DocumentRejectedError: Si une limite est dépassée ou la structure illisible
+        """
+        position = None if isinstance(source, (str, os.PathLike)) else source.tell()
+        try:
+            if file_ext == '.docx':
+                return self._inspect_docx(source)
+            if file_ext == '.pdf':
+                return self._inspect_pdf(source)
+            return {}
+        finally:
+            if position is not None:
+                source.seek(position)
+
+    def _inspect_docx(self, source):
+        try:
+            with zipfile.ZipFile(source) as archive:
+                entries = archive.infolist()
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, OSError) as e:
+            raise reject("structure", f"Archive .docx illisible: {str(e)}")
+
+        if len(entries) > self.max_parts:
+            raise reject("parts", f"Le document contient trop de parties ({len(entries)}, limite: {self.max_parts})")
+        total = 0
+        for entry in entries:
+            total += entry.file_size
+            if entry.file_size > RATIO_CHECK_MIN_BYTES and \
+                    entry.file_size > self.max_compression_ratio * max(entry.compress_size, 1):
+                raise reject("ratio", f"Taux de compression anormal pour la partie {entry.filename}")
+        if total > self.max_uncompressed_bytes:
+            raise reject("size", f"Le document décompressé est trop volumineux ({total} octets, "
+                                 f"limite: {self.max_uncompressed_bytes})")
+        return {"parts": len(entries), "uncompressed_bytes": total}
+
+    def _inspect_pdf(self, source):
+        # Importé ici : le moteur PDF n'est chargé qu'au premier PDF (voir document_backends)
+        import PyPDF2
+        from PyPDF2.generic import ArrayObject
+
+        try:
+            reader = PyPDF2.PdfReader(source)
+            if reader.is_encrypted:
+                raise reject("encrypted", "Les PDF chiffrés ne sont pas acceptés")
+            # Le nombre de pages déclaré permet de refuser avant de parcourir l'arbre des pages
+            page_tree = reader.trailer["/Root"]["/Pages"]
+            declared = page_tree["/Count"] if "/Count" in page_tree else 0
+            if declared > self.max_pages:
+                raise reject("pages", f"Le PDF contient trop de pages ({declared}, limite: {self.max_pages})")
+            pages = reader.pages
+            if len(pages) > self.max_pages:
+                raise reject("pages", f"Le PDF contient trop de pages ({len(pages)}, limite: {self.max_pages})")
+
+            for number, page in enumerate(pages, 1):
+                contents = page.get("/Contents")
+                contents = contents.get_object() if contents is not None else None
+                streams = contents if isinstance(contents, ArrayObject) else [contents] if contents is not None else []
+                size = 0
+                for stream in streams:
+                    size += self._stream_size(stream.get_object(), self.max_page_content_bytes - size)
+                    if size > self.max_page_content_bytes:
+                        raise reject("page_content", f"Le contenu de la page {number} est trop volumineux "
+                                                     f"(limite: {self.max_page_content_bytes} octets)")
+        except DocumentRejectedError:
+            raise
+        except Exception as e:
+            raise reject("structure", f"PDF illisible: {str(e)}")
+        return {"pages": len(pages)}
+
+    @staticmethod
+    def _stream_size(stream, limit):
+        """
+        Taille décodée d'un flux de contenu, mesurée sans le conserver.
+        """
+        data = getattr(stream, "_data", b"") or b""
+        filters = stream.get("/Filter")
+        if filters is None:
+            return len(data)
+        if not isinstance(filters, list):
+            filters = [filters]
+        if filters and filters[0] == "/FlateDecode":
+            try:
+                return _inflated_size(data, limit)
+            except zlib.error:
+                # Flux corrompu : l'analyseur le signalera ou l'ignorera
+                return len(data)
+        return len(data)
+
+
+def limit_memory(limit_bytes):
+    """
+    Borne l'espace d'adressage du processus courant (RLIMIT_AS).
+
+    Une allocation au-delà lève MemoryError au lieu d'épuiser la mémoire du serveur.
+    """
+    if resource is None or not limit_bytes:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit_bytes = min(limit_bytes, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, hard))
+
+
+def address_space_peak():
+    """
+    Pic d'espace d'adressage du processus courant (VmPeak), None s'il n'est pas connu.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmPeak:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def budget_exhausted(peak_before, threshold=0.9):
+    """
+    Indique si le processus a approché son budget mémoire depuis la mesure peak_before.
+
+    Les bibliothèques natives (lxml, zlib) signalent souvent un manque de mémoire
+    par leurs propres erreurs plutôt que par MemoryError ; un échec survenu après
+    que le pic a atteint threshold du budget est attribué au budget.
+    """
+    if resource is None or peak_before is None:
+        return False
+    limit = resource.getrlimit(resource.RLIMIT_AS)[0]
+    peak = address_space_peak()
+    if limit == resource.RLIM_INFINITY or peak is None:
+        return False
+    return peak > peak_before and peak >= threshold * limit
+
+
+def _init_sandbox(limit_bytes):
+    """
+    Initialise un processus isolé : budget mémoire, groupe de processus, journaux réduits.
+
+    Les processus du pool de pages PDF créés par le processus isolé héritent de son
+    budget mémoire et de son groupe : ils sont arrêtés avec lui.
+    """
+    limit_memory(limit_bytes)
+    # Autorise la création du pool de pages ; le parent arrête toujours ce processus à sa sortie
+    multiprocessing.current_process().daemon = False
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+        # Un arrêt demandé par le parent (terminate) emporte tout le groupe
+        signal.signal(signal.SIGTERM, lambda signum, frame: os.killpg(0, signal.SIGKILL))
+    logging.getLogger('CVProcessor').setLevel(logging.WARNING)
+
+
+def _sandbox_worker(conn, limit_bytes):
+    """
+    Boucle d'un processus isolé : exécute les tâches reçues une à une et renvoie leur résultat.
+    """
+    _init_sandbox(limit_bytes)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        fn, args = task
+        try:
+            reply = (True, fn(*args))
+        except BaseException as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send((False, RuntimeError(f"Résultat du traitement non transmissible: {str(e)}")))
+
+
+class _SandboxWorker:
+    """
+    Processus isolé et extrémité du tube qui le relie au processus parent.
+    """
+
+    def __init__(self, context, limit_bytes):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_sandbox_worker, args=(child_conn, limit_bytes), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def stop(self, force=False):
+        try:
+            if force:
+                self.process.terminate()
+            else:
+                self.conn.send(None)
+        except OSError:
+            self.process.terminate()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        if hasattr(os, 'killpg'):
+            # Processus du pool de pages restés sans parent
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    Pool de processus isolés exécutant le traitement des documents sous un budget mémoire.
+
+    Chaque processus n'exécute qu'un document à la fois sous RLIMIT_AS : un
+    document qui dépasse son budget échoue avec une erreur explicite, sans
+    affecter le worker qui l'a reçu. Le délai court à partir du moment où un
+    processus prend le document en charge (l'attente d'un processus libre n'est
+    pas comptée) ; seul le processus à court de mémoire, tué ou bloqué au-delà
+    du délai est remplacé, les autres documents en cours ne sont pas affectés.
+    """
+
+    def __init__(self, memory_limit_mb=1024, max_workers=2, timeout=120):
+        """
+        Initialise le pool ; les processus sont créés à la demande.
+
+        Args:
+            memory_limit_mb (int): Budget mémoire d'un processus en Mo
+            max_workers (int): Nombre de processus
+            timeout (float): Durée maximale d'un traitement en secondes
+        """
+        self.logger = logging.getLogger('document_guard')
+        self.memory_limit_mb = memory_limit_mb
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._context = multiprocessing.get_context('spawn')
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._idle = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        """
+        Attend un processus libre, ou en crée un si le pool n'est pas complet.
+        """
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            worker = _SandboxWorker(self._context, self.memory_limit_mb * 1024 * 1024)
+        except Exception:
+            self._slots.release()
+            raise
+        self.logger.info(f"Processus isolé démarré (budget mémoire: {self.memory_limit_mb} Mo)")
+        return worker
+
+    def _release(self, worker, reusable):
+        """
+        Rend un processus au pool, ou l'arrête s'il ne peut plus servir.
+        """
+        with self._lock:
+            keep = reusable and not self._closed
+            if keep:
+                self._idle.append(worker)
+        if not keep:
+            worker.stop(force=not reusable)
+        self._slots.release()
+
+    def run(self, fn, *args):
+        """
+        Exécute une fonction dans un processus isolé.
+
+        Args:
+            fn (callable): Fonction de niveau module (sérialisable)
+            *args: Arguments sérialisables
+
+        Returns:
+            Valeur retournée par fn
+
+        Raises:
+            DocumentRejectedError: Si le budget mémoire ou le délai est dépassé
+        """
+        worker = self._acquire()
+        reusable = False
+        try:
+            try:
+                worker.conn.send((fn, args))
+                # Le délai ne court qu'à partir de la prise en charge par ce processus
+                if not worker.conn.poll(self.timeout):
+                    raise reject("timeout", f"Traitement du document interrompu après {self.timeout} secondes")
+                success, value = worker.conn.recv()
+            except (EOFError, OSError):
+                raise reject("crash", "Le traitement du document a été interrompu (processus arrêté)")
+            if success:
+                reusable = True
+                return value
+            if isinstance(value, MemoryError):
+                # Un processus à court de mémoire peut rester fragmenté ou incohérent : il est remplacé
+                raise reject("memory", f"Budget mémoire dépassé pendant le traitement du document "
+                                       f"(limite: {self.memory_limit_mb} Mo)")
+            reusable = True
+            raise value
+        finally:
+            self._release(worker, reusable)
+
+    def shutdown(self):
+        """
+        Arrête les processus libres ; les processus occupés s'arrêtent à la fin de leur document.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
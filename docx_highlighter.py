@@ -0,0 +1,494 @@
+import re
+import time
+import shutil
+import zipfile
+from copy import deepcopy
+from lxml import etree
+from metrics import stage_timer, STAGE_DURATION, PARAGRAPHS_PROCESSED
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+MC_NS = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+
+def _w(tag):
+    return f"{{{W_NS}}}{tag}"
+
+
+W_P = _w("p")
+W_R = _w("r")
+W_T = _w("t")
+W_TAB = _w("tab")
+W_BR = _w("br")
+W_CR = _w("cr")
+W_RPR = _w("rPr")
+W_U = _w("u")
+MC_FALLBACK = f"{{{MC_NS}}}Fallback"
+
+# Parties XML du paquet contenant du texte à mettre en évidence
+TEXT_PARTS = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+
+# Éléments conteneurs ouverts en flux : leurs enfants sont traités un par un
+CONTAINERS = frozenset([_w("document"), _w("body"), _w("hdr"), _w("ftr")])
+
+# Conteneurs de runs à l'intérieur d'un paragraphe (liens, révisions, balises)
+RUN_CONTAINERS = frozenset([_w("hyperlink"), _w("ins"), _w("smartTag"), _w("customXml"), _w("fldSimple")])
+
+# Ordre des propriétés de run imposé par le schéma (CT_RPr)
+RPR_ORDER = {_w(tag): index for index, tag in enumerate([
+    "rStyle", "rFonts", "b", "bCs", "i", "iCs", "caps", "smallCaps", "strike", "dstrike",
+    "outline", "shadow", "emboss", "imprint", "noProof", "snapToGrid", "vanish", "webHidden",
+    "color", "spacing", "w", "kern", "position", "sz", "szCs", "highlight", "u", "effect",
+    "bdr", "shd", "fitText", "vertAlign", "rtl", "cs", "em", "lang", "eastAsianLayout",
+    "specVanish", "oMath"
+])}
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _set_underline(rpr):
+    """
+    Ajoute un soulignement simple aux propriétés d'un run, à sa place dans l'ordre du schéma.
+    """
+    for existing in rpr.findall(W_U):
+        rpr.remove(existing)
+    underline = etree.Element(W_U)
+    underline.set(_w("val"), "single")
+    position = RPR_ORDER[W_U]
+    for index, child in enumerate(rpr):
+        # Les propriétés inconnues (extensions, rPrChange) sont placées après le soulignement
+        if RPR_ORDER.get(child.tag, len(RPR_ORDER)) > position:
+            rpr.insert(index, underline)
+            return
+    rpr.append(underline)
+
+
+def _paragraph_runs(paragraph):
+    """
+    Runs propres à un paragraphe, y compris ceux des liens et révisions, sans ceux des paragraphes imbriqués.
+    """
+    for child in paragraph:
+        if child.tag == W_R:
+            yield child
+        elif child.tag in RUN_CONTAINERS:
+            yield from _paragraph_runs(child)
+
+
+def _paragraph_segments(paragraph):
+    """
+    Texte d'un paragraphe et position de chacun de ses éléments w:t dans ce texte.
+
+    Les tabulations et sauts de ligne sont restitués pour ne pas coller les mots voisins.
+    """
+    segments = []
+    parts = []
+    offset = 0
+    for run in _paragraph_runs(paragraph):
+        for child in run:
+            if child.tag == W_T:
+                text = child.text or ""
+                segments.append((offset, offset + len(text), run, child))
+            elif child.tag == W_TAB:
+                text = "\t"
+            elif child.tag in (W_BR, W_CR):
+                text = "\n"
+            else:
+                continue
+            parts.append(text)
+            offset += len(text)
+    return "".join(parts), segments
+
+
+def _namespace_declarations(nsmap):
+    """
+    Déclarations d'espaces de noms de la racine, telles que sérialisées par lxml.
+    """
+    return tuple(
+        (f' xmlns:{prefix}="{uri}"' if prefix else f' xmlns="{uri}"').encode("utf-8")
+        for prefix, uri in nsmap.items()
+    )
+
+
+def _strip_declarations(serialized, declarations):
+    """
+    Retire de la balise ouvrante les déclarations déjà portées par la racine.
+    """
+    head_end = serialized.index(b">")
+    head = serialized[:head_end]
+    for declaration in declarations:
+        head = head.replace(declaration, b"")
+    return head + serialized[head_end:]
+
+
+def _container_tags(element, declarations):
+    """
+    Balises ouvrante et fermante d'un conteneur, sans son contenu.
+    """
+    shell = etree.Element(element.tag, dict(element.attrib), nsmap=element.nsmap)
+    serialized = etree.tostring(shell, encoding="UTF-8", xml_declaration=False)
+    if element.getparent() is not None:
+        serialized = _strip_declarations(serialized, declarations)
+    opening = serialized[:-2] + b">"
+    name = f"{element.prefix}:{etree.QName(element).localname}" if element.prefix else etree.QName(element).localname
+    return opening, f"</{name}>".encode("utf-8")
+
+
+def _serialize_block(element, declarations):
+    """
+    Sérialise un bloc du corps sans répéter les déclarations d'espaces de noms de la racine.
+    """
+    serialized = etree.tostring(element, encoding="UTF-8", xml_declaration=False, with_tail=False)
+    return _strip_declarations(serialized, declarations)
+
+
+class DocxHighlighter:
+    """
+    Moteur de mise en évidence des mots-clés dans les documents Word.
+
+    Les parties XML du paquet (document, en-têtes, pieds de page) sont lues en
+    flux : chaque enfant du corps (paragraphe, tableau...) est analysé, traité,
+    écrit puis libéré, si bien que la mémoire reste bornée par le plus grand
+    bloc du document. Les paragraphes des tableaux et zones de texte sont
+    couverts ; les runs contenant un mot-clé sont découpés en conservant leur
+    mise en forme. Les autres parties (images, styles...) sont recopiées telles quelles.
+    """
+
+    def __init__(self, matcher):
+        """
+        Initialise le moteur de mise en évidence.
+
+        Args:
+            matcher (KeywordMatcher): Moteur de correspondance des mots-clés
+        """
+        self.matcher = matcher
+
+    def highlight_paragraph(self, paragraph):
+        """
+        Souligne les occurrences des mots-clés d'un paragraphe WordprocessingML.
+
+        Le texte est reconstitué à partir de tous les runs du paragraphe, si bien
+        qu'un mot-clé réparti sur plusieurs runs est trouvé ; seuls les runs
+        concernés sont découpés, chaque morceau conservant les propriétés du run d'origine.
+
+        Args:
+            paragraph (Element): Élément w:p à modifier
+
+        Returns:
+            int: Nombre d'occurrences mises en évidence
+        """
+        text, segments = _paragraph_segments(paragraph)
+        matches = self.matcher.find_all(text)
+        if not matches:
+            return 0
+
+        # Plages soulignées de chaque élément w:t, regroupées par run
+        ranges_by_run = {}
+        index = 0
+        for seg_start, seg_end, run, text_element in segments:
+            while index < len(matches) and matches[index][1] <= seg_start:
+                index += 1
+            position = index
+            ranges = []
+            while position < len(matches) and matches[position][0] < seg_end:
+                start, end = matches[position]
+                ranges.append((max(start, seg_start) - seg_start, min(end, seg_end) - seg_start))
+                position += 1
+            if ranges:
+                ranges_by_run.setdefault(run, {})[text_element] = ranges
+
+        for run, ranges_by_text in ranges_by_run.items():
+            self._split_run(run, ranges_by_text)
+        return len(matches)
+
+    @staticmethod
+    def _split_run(run, ranges_by_text):
+        """
+        Remplace un run par une suite de runs alternant texte normal et texte souligné.
+        """
+        rpr = run.find(W_RPR)
+        pieces = []
+        for child in run:
+            if child is rpr:
+                continue
+            ranges = ranges_by_text.get(child)
+            if ranges is None:
+                pieces.append((False, child))
+                continue
+            text = child.text or ""
+            last = 0
+            for start, end in ranges:
+                if start > last:
+                    pieces.append((False, text[last:start]))
+                pieces.append((True, text[start:end]))
+                last = end
+            if last < len(text):
+                pieces.append((False, text[last:]))
+
+        # Chaque nouveau run est inséré vide dans le paragraphe avant d'être rempli,
+        # ce qui évite de réconcilier les espaces de noms à chaque déplacement
+        parent = run.getparent()
+        position = parent.index(run)
+        current = None
+        current_underlined = None
+        for underlined, content in pieces:
+            if current is None or current_underlined != underlined:
+                current = run.makeelement(W_R, dict(run.attrib))
+                parent.insert(position, current)
+                position += 1
+                current_underlined = underlined
+                if rpr is not None:
+                    new_rpr = deepcopy(rpr)
+                    current.append(new_rpr)
+                    if underlined:
+                        _set_underline(new_rpr)
+                elif underlined:
+                    _set_underline(etree.SubElement(current, W_RPR))
+            if isinstance(content, str):
+                text_element = etree.SubElement(current, W_T)
+                text_element.text = content
+                text_element.set(XML_SPACE, "preserve")
+            else:
+                current.append(content)
+        parent.remove(run)
+
+    def _highlight_block(self, block, stats):
+        """
+        Traite tous les paragraphes d'un bloc (paragraphe, tableau, zone de texte).
+        """
+        for paragraph in list(block.iter(W_P)):
+            highlighted = self.highlight_paragraph(paragraph)
+            stats["paragraphs"] += 1
+            # Le contenu de repli des zones de texte duplique le contenu principal
+            if highlighted and not any(ancestor.tag == MC_FALLBACK for ancestor in paragraph.iterancestors()):
+                stats["highlighted_keywords"] += highlighted
+                stats["paragraphs_modified"] += 1
+
+    @staticmethod
+    def _iter_part(source):
+        """
+        Parcourt en flux une partie XML du paquet.
+
+        Produit soit des octets à recopier tels quels (déclaration XML, balises des
+        conteneurs), soit des tuples (bloc, déclarations) pour chaque enfant complet
+        d'un conteneur. Le bloc est libéré dès que l'appelant reprend le parcours.
+
+        Args:
+            source (fichier): Flux de la partie d'origine
+        """
+        yield b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n'
+        closing_tags = []
+        declarations = ()
+        depth = 0
+        for event, element in etree.iterparse(source, events=("start", "end"), huge_tree=True):
+            if event == "start":
+                depth += 1
+                if depth == len(closing_tags) + 1 and element.tag in CONTAINERS:
+                    # Conteneur : seule la balise ouvrante est écrite, ses enfants suivent un à un.
+                    # Les espaces de noms ne sont déclarés qu'une fois, sur la racine.
+                    if not closing_tags:
+                        declarations = _namespace_declarations(element.nsmap)
+                    opening, closing = _container_tags(element, declarations)
+                    yield opening
+                    closing_tags.append(closing)
+                continue
+
+            if depth == len(closing_tags):
+                yield closing_tags.pop()
+                element.clear()
+            elif depth == len(closing_tags) + 1:
+                # Bloc complet : traité par l'appelant, puis libéré de la mémoire
+                yield element, declarations
+                element.clear()
+                parent = element.getparent()
+                if parent is not None:
+                    while element.getprevious() is not None:
+                        del parent[0]
+            depth -= 1
+
+    def _rewrite_part(self, source, target, stats, timings):
+        """
+        Réécrit en flux une partie XML du paquet.
+
+        Args:
+            source (fichier): Flux de la partie d'origine
+            target (fichier): Flux recevant la partie réécrite
+            stats (dict): Statistiques cumulées du document
+            timings (dict): Durées cumulées de lecture, mise en évidence et écriture
+        """
+        mark = time.perf_counter()
+        for item in self._iter_part(source):
+            if isinstance(item, bytes):
+                target.write(item)
+                continue
+            element, declarations = item
+            parsed = time.perf_counter()
+            self._highlight_block(element, stats)
+            highlighted = time.perf_counter()
+            target.write(_serialize_block(element, declarations))
+            written = time.perf_counter()
+            timings["parse"] += parsed - mark
+            timings["highlight"] += highlighted - parsed
+            timings["write"] += written - highlighted
+            mark = written
+
+    def _parse_part(self, source):
+        """
+        Représentation compacte d'une partie XML : fragments bruts et blocs avec leur texte.
+        """
+        items = []
+        declarations = ()
+        for item in self._iter_part(source):
+            if isinstance(item, bytes):
+                # Les fragments bruts consécutifs sont regroupés
+                if items and "raw" in items[-1]:
+                    items[-1]["raw"] += item.decode("utf-8")
+                else:
+                    items.append({"raw": item.decode("utf-8")})
+                continue
+            element, declarations = item
+            paragraphs = list(element.iter(W_P))
+            items.append({
+                "xml": _serialize_block(element, declarations).decode("utf-8"),
+                "text": "\n".join(_paragraph_segments(paragraph)[0] for paragraph in paragraphs),
+                "paragraphs": len(paragraphs)
+            })
+        return {"declarations": [declaration.decode("utf-8") for declaration in declarations], "items": items}
+
+    def _render_part(self, part, target, stats, timings):
+        """
+        Écrit une partie XML à partir de sa représentation, en ne réanalysant que les blocs concernés.
+        """
+        declarations = tuple(declaration.encode("utf-8") for declaration in part["declarations"])
+        wrapper = b"<cache" + b"".join(declarations) + b">"
+        parser = etree.XMLParser(huge_tree=True)
+        for item in part["items"]:
+            if "raw" in item:
+                target.write(item["raw"].encode("utf-8"))
+                continue
+            start = time.perf_counter()
+            if not self.matcher.contains(item["text"]):
+                # Aucun mot-clé dans le bloc : recopie du XML mis en cache
+                stats["paragraphs"] += item["paragraphs"]
+                target.write(item["xml"].encode("utf-8"))
+                timings["write"] += time.perf_counter() - start
+                continue
+            # Le bloc est replacé sous une racine portant les espaces de noms du document
+            element = etree.fromstring(wrapper + item["xml"].encode("utf-8") + b"</cache>", parser)[0]
+            parsed = time.perf_counter()
+            self._highlight_block(element, stats)
+            highlighted = time.perf_counter()
+            target.write(_serialize_block(element, declarations))
+            timings["parse"] += parsed - start
+            timings["highlight"] += highlighted - parsed
+            timings["write"] += time.perf_counter() - highlighted
+
+    @staticmethod
+    def _copy_entry(info):
+        entry = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+        entry.compress_type = info.compress_type
+        entry.external_attr = info.external_attr
+        return entry
+
+    def parse(self, source):
+        """
+        Analyse un document Word une fois pour toutes, indépendamment des mots-clés recherchés.
+
+        Chaque partie textuelle est découpée en blocs conservant leur XML et leur
+        texte normalisé. La représentation est sérialisable en JSON et peut être
+        mise en cache pour adapter le même CV à plusieurs offres.
+
+        Args:
+            source (str ou fichier): Chemin ou flux du document
+
+        Returns:
+            dict: Représentation compacte des parties textuelles du document
+        """
+        with stage_timer("parse", "docx"), zipfile.ZipFile(source) as package:
+            parts = {}
+            for info in package.infolist():
+                if TEXT_PARTS.match(info.filename):
+                    with package.open(info) as part:
+                        parts[info.filename] = self._parse_part(part)
+        return {"parts": parts}
+
+    @staticmethod
+    def parsed_text(parsed):
+        """
+        Texte d'un document à partir de sa représentation analysée.
+
+        Args:
+            parsed (dict): Représentation retournée par parse
+
+        Returns:
+            str: Texte des paragraphes du corps, des en-têtes et des pieds de page
+        """
+        return "\n".join(
+            item["text"] for part in parsed["parts"].values() for item in part["items"] if item.get("text")
+        )
+
+    def render(self, source, parsed, output):
+        """
+        Produit le document mis en évidence à partir d'une représentation déjà analysée.
+
+        Seuls les blocs dont le texte contient un mot-clé sont réanalysés ; les
+        autres sont recopiés depuis la représentation, et les parties non textuelles
+        depuis le document d'origine.
+
+        Args:
+            source (str ou fichier): Chemin ou flux du document d'origine
+            parsed (dict): Représentation retournée par parse
+            output (fichier): Flux binaire recevant le document produit
+
+        Returns:
+            dict: Nombre d'occurrences mises en évidence et de paragraphes modifiés
+        """
+        stats = {"highlighted_keywords": 0, "paragraphs_modified": 0, "paragraphs": 0}
+        timings = {"parse": 0.0, "highlight": 0.0, "write": 0.0}
+
+        with zipfile.ZipFile(source) as package, zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as result:
+            for info in package.infolist():
+                with result.open(self._copy_entry(info), "w") as target:
+                    part = parsed["parts"].get(info.filename)
+                    if part is not None:
+                        self._render_part(part, target, stats, timings)
+                    else:
+                        start = time.perf_counter()
+                        with package.open(info) as source_part:
+                            shutil.copyfileobj(source_part, target, CHUNK_SIZE)
+                        timings["write"] += time.perf_counter() - start
+
+        return self._finish(stats, timings)
+
+    @staticmethod
+    def _finish(stats, timings):
+        for stage, seconds in timings.items():
+            STAGE_DURATION.observe(seconds, stage=stage, file_type="docx")
+        PARAGRAPHS_PROCESSED.inc(stats.pop("paragraphs"), file_type="docx")
+        return stats
+
+    def highlight(self, source, output):
+        """
+        Met en évidence les mots-clés d'un document Word.
+
+        Args:
+            source (str ou fichier): Chemin ou flux du document d'origine
+            output (fichier): Flux binaire recevant le document produit
+
+        Returns:
+            dict: Nombre d'occurrences mises en évidence et de paragraphes modifiés
+        """
+        stats = {"highlighted_keywords": 0, "paragraphs_modified": 0, "paragraphs": 0}
+        timings = {"parse": 0.0, "highlight": 0.0, "write": 0.0}
+
+        with zipfile.ZipFile(source) as package, zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as result:
+            for info in package.infolist():
+                with package.open(info) as part, result.open(self._copy_entry(info), "w") as target:
+                    if TEXT_PARTS.match(info.filename):
+                        self._rewrite_part(part, target, stats, timings)
+                    else:
+                        # Images et autres parties : recopie par blocs, sans chargement complet
+                        start = time.perf_counter()
+                        shutil.copyfileobj(part, target, CHUNK_SIZE)
+                        timings["write"] += time.perf_counter() - start
+
+        return self._finish(stats, timings)
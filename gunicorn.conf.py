@@ -0,0 +1,32 @@
+import gc
+import os
+
+# L'application est chargée une seule fois dans le processus maître : motifs compilés,
+# mots vides et configuration sont partagés par copie à l'écriture entre les workers.
+preload_app = True
+
+# Les threads d'arrière-plan ne survivent pas au fork : ils sont démarrés dans chaque worker
+os.environ.setdefault('CV_ANALYZER_DEFER_BACKGROUND', '1')
+
+
+def on_starting(server):
+    # Les totaux de /metrics repartent de zéro à chaque démarrage du serveur
+    import metrics
+    from app import METRICS_DIR
+    metrics.clear_shared(METRICS_DIR)
+
+
+def pre_fork(server, worker):
+    # Les objets chargés par le maître ne sont plus parcourus par le ramasse-miettes,
+    # ce qui évite de dupliquer leurs pages mémoire dans chaque worker
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import metrics
+    from app import METRICS_DIR, start_background_services
+    # Le module a été importé par le maître : la disponibilité est celle du worker
+    metrics.mark_process_start()
+    # Chaque collecte de /metrics, quel que soit le worker qui la reçoit, couvre tous les workers
+    metrics.REGISTRY.share(METRICS_DIR)
+    start_background_services()
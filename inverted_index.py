@@ -0,0 +1,766 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import logging
+import threading
+import numpy as np
+from metrics import stage_timer
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# États d'un document dans le journal de l'index
+STATE_QUEUED = 'queued'
+STATE_PENDING = 'pending'
+STATE_INDEXED = 'indexed'
+STATE_FAILED = 'failed'
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Éléments de la syntaxe des requêtes : parenthèses, expressions entre guillemets et mots
+_QUERY_PATTERN = re.compile(r'\s*(?:(?P<open>\()|(?P<close>\))|"(?P<phrase>[^"]*)"|(?P<word>[^\s()"]+))')
+
+_OPERATORS = ("AND", "OR", "NOT")
+
+# Tableaux d'un segment, chacun dans un fichier .npy projeté en mémoire
+SEGMENT_ARRAYS = ("term_ptr", "post_docs", "pos_ptr", "positions")
+
+
+class QuerySyntaxError(ValueError):
+    """
+    Levée lorsqu'une requête de recherche est mal formée.
+    """
+
+
+def tokenize(text):
+    """
+    Découpe un texte en mots normalisés en minuscules, dans l'ordre du texte.
+    """
+    return [token.lower() for token in _TOKEN_PATTERN.findall(text or "")]
+
+
+def parse_query(query):
+    """
+    Analyse une requête booléenne.
+
+    La syntaxe accepte les mots, les expressions "entre guillemets", les
+    opérateurs AND, OR et NOT (en majuscules) et les parenthèses ; deux termes
+    juxtaposés sont combinés par AND, si bien que "flask django NOT stage"
+    équivaut à "flask AND django AND NOT stage".
+
+    Args:
+        query (str): Requête à analyser
+
+    Returns:
+        tuple: Arbre de la requête
+
+    Raises:
+        QuerySyntaxError: Si la requête est vide ou mal formée
+    """
+    tokens = []
+    position = 0
+    query = query or ""
+    while position < len(query):
+        match = _QUERY_PATTERN.match(query, position)
+        if match is None or match.end() == position:
+            if query[position:].strip():
+                raise QuerySyntaxError(f"Guillemet non fermé à la position {position}")
+            break
+        position = match.end()
+        if match.group("open"):
+            tokens.append(("(", None))
+        elif match.group("close"):
+            tokens.append((")", None))
+        elif match.group("phrase") is not None:
+            tokens.append(("terms", tokenize(match.group("phrase"))))
+        elif match.group("word") in _OPERATORS:
+            tokens.append((match.group("word"), None))
+        else:
+            tokens.append(("terms", tokenize(match.group("word"))))
+
+    state = {"index": 0}
+
+    def peek():
+        return tokens[state["index"]][0] if state["index"] < len(tokens) else None
+
+    def take():
+        token = tokens[state["index"]]
+        state["index"] += 1
+        return token
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_unary()
+        while peek() not in (None, "OR", ")"):
+            if peek() == "AND":
+                take()
+            node = ("and", node, parse_unary())
+        return node
+
+    def parse_unary():
+        kind = peek()
+        if kind is None:
+            raise QuerySyntaxError("Requête incomplète")
+        kind, value = take()
+        if kind == "NOT":
+            return ("not", parse_unary())
+        if kind == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise QuerySyntaxError("Parenthèse non fermée")
+            take()
+            return node
+        if kind == "terms":
+            if not value:
+                raise QuerySyntaxError("Terme de recherche vide")
+            return ("term", value[0]) if len(value) == 1 else ("phrase", value)
+        raise QuerySyntaxError(f"Opérateur {kind} inattendu")
+
+    if not tokens:
+        raise QuerySyntaxError("La requête est vide")
+    tree = parse_or()
+    if state["index"] < len(tokens):
+        raise QuerySyntaxError("Parenthèse fermante inattendue")
+    return tree
+
+
+def _build_arrays(token_lists):
+    """
+    Construit les listes d'occurrences d'un ensemble de documents.
+
+    La construction est vectorisée : chaque occurrence est décrite par
+    (terme, document, position), puis l'ensemble est trié en une fois.
+
+    Args:
+        token_lists (list): Mots de chaque document, dans l'ordre du texte
+
+    Returns:
+        tuple: (termes triés, dict des tableaux du segment)
+    """
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+    total = int(lengths.sum())
+    if not total:
+        return [], {
+            "term_ptr": np.zeros(1, dtype=np.int64),
+            "post_docs": np.zeros(0, dtype=np.int32),
+            "pos_ptr": np.zeros(1, dtype=np.int64),
+            "positions": np.zeros(0, dtype=np.int32)
+        }
+
+    vocabulary = {}
+    term_ids = np.fromiter(
+        (vocabulary.setdefault(token, len(vocabulary)) for tokens in token_lists for token in tokens),
+        dtype=np.int64, count=total
+    )
+    docs = np.repeat(np.arange(len(token_lists), dtype=np.int64), lengths)
+    positions = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    # Renumérotation des termes dans l'ordre alphabétique
+    terms = sorted(vocabulary)
+    rank = np.empty(len(terms), dtype=np.int64)
+    rank[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+    term_ids = rank[term_ids]
+
+    order = np.lexsort((positions, docs, term_ids))
+    term_ids, docs, positions = term_ids[order], docs[order], positions[order]
+
+    # Une occurrence (terme, document) commence à chaque changement de terme ou de document
+    starts = np.flatnonzero(np.concatenate(([True], (term_ids[1:] != term_ids[:-1]) | (docs[1:] != docs[:-1]))))
+    posting_terms = term_ids[starts]
+    return terms, {
+        "term_ptr": np.concatenate(([0], np.cumsum(np.bincount(posting_terms, minlength=len(terms))))).astype(np.int64),
+        "post_docs": docs[starts].astype(np.int32),
+        "pos_ptr": np.concatenate((starts, [total])).astype(np.int64),
+        "positions": positions.astype(np.int32)
+    }
+
+
+class Segment:
+    """
+    Segment immuable de l'index : termes triés, listes de documents et positions.
+
+    Les listes d'occurrences sont des tableaux d'entiers de taille fixe ; un
+    segment sur disque est projeté en mémoire (mmap) et n'est donc lu qu'à la demande.
+    """
+
+    def __init__(self, name, terms, doc_ids, names, arrays):
+        self.name = name
+        self.terms = {term: index for index, term in enumerate(terms)}
+        self.term_list = terms
+        self.doc_ids = doc_ids
+        self.names = names
+        for key in SEGMENT_ARRAYS:
+            setattr(self, key, arrays[key])
+
+    @classmethod
+    def open(cls, path):
+        """
+        Ouvre un segment enregistré, ses tableaux étant projetés en mémoire.
+        """
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {}
+        for key in SEGMENT_ARRAYS:
+            array_path = os.path.join(path, f"{key}.npy")
+            # Un tableau vide ne peut pas être projeté en mémoire
+            arrays[key] = np.load(array_path, mmap_mode="r") if os.path.getsize(array_path) > 128 else np.load(array_path)
+        return cls(os.path.basename(path), meta["terms"], meta["doc_ids"], meta["names"], arrays)
+
+    @classmethod
+    def build(cls, name, documents):
+        """
+        Construit un segment en mémoire.
+
+        Args:
+            name (str): Nom du segment
+            documents (list): Tuples (identifiant, nom, mots) des documents
+        """
+        terms, arrays = _build_arrays([tokens for _, _, tokens in documents])
+        return cls(name, terms, [doc_id for doc_id, _, _ in documents],
+                   [doc_name for _, doc_name, _ in documents], arrays)
+
+    def save(self, path):
+        """
+        Enregistre le segment dans un répertoire, rendu visible de manière atomique.
+        """
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        os.makedirs(temp_path)
+        with open(os.path.join(temp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"terms": self.term_list, "doc_ids": self.doc_ids, "names": self.names}, f, ensure_ascii=False)
+        for key in SEGMENT_ARRAYS:
+            np.save(os.path.join(temp_path, f"{key}.npy"), np.ascontiguousarray(getattr(self, key)))
+        os.replace(temp_path, path)
+
+    @property
+    def doc_count(self):
+        return len(self.doc_ids)
+
+    def _posting_range(self, term):
+        index = self.terms.get(term)
+        if index is None:
+            return 0, 0
+        return int(self.term_ptr[index]), int(self.term_ptr[index + 1])
+
+    def docs(self, term):
+        """
+        Numéros (triés) des documents contenant un terme.
+        """
+        start, end = self._posting_range(term)
+        return np.asarray(self.post_docs[start:end])
+
+    def phrase_docs(self, terms):
+        """
+        Numéros des documents contenant les termes consécutivement.
+        """
+        ranges = [self._posting_range(term) for term in terms]
+        if any(start == end for start, end in ranges):
+            return np.zeros(0, dtype=np.int32)
+        doc_lists = [np.asarray(self.post_docs[start:end]) for start, end in ranges]
+        candidates = doc_lists[0]
+        for docs in doc_lists[1:]:
+            candidates = np.intersect1d(candidates, docs, assume_unique=True)
+
+        matches = []
+        for doc in candidates:
+            current = None
+            for offset, ((start, _), docs) in enumerate(zip(ranges, doc_lists)):
+                posting = start + int(np.searchsorted(docs, doc))
+                positions = np.asarray(self.positions[self.pos_ptr[posting]:self.pos_ptr[posting + 1]]) - offset
+                current = positions if current is None else np.intersect1d(current, positions, assume_unique=True)
+                if not len(current):
+                    break
+            if len(current):
+                matches.append(doc)
+        return np.asarray(matches, dtype=np.int32)
+
+    def evaluate(self, tree):
+        """
+        Évalue l'arbre d'une requête sur le segment.
+
+        Returns:
+            ndarray: Numéros triés des documents correspondants
+        """
+        kind = tree[0]
+        if kind == "term":
+            return self.docs(tree[1])
+        if kind == "phrase":
+            return self.phrase_docs(tree[1])
+        if kind == "not":
+            return np.setdiff1d(np.arange(self.doc_count, dtype=np.int32), self.evaluate(tree[1]), assume_unique=True)
+        left = self.evaluate(tree[1])
+        if kind == "and":
+            if not len(left):
+                return left
+            return np.intersect1d(left, self.evaluate(tree[2]), assume_unique=True)
+        return np.union1d(left, self.evaluate(tree[2]))
+
+
+def merge_segments(name, segments, deleted):
+    """
+    Fusionne des segments en un seul, sans les documents supprimés.
+
+    La fusion est vectorisée : les listes d'occurrences de tous les segments
+    sont renumérotées, concaténées puis triées par (terme, document).
+
+    Args:
+        name (str): Nom du segment produit
+        segments (list): Segments à fusionner, dans l'ordre d'ajout
+        deleted (set): Identifiants des documents supprimés
+
+    Returns:
+        Segment: Segment fusionné, en mémoire
+    """
+    terms = sorted({term for segment in segments for term in segment.term_list})
+    term_index = {term: index for index, term in enumerate(terms)}
+
+    doc_ids, names = [], []
+    post_terms, post_docs, lengths, blocks = [], [], [], []
+    for segment in segments:
+        # Nouveau numéro de chaque document conservé, -1 pour un document supprimé
+        doc_map = np.full(segment.doc_count, -1, dtype=np.int64)
+        for doc, doc_id in enumerate(segment.doc_ids):
+            if doc_id not in deleted:
+                doc_map[doc] = len(doc_ids)
+                doc_ids.append(doc_id)
+                names.append(segment.names[doc])
+
+        term_ptr = np.asarray(segment.term_ptr)
+        pos_ptr = np.asarray(segment.pos_ptr)
+        global_terms = np.asarray([term_index[term] for term in segment.term_list], dtype=np.int64)
+        segment_docs = doc_map[np.asarray(segment.post_docs)]
+        keep = segment_docs >= 0
+        segment_lengths = np.diff(pos_ptr)
+
+        post_terms.append(np.repeat(global_terms, np.diff(term_ptr))[keep])
+        post_docs.append(segment_docs[keep])
+        lengths.append(segment_lengths[keep])
+        blocks.append(np.asarray(segment.positions)[np.repeat(keep, segment_lengths)])
+
+    post_terms = np.concatenate(post_terms) if post_terms else np.zeros(0, dtype=np.int64)
+    post_docs = np.concatenate(post_docs) if post_docs else np.zeros(0, dtype=np.int64)
+    lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64)
+    positions = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.int32)
+
+    # Tri des occurrences, puis déplacement des blocs de positions correspondants
+    order = np.lexsort((post_docs, post_terms))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else lengths
+    sorted_lengths = lengths[order]
+    new_starts = np.concatenate(([0], np.cumsum(sorted_lengths)))
+    gather = (np.repeat(starts[order] - new_starts[:-1], sorted_lengths)
+              + np.arange(int(new_starts[-1]), dtype=np.int64))
+
+    # Les termes dont toutes les occurrences ont été supprimées disparaissent
+    counts = np.bincount(post_terms, minlength=len(terms))
+    kept_terms = np.flatnonzero(counts)
+    arrays = {
+        "term_ptr": np.concatenate(([0], np.cumsum(counts[kept_terms]))).astype(np.int64),
+        "post_docs": post_docs[order].astype(np.int32),
+        "pos_ptr": new_starts.astype(np.int64),
+        "positions": positions[gather].astype(np.int32)
+    }
+    return Segment(name, [terms[index] for index in kept_terms], doc_ids, names, arrays)
+
+
+class InvertedIndex:
+    """
+    Index inversé persistant des CV stockés, pour la recherche booléenne et par expression.
+
+    Les documents passent par un journal SQLite : un CV stocké est d'abord mis
+    en file (queued), son texte est extrait en arrière-plan (pending, déjà
+    consultable), puis les documents en attente sont écrits dans un nouveau
+    segment immuable (indexed). Les segments sont fusionnés en arrière-plan
+    lorsqu'ils deviennent trop nombreux ; une suppression est un marqueur
+    appliqué à la recherche, puis effacé lors de la fusion du segment concerné.
+
+    La maintenance (extraction, écriture, fusion) est assurée par un seul
+    processus, élu par un verrou de fichier ; tous les processus peuvent
+    interroger l'index, sans jamais rouvrir les documents d'origine.
+    """
+
+    def __init__(self, directory, extract_text=None, flush_every=100, flush_interval=5.0,
+                 max_segments=8, merge_factor=4, poll_interval=1.0):
+        """
+        Initialise l'index.
+
+        Args:
+            directory (str): Répertoire de l'index (journal SQLite et segments)
+            extract_text (callable): Fonction retournant le texte d'un fichier stocké
+            flush_every (int): Nombre de documents en attente déclenchant l'écriture d'un segment
+            flush_interval (float): Ancienneté maximale d'un document en attente en secondes
+            max_segments (int): Nombre de segments au-delà duquel une fusion est lancée
+            merge_factor (int): Nombre minimum de segments fusionnés ensemble
+            poll_interval (float): Intervalle de scrutation du thread de maintenance en secondes
+        """
+        self.logger = logging.getLogger('inverted_index')
+        self.directory = str(directory)
+        self.extract_text = extract_text
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_segments = max_segments
+        self.merge_factor = merge_factor
+        self.poll_interval = poll_interval
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.db_path = os.path.join(self.directory, 'index.sqlite')
+        self.lock_path = os.path.join(self.directory, 'maintenance.lock')
+        self._local = threading.local()
+        self._segments = {}
+        self._segments_lock = threading.Lock()
+        self._lock_file = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS documents ("
+                    "doc_id TEXT PRIMARY KEY, name TEXT, path TEXT, state TEXT NOT NULL, tokens TEXT, "
+                    "segment TEXT, deleted INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_state ON documents(state, updated_at)")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS segments ("
+                    "name TEXT PRIMARY KEY, doc_count INTEGER NOT NULL, created_at REAL NOT NULL)"
+                )
+        finally:
+            conn.close()
+
+    def _connection(self):
+        """
+        Retourne la connexion SQLite du thread courant.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, doc_id, path, name=None):
+        """
+        Met en file un fichier stocké ; son texte sera extrait en arrière-plan.
+
+        Args:
+            doc_id (str): Identifiant du document
+            path (str): Chemin du fichier stocké
+            name (str): Nom affiché du document
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO documents (doc_id, name, path, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (doc_id, name, str(path), STATE_QUEUED, time.time())
+            )
+        self._wakeup.set()
+
+    def add(self, doc_id, text, name=None):
+        """
+        Ajoute directement le texte d'un document ; il est consultable immédiatement.
+
+        Args:
+            doc_id (str): Identifiant du document
+            text (str): Texte du document
+            name (str): Nom affiché du document
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO documents (doc_id, name, state, tokens, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (doc_id, name, STATE_PENDING, json.dumps(tokenize(text), ensure_ascii=False), time.time())
+            )
+
+    def remove(self, doc_id):
+        """
+        Retire un document de l'index.
+
+        Un document déjà écrit dans un segment reçoit un marqueur de suppression,
+        effacé lors de la fusion de ce segment ; les autres sont retirés du journal.
+
+        Args:
+            doc_id (str): Identifiant du document
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("UPDATE documents SET deleted = 1 WHERE doc_id = ? AND state = ?", (doc_id, STATE_INDEXED))
+            conn.execute("DELETE FROM documents WHERE doc_id = ? AND state != ?", (doc_id, STATE_INDEXED))
+
+    def _sync_segments(self, conn, attempts=3):
+        """
+        Ouvre les segments apparus et oublie ceux remplacés par une fusion.
+
+        Un segment lu dans la table peut être supprimé par la fusion d'un autre
+        processus avant d'être ouvert : la table est alors relue.
+        """
+        for attempt in range(attempts):
+            names = [row[0] for row in conn.execute("SELECT name FROM segments ORDER BY created_at, name")]
+            try:
+                with self._segments_lock:
+                    for name in names:
+                        if name not in self._segments:
+                            self._segments[name] = Segment.open(os.path.join(self.directory, name))
+                    for name in set(self._segments) - set(names):
+                        del self._segments[name]
+                    return [self._segments[name] for name in names]
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+                self.logger.info("Segment remplacé par une fusion pendant son ouverture, relecture des segments")
+
+    def search(self, query, limit=50):
+        """
+        Recherche les documents correspondant à une requête booléenne.
+
+        Args:
+            query (str): Requête (mots, "expressions", AND, OR, NOT, parenthèses)
+            limit (int): Nombre maximum de documents retournés
+
+        Returns:
+            dict: Nombre total de documents correspondants et documents retournés (plus récents d'abord)
+
+        Raises:
+            QuerySyntaxError: Si la requête est mal formée
+        """
+        tree = parse_query(query)
+        with stage_timer("search"):
+            conn = self._connection()
+            segments = self._sync_segments(conn)
+            deleted = {row[0] for row in conn.execute("SELECT doc_id FROM documents WHERE deleted = 1")}
+            pending = [
+                (doc_id, name, json.loads(tokens)) for doc_id, name, tokens in conn.execute(
+                    "SELECT doc_id, name, tokens FROM documents WHERE state = ? ORDER BY updated_at", (STATE_PENDING,)
+                )
+            ]
+            if pending:
+                segments = segments + [Segment.build("pending", pending)]
+
+            total = 0
+            results = []
+            for segment in reversed(segments):
+                for doc in segment.evaluate(tree)[::-1]:
+                    doc_id = segment.doc_ids[doc]
+                    if doc_id in deleted:
+                        continue
+                    total += 1
+                    if len(results) < limit:
+                        results.append({"cv_id": doc_id, "name": segment.names[doc]})
+            return {"total": total, "results": results}
+
+    def stats(self):
+        """
+        Retourne le nombre de documents par état et le nombre de segments.
+        """
+        conn = self._connection()
+        states = dict(conn.execute("SELECT state, COUNT(*) FROM documents WHERE deleted = 0 GROUP BY state"))
+        return {
+            "documents": states,
+            "deleted": conn.execute("SELECT COUNT(*) FROM documents WHERE deleted = 1").fetchone()[0],
+            "segments": conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0],
+            "maintainer": self._lock_file is not None
+        }
+
+    def _extract_queued(self, conn, batch_size=20):
+        """
+        Extrait le texte des documents en file.
+
+        Returns:
+            int: Nombre de documents traités
+        """
+        rows = conn.execute(
+            "SELECT doc_id, path FROM documents WHERE state = ? ORDER BY updated_at LIMIT ?", (STATE_QUEUED, batch_size)
+        ).fetchall()
+        for doc_id, path in rows:
+            try:
+                tokens, state = json.dumps(tokenize(self.extract_text(path)), ensure_ascii=False), STATE_PENDING
+            except Exception as e:
+                self.logger.warning(f"Extraction du texte impossible pour {doc_id}: {str(e)}")
+                tokens, state = None, STATE_FAILED
+            with conn:
+                conn.execute(
+                    "UPDATE documents SET state = ?, tokens = ?, updated_at = ? WHERE doc_id = ? AND state = ?",
+                    (state, tokens, time.time(), doc_id, STATE_QUEUED)
+                )
+        return len(rows)
+
+    def flush(self, force=False):
+        """
+        Écrit les documents en attente dans un nouveau segment.
+
+        Args:
+            force (bool): Écrire même si le seuil et l'ancienneté ne sont pas atteints
+
+        Returns:
+            int: Nombre de documents écrits
+        """
+        conn = self._connection()
+        count, oldest = conn.execute(
+            "SELECT COUNT(*), MIN(updated_at) FROM documents WHERE state = ?", (STATE_PENDING,)
+        ).fetchone()
+        if not count or not (force or count >= self.flush_every or time.time() - oldest >= self.flush_interval):
+            return 0
+
+        rows = conn.execute(
+            "SELECT doc_id, name, tokens FROM documents WHERE state = ? ORDER BY updated_at", (STATE_PENDING,)
+        ).fetchall()
+        name = f"seg-{time.time_ns():020d}-{uuid.uuid4().hex[:6]}"
+        with stage_timer("index_flush"):
+            segment = Segment.build(name, [(doc_id, doc_name, json.loads(tokens)) for doc_id, doc_name, tokens in rows])
+            segment.save(os.path.join(self.directory, name))
+        with conn:
+            conn.execute("INSERT INTO segments (name, doc_count, created_at) VALUES (?, ?, ?)",
+                         (name, segment.doc_count, time.time()))
+            conn.executemany(
+                "UPDATE documents SET state = ?, segment = ?, tokens = NULL WHERE doc_id = ? AND state = ?",
+                [(STATE_INDEXED, name, doc_id, STATE_PENDING) for doc_id, _, _ in rows]
+            )
+        self.logger.info(f"Segment {name} écrit: {segment.doc_count} documents")
+        return segment.doc_count
+
+    def merge(self, force=False):
+        """
+        Fusionne les plus petits segments lorsque leur nombre dépasse le seuil.
+
+        Args:
+            force (bool): Fusionner tous les segments, quel que soit leur nombre
+
+        Returns:
+            str: Nom du segment produit, ou None si aucune fusion n'a eu lieu
+        """
+        conn = self._connection()
+        segments = self._sync_segments(conn)
+        if len(segments) < 2 or (not force and len(segments) <= self.max_segments):
+            return None
+
+        if force:
+            selected = segments
+        else:
+            # Les plus petits segments sont fusionnés : chaque document est réécrit un nombre logarithmique de fois
+            count = max(self.merge_factor, len(segments) - self.max_segments + 1)
+            selected = sorted(segments, key=lambda segment: segment.doc_count)[:count]
+        # L'ordre d'ajout est conservé pour que les résultats restent triés du plus récent au plus ancien
+        order = {segment.name: index for index, segment in enumerate(segments)}
+        selected.sort(key=lambda segment: order[segment.name])
+        names = [segment.name for segment in selected]
+
+        placeholders = ",".join("?" * len(names))
+        deleted = {row[0] for row in conn.execute(
+            f"SELECT doc_id FROM documents WHERE deleted = 1 AND segment IN ({placeholders})", names
+        )}
+        name = f"seg-{time.time_ns():020d}-{uuid.uuid4().hex[:6]}"
+        with stage_timer("index_merge"):
+            merged = merge_segments(name, selected, deleted)
+            merged.save(os.path.join(self.directory, name))
+
+        created_at = conn.execute(
+            f"SELECT MAX(created_at) FROM segments WHERE name IN ({placeholders})", names
+        ).fetchone()[0]
+        with conn:
+            conn.execute(f"DELETE FROM segments WHERE name IN ({placeholders})", names)
+            conn.execute("INSERT INTO segments (name, doc_count, created_at) VALUES (?, ?, ?)",
+                         (name, merged.doc_count, created_at))
+            # Seuls les documents exclus de la fusion sont effacés : un marqueur posé entre-temps reste appliqué
+            conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id in deleted])
+            conn.execute(f"UPDATE documents SET segment = ? WHERE segment IN ({placeholders})", [name] + names)
+
+        # Les processus qui ont encore ces segments projetés en mémoire continuent de les lire
+        for old_name in names:
+            shutil.rmtree(os.path.join(self.directory, old_name), ignore_errors=True)
+        self.logger.info(f"{len(names)} segments fusionnés dans {name}: {merged.doc_count} documents")
+        return name
+
+    def try_acquire(self):
+        """
+        Tente de devenir le processus de maintenance de l'index, sans bloquer.
+
+        Returns:
+            bool: True si ce processus assure la maintenance
+        """
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            self._lock_file = True
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.logger.info(f"Maintenance de l'index de recherche assurée par le pid {os.getpid()}")
+        return True
+
+    def release(self):
+        """
+        Libère le verrou de maintenance.
+        """
+        if self._lock_file not in (None, True):
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._lock_file.close()
+        self._lock_file = None
+
+    def run_once(self, force=False):
+        """
+        Exécute une passe de maintenance si ce processus est élu.
+
+        Args:
+            force (bool): Écrire les documents en attente et fusionner sans attendre les seuils
+
+        Returns:
+            bool: True si la passe a été exécutée
+        """
+        if not self.try_acquire():
+            return False
+        conn = self._connection()
+        while self._extract_queued(conn):
+            pass
+        self.flush(force)
+        while self.merge(force):
+            force = False
+        return True
+
+    def start(self):
+        """
+        Démarre le thread de maintenance.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="inverted-index", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """
+        Arrête le thread de maintenance et libère le verrou.
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.release()
+
+    def _loop(self):
+        """
+        Boucle du thread : extraction, écriture et fusion à chaque réveil.
+        """
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la maintenance de l'index: {str(e)}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
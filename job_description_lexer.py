@@ -0,0 +1,163 @@
+import re
+from bisect import bisect_left
+
+# Mots vides français
+FRENCH_STOPWORDS = frozenset([
+    "le", "la", "les", "un", "une", "des", "et", "ou", "de", "du", "au", "aux",
+    "ce", "cette", "ces", "mon", "ton", "son", "notre", "votre", "leur",
+    "pour", "par", "sur", "sous", "dans", "avec", "sans", "en", "à", "qui",
+    "que", "quoi", "dont", "où", "comment", "pourquoi", "quand", "est", "sont",
+    "sera", "seront", "été", "avoir", "être", "faire", "plus", "moins", "très",
+    "si", "tout", "tous", "toute", "toutes", "autre", "autres", "même", "aussi",
+    "alors", "donc", "car", "mais", "ni", "ne", "pas"
+])
+
+# Marqueurs de section, par ordre de priorité
+SECTION_MARKERS = {
+    "compétences": ["compétences", "qualifications", "profil", "requis"],
+    "responsabilités": ["responsabilités", "missions", "tâches", "rôle"],
+    "formation": ["formation", "diplôme", "études", "éducation"],
+    "expérience": ["expérience", "parcours", "antécédents"]
+}
+
+# Motifs de niveau d'études, par ordre de priorité
+EDUCATION_GROUPS = ("bac", "degree", "engineer")
+
+_ALL_MARKERS = sorted({marker for markers in SECTION_MARKERS.values() for marker in markers},
+                      key=len, reverse=True)
+
+# Les signaux structurels sont essayés avant les mots à chaque position,
+# ce qui permet de tout collecter en un seul parcours du texte.
+_LEXER_PATTERN = re.compile(
+    r"(?P<blank>\n(?=\n))"
+    r"|(?P<tech>\bcompétences\s+techniques[^:\n]*:)"
+    r"|(?P<section>\b(?P<marker>" + "|".join(map(re.escape, _ALL_MARKERS)) + r")\s*:)"
+    r"|(?P<experience>\b(?P<years>\d+)\+?\s+ans?\s+d['’]expérience\w*)"
+    r"|(?P<bac>\bbac\s*\+\s*\d+)"
+    r"|\b(?P<degree>master|licence|doctorat)\w*"
+    r"|(?P<engineer>\bdiplôme\s+d['’]ingénieur)"
+    r"|(?P<contract>\b(?:cdi|cdd|stage|alternance|freelance|intérim)\b)"
+    r"|(?P<word>\w+)",
+    re.IGNORECASE
+)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+_SKILL_SEPARATORS = re.compile(r"[,;•]")
+
+
+class JobDescriptionLexer:
+    """
+    Analyseur lexical des descriptions de poste.
+
+    Un unique parcours du texte découpe les sections, extrait les mots, filtre
+    les mots vides et collecte les signaux structurés (expérience, formation,
+    type de contrat, compétences techniques).
+    """
+
+    def __init__(self, stopwords=FRENCH_STOPWORDS, min_word_length=3):
+        """
+        Initialise l'analyseur lexical.
+
+        Args:
+            stopwords (frozenset): Mots vides à ignorer
+            min_word_length (int): Longueur minimale d'un mot retenu
+        """
+        self.stopwords = frozenset(stopwords)
+        self.min_word_length = min_word_length
+
+    def lex(self, job_description):
+        """
+        Analyse une description de poste en un seul parcours.
+
+        Args:
+            job_description (str): Description du poste
+
+        Returns:
+            dict: Mots filtrés, mots par section et signaux structurés
+        """
+        text = job_description
+        length = len(text)
+
+        positions = []
+        words = []
+        blanks = []
+        first_marker = {}
+        tech_start = None
+        experience_years = None
+        education = {}
+        contract_type = None
+
+        for match in _LEXER_PATTERN.finditer(text):
+            kind = match.lastgroup
+            if kind == "blank":
+                blanks.append(match.start())
+                continue
+
+            if kind == "word":
+                self._add_word(match.group(), match.start(), positions, words)
+                continue
+
+            # Les signaux contiennent eux-mêmes des mots à comptabiliser
+            for word_match in _WORD_PATTERN.finditer(match.group()):
+                self._add_word(word_match.group(), match.start() + word_match.start(), positions, words)
+
+            if kind == "section":
+                marker = match.group("marker").lower()
+                if marker not in first_marker and match.end() < length:
+                    first_marker[marker] = match.end()
+            elif kind == "tech":
+                if tech_start is None:
+                    tech_start = match.end()
+            elif kind == "experience":
+                if experience_years is None:
+                    experience_years = match.group("years")
+            elif kind == "contract":
+                if contract_type is None:
+                    contract_type = match.group().upper()
+            elif kind in EDUCATION_GROUPS and kind not in education:
+                education[kind] = match.group(kind)
+
+        sections = {}
+        for section_name, markers in SECTION_MARKERS.items():
+            for marker in markers:
+                if marker in first_marker:
+                    start = first_marker[marker]
+                    # Une section contient au moins un caractère et s'arrête à la première ligne vide
+                    end = self._next_blank(blanks, start + 1, length)
+                    if text[start:end].strip():
+                        first = bisect_left(positions, start)
+                        last = bisect_left(positions, end)
+                        sections[section_name] = words[first:last]
+                    break
+
+        technical_skills = []
+        if tech_start is not None:
+            tech_text = text[tech_start:self._next_blank(blanks, tech_start, length)]
+            technical_skills = [skill.strip() for skill in _SKILL_SEPARATORS.split(tech_text) if skill.strip()]
+
+        return {
+            "words": [word for word in words if word not in self.stopwords],
+            "sections": {name: [word for word in section_words if word not in self.stopwords]
+                         for name, section_words in sections.items()},
+            "technical_skills": technical_skills,
+            "experience_years": experience_years,
+            "education": next((education[group] for group in EDUCATION_GROUPS if group in education), None),
+            "contract_type": contract_type
+        }
+
+    def _add_word(self, word, position, positions, words):
+        """
+        Enregistre un mot et sa position s'il est assez long.
+        """
+        if len(word) >= self.min_word_length:
+            positions.append(position)
+            words.append(word.lower())
+
+    @staticmethod
+    def _next_blank(blanks, start, default):
+        """
+        Retourne la position de la première ligne vide à partir de start.
+        """
+        index = bisect_left(blanks, start)
+        return blanks[index] if index < len(blanks) else default
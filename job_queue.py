@@ -0,0 +1,328 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+
+# États possibles d'une tâche
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# Types de tâches
+KIND_ADAPT = 'adapt'
+KIND_BATCH = 'batch'
+
+
+class QueueFullError(Exception):
+    """
+    Levée lorsque la file d'attente a atteint sa capacité maximale.
+    """
+
+
+class JobQueue:
+    """
+    File de tâches d'adaptation de CV exécutées en arrière-plan.
+
+    Les tâches sont persistées dans une table SQLite partagée par tous les workers
+    gunicorn : une tâche en attente peut être prise en charge par n'importe quel
+    processus, et une tâche interrompue par un redémarrage est remise en file
+    lorsque son propriétaire cesse d'émettre des signaux de vie.
+    """
+
+    def __init__(self, db_path, processor, max_workers=2, max_pending=100,
+                 poll_interval=1.0, stale_after=300, max_attempts=3, on_done=None,
+                 batch_processor=None, on_batch_done=None):
+        """
+        Initialise la file de tâches.
+
+        Args:
+            db_path (str): Chemin de la base SQLite des tâches
+            processor (CVProcessor): Processeur utilisé pour adapter les CV
+            max_workers (int): Nombre de threads d'exécution par processus
+            max_pending (int): Nombre maximum de tâches en attente
+            poll_interval (float): Intervalle de scrutation de la table en secondes
+            stale_after (int): Délai sans signal de vie après lequel une tâche est reprise
+            max_attempts (int): Nombre maximum d'exécutions d'une même tâche
+            on_done (callable): Fonction appelée avec (chemin du CV, nom d'origine) après une adaptation réussie
+            batch_processor (BatchProcessor): Processeur des tâches d'adaptation par lots
+            on_batch_done (callable): Fonction appelée avec le résultat d'un lot terminé
+        """
+        self.logger = logging.getLogger('job_queue')
+        self.db_path = str(db_path)
+        self.processor = processor
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.on_done = on_done
+        self.batch_processor = batch_processor
+        self.on_batch_done = on_batch_done
+
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    "id TEXT PRIMARY KEY, status TEXT NOT NULL, cv_path TEXT NOT NULL, "
+                    "original_filename TEXT, job_description TEXT NOT NULL, result TEXT, error TEXT, "
+                    "owner TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                    "created_at REAL NOT NULL, updated_at REAL NOT NULL, heartbeat_at REAL, "
+                    f"kind TEXT NOT NULL DEFAULT '{KIND_ADAPT}')"
+                )
+                # Les bases créées avant les tâches par lots n'ont pas de colonne kind
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+                if 'kind' not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN kind TEXT NOT NULL DEFAULT '{KIND_ADAPT}'")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        finally:
+            conn.close()
+
+    def start(self):
+        """
+        Démarre les threads d'exécution et le thread de signal de vie.
+        """
+        if self._threads:
+            return
+        # Propriétaire propre au processus qui exécute les tâches (le maître gunicorn peut avoir créé la file)
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stop.clear()
+        for index in range(self.max_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        self.logger.info(f"File de tâches démarrée avec {self.max_workers} threads (propriétaire {self.owner})")
+
+    def stop(self, timeout=5):
+        """
+        Arrête les threads après la fin des tâches en cours.
+
+        Args:
+            timeout (float): Délai maximum d'attente par thread en secondes
+        """
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, cv_path, job_description, original_filename=None, kind=KIND_ADAPT):
+        """
+        Ajoute une tâche d'adaptation de CV à la file.
+
+        Args:
+            cv_path (str): Chemin du CV téléchargé (ou de l'archive des CV d'un lot)
+            job_description (str): Description du poste
+            original_filename (str): Nom du fichier d'origine
+            kind (str): Type de tâche (KIND_ADAPT ou KIND_BATCH)
+
+        Returns:
+            str: Identifiant de la tâche
+
+        Raises:
+            QueueFullError: Si la file a atteint sa capacité maximale
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            pending = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (STATUS_QUEUED, STATUS_RUNNING)
+            ).fetchone()[0]
+            if pending >= self.max_pending:
+                raise QueueFullError(f"File d'attente pleine ({pending} tâches en cours)")
+            conn.execute(
+                "INSERT INTO jobs (id, status, kind, cv_path, original_filename, job_description, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, kind, str(cv_path), original_filename, job_description, now, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.logger.info(f"Tâche {job_id} ajoutée à la file")
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """
+        Retourne l'état d'une tâche.
+
+        Args:
+            job_id (str): Identifiant de la tâche
+
+        Returns:
+            dict: Informations sur la tâche, ou None si elle n'existe pas
+        """
+        row = self._connection().execute(
+            "SELECT id, status, original_filename, result, error, attempts, created_at, updated_at, kind "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "original_filename": row[2],
+            "result": json.loads(row[3]) if row[3] else None,
+            "error": row[4],
+            "attempts": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+            "kind": row[8]
+        }
+
+    def counts(self):
+        """
+        Retourne le nombre de tâches par état.
+
+        Returns:
+            dict: Nombre de tâches pour chaque état
+        """
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def _claim(self):
+        """
+        Réserve de manière atomique la plus ancienne tâche en attente.
+
+        Returns:
+            tuple: (id, chemin du CV, description du poste, nom d'origine, type) ou None
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._recover_stale(conn, now)
+            row = conn.execute(
+                "SELECT id, cv_path, job_description, original_filename, kind FROM jobs WHERE status = ? "
+                "ORDER BY created_at LIMIT 1", (STATUS_QUEUED,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, owner = ?, attempts = attempts + 1, "
+                    "updated_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (STATUS_RUNNING, self.owner, now, now, row[0])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _recover_stale(self, conn, now):
+        """
+        Remet en file les tâches dont le propriétaire a cessé d'émettre des signaux de vie.
+        """
+        cutoff = now - self.stale_after
+        failed = conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, owner = NULL, updated_at = ? "
+            "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+            (STATUS_FAILED, "Nombre maximum de tentatives atteint", now, STATUS_RUNNING, cutoff, self.max_attempts)
+        ).rowcount
+        requeued = conn.execute(
+            "UPDATE jobs SET status = ?, owner = NULL, updated_at = ? "
+            "WHERE status = ? AND heartbeat_at < ?",
+            (STATUS_QUEUED, now, STATUS_RUNNING, cutoff)
+        ).rowcount
+        if failed or requeued:
+            self.logger.warning(f"Tâches interrompues: {requeued} remises en file, {failed} abandonnées")
+
+    def _finish(self, job_id, status, result=None, error=None):
+        """
+        Enregistre le résultat d'une tâche.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, owner = NULL, updated_at = ? "
+                "WHERE id = ? AND owner = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, time.time(), job_id, self.owner)
+            )
+
+    def _run(self, job_id, cv_path, job_description, original_filename=None, kind=KIND_ADAPT):
+        """
+        Exécute une tâche et enregistre son résultat.
+        """
+        self.logger.info(f"Exécution de la tâche {job_id}")
+        try:
+            if kind == KIND_BATCH:
+                if self.batch_processor is None:
+                    raise RuntimeError("Aucun processeur de lots n'est configuré")
+                result = self.batch_processor.process_archive(cv_path, job_description)
+            else:
+                result = self.processor.adapt_cv(cv_path, job_description)
+        except Exception as e:
+            self.logger.error(f"Échec de la tâche {job_id}: {str(e)}")
+            self._finish(job_id, STATUS_FAILED, error=str(e))
+            return
+        self._finish(job_id, STATUS_DONE, result=result)
+        self.logger.info(f"Tâche {job_id} terminée: {result['filename']}")
+
+        try:
+            if kind == KIND_BATCH:
+                if self.on_batch_done is not None:
+                    self.on_batch_done(cv_path, result)
+            elif self.on_done is not None:
+                self.on_done(cv_path, original_filename)
+        except Exception as e:
+            self.logger.error(f"Erreur après la tâche {job_id}: {str(e)}")
+
+    def _worker_loop(self):
+        """
+        Boucle d'un thread d'exécution.
+        """
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                self.logger.error(f"Erreur d'accès à la file de tâches: {str(e)}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(*job)
+
+    def _heartbeat_loop(self):
+        """
+        Signale périodiquement que les tâches de ce processus sont toujours en cours.
+        """
+        interval = max(self.stale_after / 3, 0.1)
+        while not self._stop.wait(interval):
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.execute(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = ?",
+                        (time.time(), self.owner, STATUS_RUNNING)
+                    )
+            except sqlite3.Error as e:
+                self.logger.error(f"Erreur lors du signal de vie des tâches: {str(e)}")
+
+    def _connection(self):
+        """
+        Retourne la connexion SQLite du thread courant (transactions explicites).
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
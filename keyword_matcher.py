@@ -0,0 +1,179 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Ligatures non décomposées par la normalisation Unicode
+_LIGATURES = str.maketrans({"œ": "oe", "Œ": "oe", "æ": "ae", "Æ": "ae"})
+
+# Clé de fin de mot-clé dans le trie (les arêtes sont des chaînes)
+_TERMINAL = None
+
+
+@lru_cache(maxsize=65536)
+def normalize_token(token):
+    """
+    Normalise un mot : sans accents ni casse, puis racinisation légère du français.
+
+    La racinisation retire les marques usuelles du pluriel, du féminin et des
+    participes ("expériences" et "experience" donnent "experienc",
+    "développée" et "développer" donnent "develop") sans chercher à rapprocher
+    les dérivés ("développement" reste distinct).
+
+    Args:
+        token (str): Mot à normaliser
+
+    Returns:
+        str: Forme normalisée du mot
+    """
+    decomposed = unicodedata.normalize("NFKD", token.translate(_LIGATURES))
+    token = "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+    # Les mots courts et les sigles restent intacts
+    if len(token) < 6 or not token.isalpha():
+        return token
+    if token.endswith("x"):
+        return token[:-3] + "al" if token.endswith("aux") else token[:-1]
+    for suffix in ("s", "r", "e", "e"):
+        if token.endswith(suffix):
+            token = token[:-1]
+    if token[-1] == token[-2]:
+        token = token[:-1]
+    return token
+
+
+def normalize_terms(text):
+    """
+    Découpe un texte en mots normalisés.
+
+    Args:
+        text (str): Texte ou mot-clé (éventuellement de plusieurs mots)
+
+    Returns:
+        tuple: Formes normalisées des mots, dans l'ordre du texte
+    """
+    return tuple(normalize_token(word) for word in _TOKEN_PATTERN.findall(text))
+
+
+class KeywordMatcher:
+    """
+    Moteur de correspondance multi-mots-clés, construit une seule fois par description de poste.
+
+    Les mots-clés, éventuellement composés de plusieurs mots ("mise en œuvre"),
+    sont normalisés (accents, casse, racinisation légère) et rangés dans un trie
+    dont les arêtes sont des mots. Le texte est découpé en mots une seule fois,
+    chaque mot est normalisé puis suivi dans le trie : la recherche respecte les
+    limites de mots ("gestion" ne correspond pas à "digestion") et ne relit pas le
+    texte, quelle que soit la taille de la liste de mots-clés.
+    """
+
+    def __init__(self, keywords):
+        """
+        Construit le moteur de correspondance.
+
+        Args:
+            keywords (iterable): Mots-clés à rechercher (insensible à la casse et aux accents)
+        """
+        self.keywords = sorted({keyword.lower() for keyword in keywords if keyword})
+        self._trie = self._compile(self.keywords)
+
+    @staticmethod
+    def _compile(keywords):
+        """
+        Construit le trie des mots-clés normalisés.
+
+        Args:
+            keywords (list): Mots-clés normalisés en minuscules
+
+        Returns:
+            dict: Racine du trie, ou None si la liste est vide
+        """
+        trie = {}
+        for keyword in keywords:
+            terms = normalize_terms(keyword)
+            if not terms:
+                continue
+            node = trie
+            for term in terms:
+                node = node.setdefault(term, {})
+            # Le premier mot-clé (ordre alphabétique) représente ses variantes
+            node.setdefault(_TERMINAL, keyword)
+        return trie or None
+
+    def __bool__(self):
+        return self._trie is not None
+
+    def iter_matches(self, text):
+        """
+        Parcourt les occurrences des mots-clés dans un texte, en une seule passe.
+
+        Les chevauchements sont résolus en retenant la correspondance la plus à gauche,
+        puis la plus longue ; les occurrences produites sont disjointes et triées.
+
+        Args:
+            text (str): Texte à analyser
+
+        Yields:
+            tuple: (début, fin, mot-clé) de chaque occurrence
+        """
+        if self._trie is None or not text:
+            return
+        words = [(match.start(), match.end(), normalize_token(match.group()))
+                 for match in _TOKEN_PATTERN.finditer(text)]
+        trie = self._trie
+        index = 0
+        while index < len(words):
+            node = trie.get(words[index][2])
+            if node is None:
+                index += 1
+                continue
+            # Suivi du trie mot à mot ; la dernière fin de mot-clé rencontrée est la plus longue
+            last, keyword = None, None
+            position = index
+            while node is not None:
+                if _TERMINAL in node:
+                    last, keyword = position, node[_TERMINAL]
+                position += 1
+                node = node.get(words[position][2]) if position < len(words) else None
+            if last is None:
+                index += 1
+                continue
+            yield words[index][0], words[last][1], keyword
+            index = last + 1
+
+    def contains(self, text):
+        """
+        Indique si un texte contient au moins un mot-clé, sans énumérer les occurrences.
+
+        Args:
+            text (str): Texte à analyser
+
+        Returns:
+            bool: True si un mot-clé est présent
+        """
+        return next(self.iter_matches(text), None) is not None
+
+    def find_all(self, text):
+        """
+        Trouve toutes les occurrences des mots-clés dans un texte en une seule passe.
+
+        Args:
+            text (str): Texte à analyser
+
+        Returns:
+            list: Liste de tuples (début, fin) des occurrences trouvées
+        """
+        return [(start, end) for start, end, _ in self.iter_matches(text)]
+
+    def find_keywords(self, text):
+        """
+        Retourne les mots-clés présents dans un texte.
+
+        Args:
+            text (str): Texte à analyser
+
+        Returns:
+            set: Mots-clés trouvés, sous leur forme d'origine
+        """
+        return {keyword for _, _, keyword in self.iter_matches(text)}
@@ -0,0 +1,498 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+# Bornes des histogrammes de latence, en secondes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Instant de démarrage du processus, pour le calcul de la disponibilité
+PROCESS_START_TIME = time.time()
+
+logger = logging.getLogger('metrics')
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Base commune des métriques : valeurs indexées par étiquettes, protégées par un verrou.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Étiquettes attendues pour {self.name}: {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+    def snapshot(self):
+        """
+        Copie des valeurs courantes, pour calculer plus tard ce qui a été enregistré depuis.
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def delta(self, before):
+        """
+        Valeurs enregistrées depuis un instantané (voir snapshot), vide pour une valeur instantanée.
+        """
+        return {}
+
+    def merge(self, delta):
+        """
+        Ajoute des valeurs enregistrées dans un autre processus (voir delta).
+        """
+
+    def combined(self, snapshots):
+        """
+        Copie de la métrique dont les valeurs sont la somme des instantanés donnés.
+        """
+        metric = object.__new__(type(self))
+        metric.__dict__.update(self.__dict__)
+        metric._values = {}
+        metric._lock = threading.Lock()
+        for values in snapshots:
+            metric.merge(values)
+        return metric
+
+
+class Counter(_Metric):
+    """
+    Compteur monotone.
+    """
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Un compteur ne peut pas décroître")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def delta(self, before):
+        with self._lock:
+            return {key: value - before.get(key, 0) for key, value in self._values.items()
+                    if value != before.get(key, 0)}
+
+    def merge(self, delta):
+        with self._lock:
+            for key, amount in delta.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Valeur instantanée, fixée au moment de la collecte.
+    """
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    Histogramme cumulatif de durées.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Mesure la durée du bloc, y compris lorsqu'il lève une exception.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state["count"] if state else 0
+
+    def sum(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state["sum"] if state else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {key: (list(state["counts"]), state["sum"], state["count"]) for key, state in self._values.items()}
+
+    def delta(self, before):
+        delta = {}
+        with self._lock:
+            for key, state in self._values.items():
+                counts, total, count = before.get(key, ([0] * len(self.buckets), 0.0, 0))
+                if state["count"] != count:
+                    delta[key] = ([current - previous for current, previous in zip(state["counts"], counts)],
+                                  state["sum"] - total, state["count"] - count)
+        return delta
+
+    def merge(self, delta):
+        with self._lock:
+            for key, (counts, total, count) in delta.items():
+                state = self._values.get(key)
+                if state is None:
+                    state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                state["counts"] = [current + added for current, added in zip(state["counts"], counts)]
+                state["sum"] += total
+                state["count"] += count
+
+    def _render_samples(self, items):
+        lines = []
+        for key, state in items:
+            for bound, count in zip(self.buckets, state["counts"]):
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {state['count']}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registre des métriques du processus, exposées au format texte de Prometheus.
+
+    Chaque worker gunicorn possède son propre registre, et une collecte n'atteint
+    qu'un seul d'entre eux. Une fois partagé (voir share), le registre publie ses
+    compteurs et histogrammes dans un fichier par processus d'un répertoire
+    commun, et la collecte additionne ceux de tous les workers. Les jauges
+    restent celles du worker qui répond.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._directory = None
+        self._path = None
+        self._written = None
+        self._flush_lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Métrique déjà enregistrée avec un autre type: {metric.name}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        """
+        Copie des valeurs de toutes les métriques.
+
+        Returns:
+            dict: Valeurs par nom de métrique, à passer ensuite à delta
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def delta(self, before):
+        """
+        Valeurs enregistrées depuis un instantané, pour les transmettre à un autre processus.
+
+        Les compteurs et histogrammes d'un processus isolé ne sont pas collectés :
+        le processus qui sert /metrics les y ajoute avec merge.
+
+        Args:
+            before (dict): Instantané produit par snapshot
+
+        Returns:
+            dict: Valeurs ajoutées depuis l'instantané, par nom de métrique (sérialisable)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        delta = {}
+        for metric in metrics:
+            values = metric.delta(before.get(metric.name, {}))
+            if values:
+                delta[metric.name] = values
+        return delta
+
+    def merge(self, delta):
+        """
+        Ajoute au registre des valeurs produites par delta dans un autre processus.
+
+        Args:
+            delta (dict): Valeurs par nom de métrique
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, values in delta.items():
+            if name in metrics:
+                metrics[name].merge(values)
+
+    def share(self, directory, interval=1.0):
+        """
+        Publie les compteurs et histogrammes du processus pour les autres workers.
+
+        Les valeurs sont écrites dans un fichier propre au processus au plus tard
+        interval secondes après leur enregistrement, ainsi qu'à chaque collecte et
+        à la sortie du processus. Le fichier d'un worker arrêté est conservé, pour
+        que les totaux ne décroissent pas ; il est retiré par clear_shared au
+        démarrage suivant du serveur.
+
+        Args:
+            directory (str): Répertoire commun aux workers
+            interval (float): Délai maximal de publication en secondes
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._flush_lock:
+            started = self._path is not None
+            self._directory = directory
+            # Le numéro de processus peut être réattribué à un worker ultérieur
+            self._path = directory / f"{os.getpid()}-{time.time_ns()}.json"
+            self._written = None
+        self.flush()
+        if not started:
+            atexit.register(self.flush)
+            thread = threading.Thread(target=self._flush_loop, args=(interval,), name='metrics-flush', daemon=True)
+            thread.start()
+
+    def _flush_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def _shared_values(self):
+        """
+        Compteurs et histogrammes du processus, sous une forme sérialisable en JSON.
+        """
+        with self._lock:
+            metrics = [metric for metric in self._metrics.values() if metric.kind != "gauge"]
+        return {metric.name: [[list(key), value] for key, value in metric.snapshot().items()] for metric in metrics}
+
+    def flush(self):
+        """
+        Écrit les valeurs du processus dans son fichier partagé, si elles ont changé.
+        """
+        with self._flush_lock:
+            if self._path is None:
+                return
+            content = json.dumps(self._shared_values(), sort_keys=True)
+            if content == self._written:
+                return
+            temporary = self._path.with_suffix(".tmp")
+            try:
+                temporary.write_text(content)
+                os.replace(temporary, self._path)
+            except OSError as e:
+                logger.warning(f"Publication des métriques impossible: {str(e)}")
+                return
+            self._written = content
+
+    def _other_processes(self):
+        """
+        Valeurs publiées par les autres processus, par nom de métrique.
+        """
+        values = {}
+        for path in self._directory.glob("*.json"):
+            if path == self._path:
+                continue
+            try:
+                content = json.loads(path.read_text())
+            except (OSError, ValueError):
+                # Fichier retiré ou remplacé pendant la lecture
+                continue
+            for name, items in content.items():
+                values.setdefault(name, []).append({tuple(key): value for key, value in items})
+        return values
+
+    def render(self):
+        """
+        Produit l'exposition texte de toutes les métriques.
+
+        Returns:
+            str: Métriques au format texte de Prometheus (version 0.0.4)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        others = {}
+        if self._path is not None:
+            self.flush()
+            others = self._other_processes()
+        lines = []
+        for metric in metrics:
+            if metric.name in others and metric.kind != "gauge":
+                metric = metric.combined([metric.snapshot()] + others[metric.name])
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "cv_analyzer_stage_duration_seconds",
+    "Durée des étapes du traitement des CV",
+    ("stage", "file_type")
+)
+ADAPT_DURATION = REGISTRY.histogram(
+    "cv_analyzer_adapt_duration_seconds",
+    "Durée totale de l'adaptation d'un CV",
+    ("file_type",)
+)
+FILES_PROCESSED = REGISTRY.counter(
+    "cv_analyzer_files_processed_total",
+    "Nombre de CV adaptés",
+    ("file_type",)
+)
+PAGES_PROCESSED = REGISTRY.counter(
+    "cv_analyzer_pages_processed_total",
+    "Nombre de pages PDF traitées",
+    ("file_type",)
+)
+PARAGRAPHS_PROCESSED = REGISTRY.counter(
+    "cv_analyzer_paragraphs_processed_total",
+    "Nombre de paragraphes Word traités",
+    ("file_type",)
+)
+KEYWORDS_EXTRACTED = REGISTRY.counter(
+    "cv_analyzer_keywords_extracted_total",
+    "Nombre de mots-clés extraits des descriptions de poste"
+)
+KEYWORDS_HIGHLIGHTED = REGISTRY.counter(
+    "cv_analyzer_keywords_highlighted_total",
+    "Nombre d'occurrences de mots-clés mises en évidence",
+    ("file_type",)
+)
+FILES_DELETED = REGISTRY.counter(
+    "cv_analyzer_storage_files_deleted_total",
+    "Nombre de fichiers supprimés par le nettoyage"
+)
+REQUESTS_REJECTED = REGISTRY.counter(
+    "cv_analyzer_requests_rejected_total",
+    "Nombre de requêtes refusées par le contrôle d'admission",
+    ("reason",)
+)
+DOCUMENTS_REJECTED = REGISTRY.counter(
+    "cv_analyzer_documents_rejected_total",
+    "Nombre de documents refusés par les limites de ressources",
+    ("reason",)
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "cv_analyzer_http_request_duration_seconds",
+    "Durée des requêtes HTTP",
+    ("method", "endpoint", "status")
+)
+
+
+def stage_timer(stage, file_type="none"):
+    """
+    Chronomètre une étape du traitement.
+
+    Args:
+        stage (str): Nom de l'étape (upload_save, keyword_extraction, parse, highlight, write, cleanup)
+        file_type (str): Type de fichier traité, "none" si l'étape n'en dépend pas
+    """
+    return STAGE_DURATION.time(stage=stage, file_type=file_type)
+
+
+def clear_shared(directory):
+    """
+    Retire les valeurs publiées par les workers d'un démarrage précédent du serveur.
+
+    Args:
+        directory (str): Répertoire commun aux workers (voir MetricsRegistry.share)
+    """
+    for path in Path(directory).glob("*.json"):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def mark_process_start():
+    """
+    Fixe le démarrage du processus à l'instant présent (worker issu d'un fork).
+    """
+    global PROCESS_START_TIME
+    PROCESS_START_TIME = time.time()
+
+
+def uptime_seconds():
+    """
+    Durée écoulée depuis le démarrage du processus.
+    """
+    return time.time() - PROCESS_START_TIME
@@ -0,0 +1,172 @@
+import os
+import gzip
+import json
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+
+# Version du format des représentations : l'incrémenter invalide tout le cache
+PARSED_FORMAT_VERSION = 1
+
+
+class ParsedCVCache:
+    """
+    Cache des CV déjà analysés, indexé par l'empreinte de leur contenu.
+
+    Chaque entrée est une représentation compacte du CV produite par le moteur
+    de son format (texte normalisé, blocs XML et positions des fragments de
+    texte), compressée en JSON gzip sur disque. Un même CV adapté à plusieurs
+    offres n'est ainsi analysé qu'une fois. Le disque est borné en taille avec
+    éviction des entrées les moins récemment utilisées ; quelques entrées
+    récentes restent aussi en mémoire.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, max_memory_entries=16):
+        """
+        Initialise le cache.
+
+        Args:
+            directory (str): Répertoire des entrées sur disque
+            max_bytes (int): Taille maximale occupée sur disque en octets
+            max_memory_entries (int): Nombre maximum d'entrées conservées en mémoire
+        """
+        self.logger = logging.getLogger('parsed_cv_cache')
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.max_memory_entries = max_memory_entries
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(content_hash, file_ext):
+        """
+        Construit la clé d'un CV à partir de l'empreinte de son contenu.
+
+        Args:
+            content_hash (str): Empreinte SHA-256 du fichier
+            file_ext (str): Extension du fichier
+
+        Returns:
+            str: Clé de l'entrée
+        """
+        return f"{file_ext.lstrip('.').lower()}-{content_hash}-v{PARSED_FORMAT_VERSION}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def get(self, key):
+        """
+        Retourne la représentation d'un CV, ou None si elle n'est pas en cache.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                value = json.load(f)
+            # La date de modification sert d'horodatage d'accès pour l'éviction
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        with self._lock:
+            self._counters["disk_hits"] += 1
+            self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        """
+        Enregistre la représentation d'un CV en mémoire et sur disque.
+        """
+        path = self._path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with gzip.open(temp_path, 'wt', encoding='utf-8', compresslevel=5) as f:
+                json.dump(value, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            self.logger.warning(f"Écriture impossible dans le cache des CV analysés: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            size = 0
+
+        with self._lock:
+            self._remember(key, value)
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            over_limit = self._disk_bytes is None or self._disk_bytes > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def get_or_parse(self, key, parse):
+        """
+        Retourne la représentation en cache, ou l'obtient avec parse() et la met en cache.
+        """
+        value = self.get(key)
+        if value is None:
+            value = parse()
+            self.set(key, value)
+        return value
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """
+        Supprime les entrées les moins récemment utilisées jusqu'à respecter la taille maximale.
+
+        Le répertoire est relu pour tenir compte des entrées écrites par les autres workers.
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json.gz'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._disk_bytes = total
+            self._counters["evictions"] += evicted
+        if evicted:
+            self.logger.info(f"{evicted} CV analysés évincés du cache ({total} octets conservés)")
+
+    def stats(self):
+        """
+        Retourne les compteurs du cache.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["max_bytes"] = self.max_bytes
+        return stats
@@ -0,0 +1,448 @@
+import os
+import math
+import logging
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import PyPDF2
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+from reportlab.lib.colors import yellow
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from metrics import stage_timer, PAGES_PROCESSED
+from document_guard import MAX_PAGE_TEXT, reject
+from pdf_optimizer import PdfOptimizer, parse_passes
+
+# Opérateurs PDF affichant du texte
+TEXT_SHOWING_OPERATORS = (b"Tj", b"TJ", b"'", b'"')
+
+# Police de référence pour estimer la largeur des glyphes
+REFERENCE_FONT = 'Helvetica'
+
+# Nom de l'état graphique (transparence) ajouté aux ressources des pages surlignées
+HIGHLIGHT_STATE = NameObject('/CVAnalyzerHighlight')
+
+# Nombre de pages confiées à chaque tâche du pool, et nombre de pages à partir duquel il est utilisé
+PAGES_PER_CHUNK = int(os.environ.get('PDF_PAGES_PER_CHUNK', 4))
+PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 8))
+
+# Étapes d'optimisation du PDF produit (voir pdf_optimizer), toutes par défaut
+OPTIMIZE_PASSES = parse_passes(os.environ.get('PDF_OPTIMIZE', 'all'))
+
+# Mesure de la taille avant optimisation (une écriture supplémentaire du document)
+MEASURE_OPTIMIZATION = os.environ.get('PDF_OPTIMIZE_MEASURE', '').lower() in ('1', 'true', 'yes')
+
+logger = logging.getLogger('pdf_highlighter')
+
+# Pool de processus partagé par tous les moteurs PDF du processus, créé au premier long document
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def _multiply(m, n):
+    """
+    Produit de deux matrices de transformation PDF [a b c d e f].
+    """
+    return [
+        m[0] * n[0] + m[1] * n[2],
+        m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2],
+        m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4],
+        m[4] * n[1] + m[5] * n[3] + n[5]
+    ]
+
+
+def _text_width(text, size):
+    """
+    Estime la largeur d'un texte dans la police de référence.
+    """
+    try:
+        return stringWidth(text, REFERENCE_FONT, size)
+    except Exception:
+        return len(text) * size * 0.5
+
+
+def page_workers():
+    """
+    Nombre de processus traitant les pages d'un même PDF (PDF_PAGE_WORKERS, 1 désactive le pool).
+
+    Lu à chaque document : les processus de l'adaptation par lots le ramènent à 1 avant
+    leur premier PDF. Dans un processus isolé, les processus du pool héritent de son
+    budget mémoire (RLIMIT_AS).
+    """
+    return int(os.environ.get('PDF_PAGE_WORKERS', 0)) or min(4, os.cpu_count() or 1)
+
+
+def _get_page_pool():
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            workers = page_workers()
+            _page_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            logger.info(f"Pool de {workers} processus créé pour les pages PDF")
+        return _page_pool
+
+
+def _discard_page_pool(pool):
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is pool:
+            _page_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _process_page_range(highlighter, source, start, stop, match):
+    """
+    Traite une plage de pages dans un processus du pool (voir PdfHighlighter._process_page).
+    """
+    reader = PyPDF2.PdfReader(BytesIO(source) if isinstance(source, bytes) else source)
+    return [highlighter._process_page(reader.pages[number], match) for number in range(start, stop)]
+
+
+class PdfHighlighter:
+    """
+    Moteur de mise en évidence des mots-clés dans les PDF.
+
+    Les positions réelles du texte sont collectées une seule fois par page pendant
+    l'extraction (visiteur PyPDF2), tous les mots-clés sont recherchés en une passe,
+    puis les rectangles de surlignage sont ajoutés en fin de contenu des seules pages
+    contenant des correspondances, sans réécrire leur contenu d'origine.
+
+    À partir de parallel_min_pages pages, les pages sont réparties par plages de
+    pages_per_chunk sur un pool de processus, qui extrait leur texte, recherche les
+    mots-clés et prépare le surlignage ; les pages sont ensuite réassemblées dans
+    l'ordre. Les documents plus courts sont traités dans le processus courant.
+    """
+
+    def __init__(self, matcher, color=yellow, opacity=0.3, max_page_text=MAX_PAGE_TEXT,
+                 pages_per_chunk=PAGES_PER_CHUNK, parallel_min_pages=PARALLEL_MIN_PAGES, optimize=OPTIMIZE_PASSES,
+                 measure_optimization=MEASURE_OPTIMIZATION):
+        """
+        Initialise le moteur de mise en évidence.
+
+        Args:
+            matcher (KeywordMatcher): Moteur de correspondance des mots-clés
+            color: Couleur de surlignage reportlab
+            opacity (float): Opacité du surlignage
+            max_page_text (int): Nombre maximum de caractères extraits d'une page
+            pages_per_chunk (int): Nombre de pages traitées par tâche du pool de processus
+            parallel_min_pages (int): Nombre de pages à partir duquel le pool est utilisé (0 le désactive)
+            optimize (tuple): Étapes d'optimisation du PDF produit avant son écriture (vide pour aucune)
+            measure_optimization (bool): Mesure exactement la taille du PDF avant optimisation (estimée sinon)
+        """
+        self.matcher = matcher
+        self.color = color
+        self.opacity = opacity
+        self.max_page_text = max_page_text
+        self.pages_per_chunk = max(1, pages_per_chunk)
+        self.parallel_min_pages = parallel_min_pages
+        self.optimize = tuple(optimize or ())
+        self.measure_optimization = measure_optimization
+
+    def extract_layout(self, page):
+        """
+        Extrait le texte d'une page avec la position de chaque fragment.
+
+        Args:
+            page (PageObject): Page PDF
+
+        Returns:
+            dict: Texte de la page et fragments (début, fin, x, y, taille de police)
+
+        Raises:
+            DocumentRejectedError: Si le texte de la page dépasse max_page_text caractères
+        """
+        parts = []
+        fragments = []
+        state = {"offset": 0, "origin": None}
+
+        def before_operator(operator, operands, cm, tm):
+            # Position du premier glyphe affiché depuis le dernier fragment
+            if operator in TEXT_SHOWING_OPERATORS and state["origin"] is None:
+                state["origin"] = (list(tm), list(cm))
+
+        def visit_text(text, cm, tm, font_dict, font_size):
+            if not text:
+                return
+            origin_tm, origin_cm = state["origin"] or (tm, cm)
+            state["origin"] = None
+            matrix = _multiply(origin_tm, origin_cm)
+            scale = math.sqrt(abs(matrix[0] * matrix[3]) + abs(matrix[1] * matrix[2])) or 1.0
+            start = state["offset"]
+            parts.append(text)
+            state["offset"] += len(text)
+            if self.max_page_text and state["offset"] > self.max_page_text:
+                raise reject("page_text", f"Le texte d'une page dépasse {self.max_page_text} caractères")
+            fragments.append((start, state["offset"], matrix[4], matrix[5], (font_size or 0) * scale))
+
+        page.extract_text(visitor_operand_before=before_operator, visitor_text=visit_text)
+        return {"text": "".join(parts), "fragments": fragments}
+
+    def find_boxes(self, layout):
+        """
+        Calcule les rectangles de surlignage des mots-clés d'une page.
+
+        Args:
+            layout (dict): Texte et fragments retournés par extract_layout
+
+        Returns:
+            tuple: (nombre d'occurrences, liste de rectangles (x, y, largeur, hauteur))
+        """
+        text = layout["text"]
+        matches = self.matcher.find_all(text)
+        if not matches:
+            return 0, []
+
+        fragments = layout["fragments"]
+        boxes = []
+        index = 0
+        for start, end in matches:
+            # Les correspondances sont triées : le parcours des fragments est linéaire
+            while index < len(fragments) and fragments[index][1] <= start:
+                index += 1
+            position = index
+            while position < len(fragments) and fragments[position][0] < end:
+                frag_start, frag_end, x, y, size = fragments[position]
+                if size > 0:
+                    left = max(start, frag_start)
+                    right = min(end, frag_end)
+                    prefix = text[frag_start:left]
+                    segment = text[left:right].rstrip("\n")
+                    if segment.strip():
+                        boxes.append((
+                            x + _text_width(prefix, size),
+                            y - size * 0.25,
+                            _text_width(segment, size),
+                            size * 1.15
+                        ))
+                position += 1
+        return len(matches), boxes
+
+    def overlay_content(self, boxes):
+        """
+        Produit le flux de contenu PDF dessinant les rectangles de surlignage d'une page.
+
+        Args:
+            boxes (list): Rectangles (x, y, largeur, hauteur) en coordonnées de la page
+
+        Returns:
+            bytes: Opérateurs PDF remplissant les rectangles en transparence
+        """
+        lines = [f"q {HIGHLIGHT_STATE} gs {self.color.red:.3f} {self.color.green:.3f} {self.color.blue:.3f} rg"]
+        lines.extend(f"{x:.2f} {y:.2f} {width:.2f} {height:.2f} re" for x, y, width, height in boxes)
+        lines.append("f Q")
+        return "\n".join(lines).encode("ascii")
+
+    def _append_overlay(self, writer, page, overlay):
+        """
+        Ajoute le surlignage à la fin du contenu d'une page du document produit.
+
+        Le contenu d'origine est encadré par q/Q puis suivi d'un flux de surlignage :
+        contrairement à une fusion de pages, le contenu existant n'est ni décodé ni réécrit.
+        """
+        def stream(data):
+            content = DecodedStreamObject()
+            content.set_data(data)
+            return writer._add_object(content)
+
+        contents = page.raw_get("/Contents") if "/Contents" in page else None
+        existing = contents.get_object() if contents is not None else None
+        if isinstance(existing, ArrayObject):
+            references = list(existing)
+        else:
+            references = [contents] if contents is not None else []
+        page[NameObject("/Contents")] = ArrayObject(
+            [stream(b"q\n")] + references + [stream(b"\nQ\n" + overlay)]
+        )
+
+        resources = page.get("/Resources")
+        if resources is None:
+            resources = page[NameObject("/Resources")] = DictionaryObject()
+        resources = resources.get_object()
+        states = resources.get("/ExtGState")
+        if states is None:
+            states = resources[NameObject("/ExtGState")] = DictionaryObject()
+        states.get_object()[HIGHLIGHT_STATE] = DictionaryObject({
+            NameObject("/Type"): NameObject("/ExtGState"),
+            NameObject("/ca"): FloatObject(self.opacity),
+            NameObject("/CA"): FloatObject(self.opacity)
+        })
+
+    def parse(self, source):
+        """
+        Analyse un PDF une fois pour toutes, indépendamment des mots-clés recherchés.
+
+        La représentation retournée (texte et position des fragments de chaque page)
+        est sérialisable en JSON et peut être mise en cache
+        pour adapter le même CV à plusieurs offres.
+
+        Args:
+            source (str ou fichier): Chemin ou flux du PDF
+
+        Returns:
+            dict: Représentation compacte du PDF
+        """
+        with stage_timer("parse", "pdf"):
+            return self._parse_reader(source, PyPDF2.PdfReader(source))
+
+    def _process_page(self, page, match):
+        """
+        Extrait le texte positionné d'une page et, si match, prépare son surlignage.
+
+        Returns:
+            tuple: (texte et fragments de la page, nombre d'occurrences, flux de surlignage ou None)
+        """
+        layout = self.extract_layout(page)
+        layout = {
+            "text": layout["text"],
+            "fragments": [
+                (start, end, round(x, 2), round(y, 2), round(size, 2))
+                for start, end, x, y, size in layout["fragments"]
+            ]
+        }
+        if not match:
+            return layout, 0, None
+        return (layout,) + self._match_page(layout)
+
+    def _match_page(self, layout):
+        """
+        Recherche les mots-clés d'une page analysée.
+
+        Returns:
+            tuple: (nombre d'occurrences, flux de surlignage ou None)
+        """
+        count, boxes = self.find_boxes(layout)
+        return count, self.overlay_content(boxes) if boxes else None
+
+    def _process_pages(self, source, reader, match):
+        """
+        Extrait le texte de toutes les pages d'un PDF, réparties sur le pool de processus pour les longs documents.
+
+        Returns:
+            tuple: (texte et fragments de chaque page, dans l'ordre des pages ; résultats de
+            _match_page si match et si les pages ont été traitées par le pool, None sinon)
+        """
+        total = len(reader.pages)
+        if self.parallel_min_pages and total >= self.parallel_min_pages and page_workers() > 1:
+            pool = _get_page_pool()
+            data = self._pool_source(source)
+            try:
+                futures = [
+                    pool.submit(_process_page_range, self, data, start, min(start + self.pages_per_chunk, total), match)
+                    for start in range(0, total, self.pages_per_chunk)
+                ]
+                results = [result for future in futures for result in future.result()]
+                layouts = [layout for layout, _, _ in results]
+                return layouts, [(count, overlay) for _, count, overlay in results] if match else None
+            except BrokenProcessPool:
+                # Processus perdu : le document est repris dans le processus courant
+                logger.warning("Pool de pages PDF interrompu, traitement dans le processus courant")
+                _discard_page_pool(pool)
+        # Dans le processus courant, la recherche des mots-clés reste dans l'étape de mise en évidence
+        return [self._process_page(page, False)[0] for page in reader.pages], None
+
+    @staticmethod
+    def _pool_source(source):
+        """
+        Source transmissible aux processus du pool : chemin du fichier ou contenu du flux.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            return os.fspath(source)
+        if isinstance(source, BytesIO):
+            return source.getvalue()
+        position = source.tell()
+        source.seek(0)
+        try:
+            return source.read()
+        finally:
+            source.seek(position)
+
+    def _parse_reader(self, source, reader):
+        return {"pages": self._process_pages(source, reader, False)[0]}
+
+    @staticmethod
+    def parsed_text(parsed):
+        """
+        Texte d'un PDF à partir de sa représentation analysée.
+
+        Args:
+            parsed (dict): Représentation retournée par parse
+
+        Returns:
+            str: Texte des pages, séparées par un saut de ligne
+        """
+        return "\n".join(page["text"] for page in parsed["pages"])
+
+    def render(self, source, parsed, output):
+        """
+        Produit le PDF mis en évidence à partir d'une représentation déjà analysée.
+
+        Seuls la recherche des mots-clés et l'ajout du surlignage sont calculés :
+        le texte des pages n'est pas extrait à nouveau.
+
+        Args:
+            source (str ou fichier): Chemin ou flux du PDF d'origine
+            parsed (dict): Représentation retournée par parse
+            output (fichier): Flux binaire recevant le PDF produit
+
+        Returns:
+            dict: Nombre d'occurrences mises en évidence et de pages modifiées
+        """
+        return self._render_reader(PyPDF2.PdfReader(source), parsed, output)
+
+    def _render_reader(self, reader, parsed, output, matches=None):
+        pages = parsed["pages"]
+        PAGES_PROCESSED.inc(len(pages), file_type="pdf")
+
+        writer = PyPDF2.PdfWriter()
+        stats = {"highlighted_keywords": 0, "pages_modified": 0}
+
+        with stage_timer("highlight", "pdf"):
+            if matches is None:
+                matches = [self._match_page(layout) for layout in pages]
+            for page, (count, overlay) in zip(reader.pages, matches):
+                if count:
+                    stats["highlighted_keywords"] += count
+                    stats["pages_modified"] += 1
+                added = writer.add_page(page)
+                if overlay:
+                    self._append_overlay(writer, added, overlay)
+
+        optimizer, size_before = None, None
+        if self.optimize:
+            optimizer = PdfOptimizer(self.optimize, measure=self.measure_optimization)
+            with stage_timer("optimize", "pdf"):
+                optimization = optimizer.optimize(writer)
+            size_before = optimization.pop("size_before_bytes", None)
+            stats["optimization"] = optimization
+
+        with stage_timer("write", "pdf"):
+            start = output.tell()
+            writer.write(output)
+            stats["size_after_bytes"] = output.tell() - start
+        if size_before is None:
+            # Sans mesure, la taille d'origine est la taille écrite plus les octets retirés par l'optimisation
+            size_before = stats["size_after_bytes"] + (optimizer.bytes_saved if optimizer else 0)
+        stats["size_before_bytes"] = size_before
+        return stats
+
+    def highlight(self, source, output):
+        """
+        Met en évidence les mots-clés d'un PDF.
+
+        Toutes les pages sont conservées, y compris celles sans texte extractible.
+
+        Args:
+            source (str ou fichier): Chemin ou flux du PDF d'origine
+            output (fichier): Flux binaire recevant le PDF produit
+
+        Returns:
+            dict: Nombre d'occurrences mises en évidence et de pages modifiées
+        """
+        with stage_timer("parse", "pdf"):
+            reader = PyPDF2.PdfReader(source)
+            # Avec le pool, chaque processus recherche aussi les mots-clés des pages qu'il a extraites
+            layouts, matches = self._process_pages(source, reader, True)
+        return self._render_reader(reader, {"pages": layouts}, output, matches)
@@ -0,0 +1,414 @@
+import re
+import zlib
+import hashlib
+import logging
+from io import BytesIO
+from PyPDF2.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, EncodedStreamObject, IndirectObject, NameObject, NullObject,
+    StreamObject
+)
+
+# Étapes d'optimisation disponibles, dans leur ordre d'exécution
+OPTIMIZATION_PASSES = ("prune", "dedupe", "compress")
+
+# Catégories de ressources retirées lorsqu'aucun flux de contenu ne les nomme
+PRUNABLE_RESOURCES = ("/Font", "/XObject", "/ExtGState", "/Pattern", "/Shading")
+
+# Objets jamais fusionnés : chaque page ou annotation doit rester un objet distinct
+_UNIQUE_TYPES = ("/Page", "/Pages", "/Catalog", "/Annot")
+
+# Taille en deçà de laquelle un flux n'est pas compressé
+MIN_COMPRESS_BYTES = 64
+
+_NAME_PATTERN = re.compile(rb"/([^\s/\[\]<>(){}%]+)")
+_NAME_ESCAPE = re.compile(rb"#([0-9A-Fa-f]{2})")
+
+logger = logging.getLogger('pdf_optimizer')
+
+
+def _deflate(data):
+    """
+    Compresse un flux (FlateDecode) avec une fenêtre et une table de hachage réduites.
+
+    Les réglages par défaut de zlib réservent près de 300 Ko par flux ; les
+    opérateurs d'un flux de contenu se répètent à courte distance, et une
+    fenêtre de 4 Ko au plus ne coûte qu'environ 1 % de compression.
+    """
+    wbits = min(12, max(9, (len(data) - 1).bit_length()))
+    compressor = zlib.compressobj(6, zlib.DEFLATED, wbits, wbits - 8)
+    return compressor.compress(data) + compressor.flush()
+
+
+class _ByteCounter:
+    """
+    Flux de sortie qui ne conserve rien et compte les octets écrits.
+    """
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+
+def parse_passes(value):
+    """
+    Lit la liste des étapes d'optimisation d'une variable de configuration.
+
+    Args:
+        value (str): Étapes séparées par des virgules, "all" pour toutes, "" ou "0" pour aucune
+
+    Returns:
+        tuple: Étapes retenues, dans leur ordre d'exécution
+    """
+    value = (value or "").strip().lower()
+    if value in ("all", "1", "true", "yes"):
+        return OPTIMIZATION_PASSES
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    return tuple(name for name in OPTIMIZATION_PASSES if name in requested)
+
+
+class PdfOptimizer:
+    """
+    Réduction de la taille d'un PDF produit, juste avant son écriture.
+
+    Tous les objets repris du document d'origine sont d'abord rattachés au
+    PdfWriter. Les ressources qu'aucun flux de contenu ne nomme sont ensuite
+    retirées, les objets identiques fusionnés (jusqu'à stabilité, pour que
+    des polices identiques rattachées à des fichiers de police identiques le
+    deviennent aussi) et les flux non compressés compressés. Les objets
+    devenus inaccessibles sont vidés.
+
+    Les octets retirés par chaque étape (objets vidés ou fusionnés, flux
+    compressés) sont comptés au passage dans bytes_saved : la taille avant
+    optimisation s'en déduit sans écrire le document une seconde fois.
+    """
+
+    def __init__(self, passes=OPTIMIZATION_PASSES, measure=False):
+        """
+        Initialise l'optimiseur.
+
+        Args:
+            passes (iterable): Étapes à exécuter parmi OPTIMIZATION_PASSES
+            measure (bool): Mesure la taille du document avant optimisation, au prix d'une écriture complète
+        """
+        self.passes = tuple(name for name in OPTIMIZATION_PASSES if name in set(passes))
+        self.measure = measure
+        self.bytes_saved = 0
+
+    def optimize(self, writer):
+        """
+        Optimise les objets d'un PdfWriter avant son écriture.
+
+        Args:
+            writer (PdfWriter): Document produit, pas encore écrit
+
+        Returns:
+            dict: Nombre d'objets retirés, fusionnés ou compressés, et taille avant
+                optimisation (size_before_bytes) si elle est mesurée ; sinon, la taille
+                écrite plus bytes_saved l'estime à quelques octets près
+        """
+        self.bytes_saved = 0
+        stats = {"resources_removed": 0, "objects_merged": 0, "streams_compressed": 0, "objects_dropped": 0}
+        if self.measure:
+            # L'écriture rattache aussi au document produit les objets du document d'origine
+            counter = _ByteCounter()
+            writer.write_stream(counter)
+            stats["size_before_bytes"] = counter.size
+        else:
+            # Rattachement seul, comme au début de PdfWriter.write_stream
+            if not writer._root:
+                writer._root = writer._add_object(writer._root_object)
+            writer._sweep_indirect_references(writer._root)
+
+        if "prune" in self.passes:
+            stats["resources_removed"] = self._prune_resources(writer)
+        if "dedupe" in self.passes:
+            stats["objects_merged"] = self._merge_duplicates(writer)
+        if "compress" in self.passes:
+            stats["streams_compressed"] = self._compress_streams(writer)
+        if stats["resources_removed"]:
+            # Polices et images retirées des ressources : leurs objets ne sont plus écrits
+            stats["objects_dropped"] = self._drop_unreachable(writer)
+        return stats
+
+    def _prune_resources(self, writer):
+        """
+        Retire des dictionnaires de ressources les entrées qu'aucun flux de contenu ne nomme.
+
+        Un dictionnaire de ressources peut servir à plusieurs flux : contenus des
+        pages, formulaires (Form XObject) qu'elles dessinent, motifs de remplissage,
+        glyphes des polices Type 3 et apparences des annotations. Les noms cités
+        par tous ces flux sont réunis avant toute suppression ; un flux sans
+        ressources propres est rattaché à celles qui le dessinent. Un dictionnaire
+        est conservé intact si l'un de ces flux est illisible, ou s'il sert aussi
+        aux ressources par défaut des champs de formulaire (/AcroForm /DR).
+        """
+        used = {}
+        pending = []
+        for page in writer.pages:
+            resources = self._page_resources(page)
+            pending.append((self._page_streams(page), resources))
+            for annotation in page.get("/Annots") or []:
+                appearances = annotation.get_object().get("/AP")
+                for appearance in (appearances.get_object().values() if appearances is not None else []):
+                    appearance = appearance.get_object()
+                    # Apparence unique ou une par état (dictionnaire de flux)
+                    streams = [appearance] if isinstance(appearance, StreamObject) else \
+                        [state.get_object() for state in appearance.values()]
+                    pending.extend(([stream], self._own_resources(stream, resources))
+                                   for stream in streams if isinstance(stream, StreamObject))
+
+        visited = set()
+        while pending:
+            streams, resources = pending.pop()
+            key = (tuple(id(stream) for stream in streams), id(resources))
+            if resources is None or key in visited:
+                continue
+            visited.add(key)
+            names = self._content_names(streams)
+            for entries in self._prunable_entries(resources):
+                known = used.setdefault(id(entries), (entries, set()))
+                if names is None:
+                    known[1].add(None)
+                else:
+                    known[1].update(names)
+            pending.extend(self._nested_streams(resources))
+
+        acroform = writer._root_object.get("/AcroForm")
+        defaults = acroform.get_object().get("/DR") if acroform is not None else None
+        if defaults is not None:
+            for entries in self._prunable_entries(defaults.get_object()):
+                used.setdefault(id(entries), (entries, set()))[1].add(None)
+
+        removed = 0
+        for entries, names in used.values():
+            if None in names:
+                continue
+            for key in [key for key in entries if key not in names]:
+                del entries[key]
+                removed += 1
+        return removed
+
+    @staticmethod
+    def _prunable_entries(resources):
+        """
+        Dictionnaires des catégories PRUNABLE_RESOURCES d'un dictionnaire de ressources.
+        """
+        for category in PRUNABLE_RESOURCES:
+            entries = resources.get(category)
+            if entries is not None:
+                yield entries.get_object()
+
+    @staticmethod
+    def _page_resources(page):
+        """
+        Ressources d'une page, éventuellement héritées d'un nœud de l'arbre des pages.
+        """
+        node = page
+        while node is not None:
+            resources = node.get("/Resources")
+            if resources is not None:
+                return resources.get_object()
+            parent = node.get("/Parent")
+            node = parent.get_object() if parent is not None else None
+        return None
+
+    @staticmethod
+    def _own_resources(stream, inherited):
+        """
+        Ressources propres d'un flux, à défaut celles dont il hérite.
+        """
+        resources = stream.get("/Resources")
+        return resources.get_object() if resources is not None else inherited
+
+    @staticmethod
+    def _page_streams(page):
+        """
+        Flux de contenu d'une page.
+        """
+        contents = page.get("/Contents")
+        if contents is None:
+            return []
+        contents = contents.get_object()
+        return [stream.get_object() for stream in (contents if isinstance(contents, ArrayObject) else [contents])]
+
+    def _nested_streams(self, resources):
+        """
+        Flux de contenu dessinés avec un dictionnaire de ressources : formulaires, motifs de
+        remplissage (PatternType 1) et glyphes des polices Type 3.
+
+        Returns:
+            list: Tuples (liste d'un flux, ressources qu'il utilise)
+        """
+        nested = []
+        for category, selector in (("/XObject", lambda obj: obj.get("/Subtype") == "/Form"),
+                                   ("/Pattern", lambda obj: obj.get("/PatternType") == 1)):
+            entries = resources.get(category)
+            for value in (entries.get_object().values() if entries is not None else []):
+                value = value.get_object()
+                if isinstance(value, StreamObject) and selector(value):
+                    nested.append(([value], self._own_resources(value, resources)))
+        fonts = resources.get("/Font")
+        for font in (fonts.get_object().values() if fonts is not None else []):
+            font = font.get_object()
+            if not isinstance(font, DictionaryObject) or font.get("/Subtype") != "/Type3":
+                continue
+            glyphs = font.get("/CharProcs")
+            # Les glyphes utilisent les ressources de la police, à défaut celles qui dessinent le texte
+            font_resources = self._own_resources(font, resources)
+            for glyph in (glyphs.get_object().values() if glyphs is not None else []):
+                nested.append(([glyph.get_object()], font_resources))
+        return nested
+
+    @staticmethod
+    def _content_names(streams):
+        """
+        Noms cités par des flux de contenu, ou None s'ils ne peuvent être décodés.
+        """
+        names = set()
+        try:
+            for stream in streams:
+                data = stream.get_data()
+                for name in _NAME_PATTERN.findall(data):
+                    names.add("/" + name.decode("latin-1"))
+                    if b"#" in name:
+                        unescaped = _NAME_ESCAPE.sub(lambda match: bytes([int(match.group(1), 16)]), name)
+                        names.add("/" + unescaped.decode("latin-1"))
+        except Exception as e:
+            logger.debug(f"Flux de contenu illisible, ressources conservées: {str(e)}")
+            return None
+        return names
+
+    def _merge_duplicates(self, writer):
+        """
+        Fusionne les objets indirects identiques, jusqu'à ce qu'aucune nouvelle fusion n'apparaisse.
+
+        Returns:
+            int: Nombre d'objets remplacés par une référence à leur double
+        """
+        # Les objets désignés par la fin de fichier (trailer) gardent leur numéro
+        protected = {reference.idnum for reference in (writer._root, writer._info, getattr(writer, "_encrypt", None))
+                     if reference is not None}
+        merged = 0
+        while True:
+            canonical = {}
+            replacements = {}
+            for index, obj in enumerate(writer._objects):
+                if obj is None or isinstance(obj, NullObject) or index + 1 in protected:
+                    continue
+                if isinstance(obj, DictionaryObject) and obj.get("/Type") in _UNIQUE_TYPES:
+                    continue
+                digest = self._digest(obj)
+                if digest in canonical:
+                    replacements[index + 1] = canonical[digest]
+                else:
+                    canonical[digest] = index + 1
+            if not replacements:
+                return merged
+
+            for obj in writer._objects:
+                if isinstance(obj, (DictionaryObject, ArrayObject)):
+                    self._redirect(obj, replacements, writer)
+            for idnum in replacements:
+                self._discard(writer, idnum - 1)
+            merged += len(replacements)
+
+    def _discard(self, writer, index):
+        """
+        Vide un objet du document et compte les octets qu'il aurait occupés.
+        """
+        counter = _ByteCounter()
+        writer._objects[index].write_to_stream(counter, None)
+        self.bytes_saved += counter.size - len(b"null")
+        writer._objects[index] = NullObject()
+
+    @staticmethod
+    def _digest(obj):
+        """
+        Empreinte de la forme écrite d'un objet (références comprises).
+        """
+        buffer = BytesIO()
+        obj.write_to_stream(buffer, None)
+        return obj.__class__.__name__, hashlib.sha256(buffer.getvalue()).digest()
+
+    @staticmethod
+    def _redirect(obj, replacements, writer):
+        """
+        Remplace dans un objet les références aux doubles par la référence à l'objet conservé.
+        """
+        stack = [obj]
+        while stack:
+            current = stack.pop()
+            items = current.items() if isinstance(current, DictionaryObject) else enumerate(current)
+            for key, value in list(items):
+                if isinstance(value, IndirectObject):
+                    if value.idnum in replacements:
+                        current[key] = IndirectObject(replacements[value.idnum], 0, writer)
+                elif isinstance(value, (DictionaryObject, ArrayObject)):
+                    stack.append(value)
+
+    def _compress_streams(self, writer):
+        """
+        Compresse (FlateDecode) les flux écrits sans filtre, lorsque c'est plus court.
+
+        Returns:
+            int: Nombre de flux compressés
+        """
+        compressed = 0
+        for index, obj in enumerate(writer._objects):
+            if not isinstance(obj, DecodedStreamObject) or "/Filter" in obj:
+                continue
+            # Les métadonnées XMP restent lisibles sans décompression
+            if obj.get("/Type") == "/Metadata" or len(obj._data) < MIN_COMPRESS_BYTES:
+                continue
+            data = _deflate(obj._data)
+            if len(data) >= len(obj._data):
+                continue
+            stream = EncodedStreamObject()
+            stream.update({key: value for key, value in obj.items() if key != "/Length"})
+            stream[NameObject("/Filter")] = NameObject("/FlateDecode")
+            stream._data = data
+            self.bytes_saved += len(obj._data) - len(data) - len(b"/Filter /FlateDecode")
+            writer._objects[index] = stream
+            compressed += 1
+        return compressed
+
+    def _drop_unreachable(self, writer):
+        """
+        Vide les objets qu'aucune référence issue du catalogue ou des métadonnées n'atteint.
+
+        Les numéros d'objet sont conservés : la table des références croisées reste alignée.
+
+        Returns:
+            int: Nombre d'objets vidés
+        """
+        roots = [writer._root, writer._info] + ([writer._encrypt] if hasattr(writer, "_encrypt") else [])
+        reachable = set()
+        stack = [root.idnum for root in roots if root is not None]
+        while stack:
+            idnum = stack.pop()
+            if idnum in reachable:
+                continue
+            reachable.add(idnum)
+            nested = [writer._objects[idnum - 1]]
+            while nested:
+                current = nested.pop()
+                if isinstance(current, IndirectObject):
+                    if current.idnum not in reachable:
+                        stack.append(current.idnum)
+                elif isinstance(current, DictionaryObject):
+                    nested.extend(current.values())
+                elif isinstance(current, ArrayObject):
+                    nested.extend(current)
+
+        dropped = 0
+        for index, obj in enumerate(writer._objects):
+            if index + 1 not in reachable and obj is not None and not isinstance(obj, NullObject):
+                self._discard(writer, index)
+                dropped += 1
+        return dropped
@@ -0,0 +1,234 @@
+import json
+import time
+import sqlite3
+import secrets
+import logging
+import threading
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import Signer, BadSignature
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """
+    Session dont les données sont conservées côté serveur ; le cookie ne porte que l'identifiant signé.
+    """
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class MemorySessionStore:
+    """
+    Stockage des sessions en mémoire, propre au processus (tests et développement).
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        """
+        Charge les données d'une session non expirée.
+
+        Args:
+            sid (str): Identifiant de session
+
+        Returns:
+            dict: Données de la session, ou None si absente ou expirée
+        """
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._sessions[sid]
+                return None
+            return json.loads(payload)
+
+    def save(self, sid, data, ttl_seconds):
+        """
+        Enregistre les données d'une session.
+
+        Args:
+            sid (str): Identifiant de session
+            data (dict): Données sérialisables en JSON
+            ttl_seconds (float): Durée de vie de la session
+        """
+        with self._lock:
+            self._sessions[sid] = (time.time() + ttl_seconds, json.dumps(data))
+
+    def delete(self, sid):
+        """
+        Supprime une session.
+        """
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def purge_expired(self):
+        """
+        Supprime les sessions expirées.
+
+        Returns:
+            int: Nombre de sessions supprimées
+        """
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (expires_at, _) in self._sessions.items() if expires_at <= now]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+
+class SqliteSessionStore:
+    """
+    Stockage des sessions dans une base SQLite dédiée, partagée entre les workers.
+    """
+
+    def __init__(self, db_path, purge_every=100):
+        """
+        Initialise le stockage.
+
+        Args:
+            db_path (str): Chemin de la base SQLite des sessions
+            purge_every (int): Nombre d'écritures entre deux purges des sessions expirées
+        """
+        self.logger = logging.getLogger('session_store')
+        self.db_path = str(db_path)
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions ("
+                    "sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)")
+        finally:
+            conn.close()
+
+    def load(self, sid):
+        """
+        Charge les données d'une session non expirée.
+        """
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, sid, data, ttl_seconds):
+        """
+        Enregistre les données d'une session.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+                (sid, json.dumps(data), time.time() + ttl_seconds)
+            )
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge_expired()
+
+    def delete(self, sid):
+        """
+        Supprime une session.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def purge_expired(self):
+        """
+        Supprime les sessions expirées.
+        """
+        conn = self._connection()
+        with conn:
+            deleted = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+        if deleted:
+            self.logger.debug(f"{deleted} sessions expirées supprimées")
+        return deleted
+
+    def _connection(self):
+        """
+        Retourne la connexion SQLite du thread courant.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Interface de session Flask adossée à un stockage interchangeable (mémoire ou SQLite).
+    """
+
+    def __init__(self, store, salt='cv-analyzer-session'):
+        """
+        Initialise l'interface de session.
+
+        Args:
+            store: Stockage des sessions (MemorySessionStore ou SqliteSessionStore)
+            salt (str): Sel de signature de l'identifiant de session
+        """
+        self.store = store
+        self.salt = salt
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('utf-8')
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.store.load(sid)
+                if data is not None:
+                    return ServerSideSession(data, sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        ttl_seconds = app.permanent_session_lifetime.total_seconds()
+        self.store.save(session.sid, dict(session), ttl_seconds)
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid.encode('utf-8')).decode('utf-8'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
@@ -1,6 +1,18 @@
 import os
+import json
+import time
+import hashlib
+import sqlite3
 import logging
+import threading
 from pathlib import Path
+from collections import OrderedDict
+from metrics import stage_timer, FILES_DELETED
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 class StorageManager:
     """
@@ -9,10 +21,13 @@ class StorageManager:
     compatible avec le déploiement sur Railway.app et Render.com.
     """
     
-    def __init__(self):
+    def __init__(self, base_path=None):
         """
         Initialise le gestionnaire de stockage avec les chemins appropriés
         selon l'environnement (local, Railway.app ou Render.com).
+        
+        Args:
+            base_path (str): Chemin de base explicite (prioritaire sur la détection de l'environnement)
         """
         # Configuration du logging
         self.logger = logging.getLogger('storage_manager')
@@ -22,7 +37,10 @@ class StorageManager:
         self.is_render = 'RENDER' in os.environ
         
         # Chemin de base pour le stockage
-        if self.is_railway:
+        if base_path is not None:
+            self.base_path = Path(base_path)
+            self.logger.info(f"Chemin de stockage explicite: {self.base_path}")
+        elif self.is_railway:
             # Sur Railway.app, utiliser le stockage persistant
             self.base_path = Path(os.environ.get('RAILWAY_STORAGE_PATH', '/data/storage'))
             self.logger.info(f"Environnement Railway.app détecté, utilisation du stockage persistant: {self.base_path}")
@@ -38,9 +56,55 @@ class StorageManager:
         # Définir les sous-répertoires
         self.upload_path = self.base_path / 'uploads'
         self.download_path = self.base_path / 'downloads'
+        self.state_path = self.base_path / 'var'
         
         # Créer les répertoires s'ils n'existent pas
         self._ensure_directories()
+        
+        # Index des artefacts (CV adaptés) adressés par leur contenu
+        self.index_path = self.state_path / 'storage.sqlite'
+        self._local = threading.local()
+        self._init_index()
+        
+        # Empreintes des fichiers servis, indexées par (chemin, date de modification, taille)
+        self.max_etags = 1024
+        self._etags = OrderedDict()
+        self._etags_lock = threading.Lock()
+        
+        # Fonctions appelées avec les chemins des fichiers supprimés par le nettoyage
+        self._deletion_listeners = []
+        # Fonctions appelées avec le chemin de chaque fichier téléchargé persisté
+        self._store_listeners = []
+    
+    def add_store_listener(self, listener):
+        """
+        Enregistre une fonction appelée à chaque fichier téléchargé persisté par save_upload.
+        
+        Args:
+            listener (callable): Fonction recevant le chemin (Path) et le tampon du fichier
+        """
+        self._store_listeners.append(listener)
+    
+    def add_deletion_listener(self, listener):
+        """
+        Enregistre une fonction appelée avec la liste des fichiers supprimés lors d'un nettoyage.
+        
+        Args:
+            listener (callable): Fonction recevant une liste de chemins (Path)
+        """
+        self._deletion_listeners.append(listener)
+    
+    def _notify_deleted(self, paths):
+        """
+        Informe les fonctions enregistrées de la suppression de fichiers.
+        """
+        if not paths:
+            return
+        for listener in self._deletion_listeners:
+            try:
+                listener(paths)
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la notification des fichiers supprimés: {str(e)}")
     
     def _ensure_directories(self):
         """
@@ -49,7 +113,216 @@ class StorageManager:
         self.logger.info("Vérification des répertoires de stockage")
         os.makedirs(self.upload_path, exist_ok=True)
         os.makedirs(self.download_path, exist_ok=True)
-        self.logger.info(f"Répertoires créés/vérifiés: {self.upload_path}, {self.download_path}")
+        os.makedirs(self.state_path, exist_ok=True)
+        self.logger.info(f"Répertoires créés/vérifiés: {self.upload_path}, {self.download_path}, {self.state_path}")
+    
+    def _init_index(self):
+        """
+        Crée les tables de l'index de stockage si nécessaire.
+        """
+        conn = sqlite3.connect(str(self.index_path), timeout=10)
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS artifacts ("
+                    "key TEXT PRIMARY KEY, filename TEXT NOT NULL, result TEXT NOT NULL, "
+                    "created_at REAL NOT NULL, "
+                    "last_access REAL NOT NULL, expires_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_expires ON artifacts(expires_at)")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS file_expiry ("
+                    "path TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_file_expiry_expires ON file_expiry(expires_at)")
+        finally:
+            conn.close()
+    
+    def _index_connection(self):
+        """
+        Retourne la connexion SQLite à l'index pour le thread courant.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.index_path), timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+    
+    def acquire_artifact(self, key, ttl_hours=24):
+        """
+        Recherche un artefact existant et prolonge sa durée de vie.
+        
+        Chaque réutilisation repousse l'expiration de l'artefact : il n'est
+        supprimé que ttl_hours après sa dernière réutilisation.
+        
+        Args:
+            key (str): Clé de contenu de l'artefact
+            ttl_hours (int): Durée de vie accordée à partir de cette réutilisation
+            
+        Returns:
+            dict: Nom du fichier et résultat stocké, ou None si absent ou expiré
+        """
+        now = time.time()
+        conn = self._index_connection()
+        row = conn.execute(
+            "SELECT filename, result FROM artifacts WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        if not self.get_download_file_path(row[0]).exists():
+            # Fichier supprimé hors de l'index : l'entrée est obsolète
+            with conn:
+                conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            return None
+        
+        with conn:
+            conn.execute(
+                "UPDATE artifacts SET last_access = ?, expires_at = MAX(expires_at, ?) WHERE key = ?",
+                (now, now + ttl_hours * 3600, key)
+            )
+        return {"filename": row[0], "result": json.loads(row[1])}
+    
+    def register_artifact(self, key, filename, result, ttl_hours=24):
+        """
+        Enregistre un artefact produit.
+        
+        Args:
+            key (str): Clé de contenu de l'artefact
+            filename (str): Nom du fichier dans le répertoire des CV adaptés
+            result (dict): Résultat à restituer lors d'une réutilisation (statistiques, mots-clés)
+            ttl_hours (int): Durée de vie de l'artefact
+        """
+        now = time.time()
+        conn = self._index_connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO artifacts (key, filename, result, created_at, last_access, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET filename = excluded.filename, result = excluded.result, "
+                "last_access = excluded.last_access, "
+                "expires_at = MAX(expires_at, excluded.expires_at)",
+                (key, filename, json.dumps(result, ensure_ascii=False), now, now, now + ttl_hours * 3600)
+            )
+    
+    def register_file(self, path, ttl_hours=24):
+        """
+        Inscrit un fichier dans l'index d'expiration.
+        
+        Args:
+            path (str): Chemin du fichier
+            ttl_hours (float): Durée de vie du fichier en heures
+        """
+        conn = self._index_connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_expiry (path, expires_at) VALUES (?, ?)",
+                (str(Path(path).resolve()), time.time() + ttl_hours * 3600)
+            )
+    
+    def save_upload(self, upload, path, ttl_hours=24):
+        """
+        Persiste un fichier téléchargé et l'inscrit dans l'index d'expiration.
+        
+        Args:
+            upload (SpooledUpload): Tampon du fichier téléchargé
+            path (str): Chemin de destination
+            ttl_hours (float): Durée de vie du fichier en heures
+        """
+        with stage_timer("upload_save", upload.extension.lstrip('.')):
+            upload.save(path)
+            self.register_file(path, ttl_hours)
+        
+        for listener in self._store_listeners:
+            try:
+                listener(Path(path), upload)
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la notification du fichier enregistré: {str(e)}")
+    
+    def file_etag(self, path):
+        """
+        Calcule l'ETag fort d'un fichier à partir de l'empreinte SHA-256 de son contenu.
+        
+        L'empreinte n'est calculée qu'une fois tant que le fichier n'est pas modifié.
+        
+        Args:
+            path (str): Chemin du fichier
+            
+        Returns:
+            str: ETag (sans guillemets)
+        """
+        stat = os.stat(path)
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        with self._etags_lock:
+            etag = self._etags.get(key)
+            if etag is not None:
+                self._etags.move_to_end(key)
+                return etag
+        
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(chunk)
+        etag = digest.hexdigest()
+        
+        with self._etags_lock:
+            self._etags[key] = etag
+            while len(self._etags) > self.max_etags:
+                self._etags.popitem(last=False)
+        return etag
+    
+    def _cleanup_expired_files(self, now, batch_size=500):
+        """
+        Supprime les fichiers expirés d'après l'index, sans parcourir les répertoires.
+        
+        Returns:
+            int: Nombre de fichiers supprimés
+        """
+        conn = self._index_connection()
+        deleted_count = 0
+        while True:
+            expired = conn.execute(
+                "SELECT path FROM file_expiry WHERE expires_at <= ? LIMIT ?", (now, batch_size)
+            ).fetchall()
+            if not expired:
+                return deleted_count
+            deleted = []
+            for (path,) in expired:
+                try:
+                    Path(path).unlink(missing_ok=True)
+                    deleted.append(Path(path))
+                    self.logger.debug(f"Fichier supprimé: {path}")
+                except Exception as e:
+                    self.logger.error(f"Erreur lors de la suppression du fichier {path}: {str(e)}")
+            with conn:
+                conn.executemany("DELETE FROM file_expiry WHERE path = ?", expired)
+            deleted_count += len(deleted)
+            self._notify_deleted(deleted)
+    
+    def _cleanup_expired_artifacts(self, now):
+        """
+        Supprime les artefacts expirés (non réutilisés pendant leur durée de vie).
+        
+        Returns:
+            int: Nombre de fichiers supprimés
+        """
+        conn = self._index_connection()
+        expired = conn.execute(
+            "SELECT key, filename FROM artifacts WHERE expires_at <= ?", (now,)
+        ).fetchall()
+        deleted_count = 0
+        for key, filename in expired:
+            try:
+                self.get_download_file_path(filename).unlink(missing_ok=True)
+                deleted_count += 1
+                self.logger.debug(f"Artefact supprimé: {filename}")
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la suppression de l'artefact {filename}: {str(e)}")
+                continue
+            with conn:
+                conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+        return deleted_count
     
     def get_upload_path(self):
         """
@@ -69,6 +342,15 @@ class StorageManager:
         """
         return self.download_path
     
+    def get_state_path(self):
+        """
+        Retourne le répertoire des données internes partagées entre les workers (caches, index).
+        
+        Returns:
+            Path: Chemin du répertoire d'état
+        """
+        return self.state_path
+    
     def get_upload_file_path(self, filename):
         """
         Retourne le chemin complet pour un fichier téléchargé.
@@ -93,44 +375,63 @@ class StorageManager:
         """
         return self.download_path / filename
     
-    def cleanup_old_files(self, max_age_hours=24):
+    def cleanup_old_files(self, max_age_hours=24, full_scan=False):
         """
-        Nettoie les fichiers plus anciens que max_age_hours.
+        Supprime les fichiers expirés à partir de l'index d'expiration.
+        
+        Seules les entrées expirées de l'index sont lues : le coût ne dépend pas
+        du nombre de fichiers présents. Le parcours complet des répertoires n'est
+        utile que pour les fichiers antérieurs à l'index.
         
         Args:
-            max_age_hours (int): Âge maximum des fichiers en heures
+            max_age_hours (int): Âge maximum des fichiers non indexés en heures (parcours complet)
+            full_scan (bool): Parcourir aussi les répertoires à la recherche de fichiers non indexés
             
         Returns:
             int: Nombre de fichiers supprimés
         """
-        import time
-        from datetime import datetime, timedelta
+        now = time.time()
         
-        self.logger.info(f"Nettoyage des fichiers plus anciens que {max_age_hours} heures")
+        with stage_timer("cleanup"):
+            # Fichiers et artefacts indexés
+            deleted_count = self._cleanup_expired_files(now)
+            deleted_count += self._cleanup_expired_artifacts(now)
+            
+            if full_scan:
+                deleted_count += self._cleanup_unindexed_files(now - max_age_hours * 3600)
+        FILES_DELETED.inc(deleted_count)
         
-        # Calculer le timestamp limite
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
-        cutoff_timestamp = cutoff_time.timestamp()
+        self.logger.info(f"Nettoyage terminé: {deleted_count} fichiers supprimés")
+        return deleted_count
+    
+    def _cleanup_unindexed_files(self, cutoff_timestamp):
+        """
+        Parcourt les répertoires pour supprimer les anciens fichiers absents de l'index.
         
-        # Compter les fichiers supprimés
-        deleted_count = 0
+        Returns:
+            int: Nombre de fichiers supprimés
+        """
+        conn = self._index_connection()
+        indexed = {row[0] for row in conn.execute("SELECT path FROM file_expiry")}
+        artifacts = {row[0] for row in conn.execute("SELECT filename FROM artifacts")}
         
-        # Nettoyer les répertoires
+        deleted = []
         for directory in [self.upload_path, self.download_path]:
             for file_path in directory.glob('*'):
-                if file_path.is_file():
-                    # Vérifier l'âge du fichier
-                    file_mtime = file_path.stat().st_mtime
-                    if file_mtime < cutoff_timestamp:
-                        try:
-                            file_path.unlink()
-                            deleted_count += 1
-                            self.logger.info(f"Fichier supprimé: {file_path}")
-                        except Exception as e:
-                            self.logger.error(f"Erreur lors de la suppression du fichier {file_path}: {str(e)}")
-        
-        self.logger.info(f"{deleted_count} fichiers supprimés")
-        return deleted_count
+                if file_path.name in artifacts or str(file_path.resolve()) in indexed:
+                    continue
+                if file_path.name.startswith('.') or not file_path.is_file():
+                    continue
+                # Vérifier l'âge du fichier
+                if file_path.stat().st_mtime < cutoff_timestamp:
+                    try:
+                        file_path.unlink()
+                        deleted.append(file_path)
+                        self.logger.debug(f"Fichier supprimé: {file_path}")
+                    except Exception as e:
+                        self.logger.error(f"Erreur lors de la suppression du fichier {file_path}: {str(e)}")
+        self._notify_deleted(deleted)
+        return len(deleted)
     
     def is_render_environment(self):
         """
@@ -140,3 +441,113 @@ class StorageManager:
             bool: True si sur Render.com, False sinon
         """
         return self.is_render
+
+
+class StorageJanitor:
+    """
+    Nettoyage périodique du stockage par un seul processus.
+    
+    Chaque worker démarre un janitor, mais seul celui qui obtient le verrou
+    exclusif sur le fichier janitor.lock exécute le nettoyage ; les autres
+    retentent l'élection à chaque intervalle et prennent le relais si le
+    détenteur du verrou disparaît.
+    """
+    
+    def __init__(self, storage_manager, interval_seconds=3600, max_age_hours=24):
+        """
+        Initialise le janitor.
+        
+        Args:
+            storage_manager (StorageManager): Gestionnaire de stockage à nettoyer
+            interval_seconds (float): Intervalle entre deux nettoyages
+            max_age_hours (int): Âge maximum des fichiers non indexés
+        """
+        self.logger = logging.getLogger('storage_janitor')
+        self.storage_manager = storage_manager
+        self.interval_seconds = interval_seconds
+        self.max_age_hours = max_age_hours
+        self.lock_path = storage_manager.get_state_path() / 'janitor.lock'
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def is_leader(self):
+        """
+        Indique si ce processus détient le verrou du janitor.
+        """
+        return self._lock_file is not None
+    
+    def try_acquire(self):
+        """
+        Tente d'obtenir le verrou exclusif du janitor sans bloquer.
+        
+        Returns:
+            bool: True si ce janitor est élu
+        """
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            # Sans verrou de fichier (Windows), le janitor local est toujours élu
+            self._lock_file = True
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.logger.info(f"Janitor élu (pid {os.getpid()})")
+        return True
+    
+    def release(self):
+        """
+        Libère le verrou du janitor.
+        """
+        if self._lock_file not in (None, True):
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._lock_file.close()
+        self._lock_file = None
+    
+    def run_once(self):
+        """
+        Exécute un nettoyage si ce janitor est élu.
+        
+        Returns:
+            int: Nombre de fichiers supprimés, ou None si le janitor n'est pas élu
+        """
+        if not self.try_acquire():
+            return None
+        try:
+            return self.storage_manager.cleanup_old_files(max_age_hours=self.max_age_hours)
+        except Exception as e:
+            self.logger.error(f"Erreur lors du nettoyage périodique: {str(e)}")
+            return 0
+    
+    def start(self):
+        """
+        Démarre le thread de nettoyage périodique.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="storage-janitor", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=5):
+        """
+        Arrête le thread de nettoyage et libère le verrou.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.release()
+    
+    def _loop(self):
+        """
+        Boucle du thread : un nettoyage par intervalle.
+        """
+        while not self._stop.wait(self.interval_seconds):
+            self.run_once()
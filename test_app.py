@@ -1,10 +1,40 @@
 import os
 import unittest
+from unittest import mock
 import tempfile
 import shutil
-from app import app
-from storage_manager import StorageManager
+import hashlib
+import zipfile
+import time
+import json
+import uuid
+from io import BytesIO
+from docx import Document
+import PyPDF2
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
+import app as app_module
+from app import app, cv_ranker
+from storage_manager import StorageManager, StorageJanitor
 from cv_processor import CVProcessor
+from keyword_matcher import KeywordMatcher
+from pdf_highlighter import PdfHighlighter
+from docx_highlighter import DocxHighlighter
+from document_backends import get_backend, is_loaded
+from analysis_cache import AnalysisCache
+from parsed_cv_cache import ParsedCVCache
+from cv_ranking import CVRanker
+import inverted_index
+from inverted_index import InvertedIndex, QuerySyntaxError, parse_query, merge_segments
+from upload_buffer import SpooledUpload, UploadRejectedError
+from document_guard import DocumentGuard, DocumentRejectedError, SandboxPool
+from batch_processor import BatchProcessor
+from bulk_analysis import BulkAnalyzer, BulkInputError, iter_json_array
+from admission import ConcurrencyLimiter, TokenBucketLimiter, OverloadedError
+from session_store import ServerSideSessionInterface, MemorySessionStore, SqliteSessionStore
+from benchmarks.corpus import generate_docx_cv, generate_pdf_cv, generate_job_description
+from benchmarks.run import compare, calibrate, BASELINES_PATH
+import metrics
 
 class CVAnalyzerTestCase(unittest.TestCase):
     """Tests pour l'application CV Analyzer"""
@@ -59,6 +89,68 @@ class CVAnalyzerTestCase(unittest.TestCase):
         self.assertIn(test_filename, str(upload_path))
         self.assertIn(test_filename, str(download_path))
     
+    def test_storage_expiry_index_and_janitor(self):
+        """Test du nettoyage par index d'expiration et de l'élection du janitor"""
+        storage = StorageManager(base_path=self.temp_dir)
+        
+        expired_path = storage.get_upload_file_path("expire.docx")
+        kept_path = storage.get_upload_file_path("conserve.docx")
+        legacy_path = storage.get_upload_file_path("ancien.docx")
+        for path in (expired_path, kept_path, legacy_path):
+            path.write_bytes(b"contenu")
+        storage.register_file(expired_path, ttl_hours=0)
+        storage.register_file(kept_path, ttl_hours=24)
+        os.utime(legacy_path, (0, 0))
+        
+        # Seules les entrées expirées de l'index sont supprimées
+        self.assertEqual(storage.cleanup_old_files(), 1)
+        self.assertFalse(expired_path.exists())
+        self.assertTrue(kept_path.exists())
+        self.assertTrue(legacy_path.exists())
+        
+        # Le parcours complet traite les fichiers antérieurs à l'index
+        self.assertEqual(storage.cleanup_old_files(max_age_hours=24, full_scan=True), 1)
+        self.assertFalse(legacy_path.exists())
+        self.assertTrue(kept_path.exists())
+        
+        # Un seul janitor est élu par répertoire de stockage
+        first = StorageJanitor(storage)
+        second = StorageJanitor(storage)
+        try:
+            self.assertEqual(first.run_once(), 0)
+            self.assertIsNone(second.run_once())
+            first.release()
+            self.assertEqual(second.run_once(), 0)
+        finally:
+            first.release()
+            second.release()
+
+    def test_session_store_backends(self):
+        """Test des sessions côté serveur (mémoire et SQLite) avec expiration"""
+        for store in (MemorySessionStore(), SqliteSessionStore(os.path.join(self.temp_dir, 'sessions.sqlite'))):
+            store.save('actif', {'job_id': 'abc'}, ttl_seconds=60)
+            store.save('expire', {'job_id': 'def'}, ttl_seconds=-1)
+            self.assertEqual(store.load('actif'), {'job_id': 'abc'})
+            self.assertIsNone(store.load('expire'))
+            store.purge_expired()
+            store.delete('actif')
+            self.assertIsNone(store.load('actif'))
+
+        # Le cookie ne transporte que l'identifiant signé de la session
+        previous_interface = app.session_interface
+        store = MemorySessionStore()
+        app.session_interface = ServerSideSessionInterface(store)
+        try:
+            with self.client.session_transaction() as sess:
+                sess['job_id'] = 'tache-1'
+            cookie = self.client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+            self.assertNotIn('tache-1', cookie.value)
+            with self.client.session_transaction() as sess:
+                self.assertEqual(sess['job_id'], 'tache-1')
+            self.assertEqual(list(store._sessions.values())[0][1], '{"job_id": "tache-1"}')
+        finally:
+            app.session_interface = previous_interface
+
     def test_cv_processor_keyword_extraction(self):
         """Test de l'extraction de mots-clés"""
         processor = CVProcessor(self.upload_dir, self.download_dir)
@@ -97,6 +189,1025 @@ class CVAnalyzerTestCase(unittest.TestCase):
         for keyword in important_keywords:
             self.assertIn(keyword, all_keywords)
     
+    def test_cv_processor_job_description_analysis(self):
+        """Test de l'analyse structurée d'une description de poste"""
+        processor = CVProcessor(self.upload_dir, self.download_dir)
+        
+        job_description = (
+            "Poste en CDI.\n\n"
+            "Compétences techniques requises : Python, Flask; Django\n\n"
+            "Profil : Master en informatique, 3 ans d'expérience en gestion de projet"
+        )
+        
+        analysis = processor.analyze_job_description(job_description)
+        
+        self.assertEqual(analysis["technical_skills"], ["Python", "Flask", "Django"])
+        self.assertEqual(analysis["experience_years"], "3")
+        self.assertEqual(analysis["education"], "Master")
+        self.assertEqual(analysis["contract_type"], "CDI")
+        self.assertIn("informatique", analysis["keywords"]["compétences"])
+        self.assertNotIn("en", analysis["keywords"]["compétences"])
+    
+    def test_analysis_cache_tiers(self):
+        """Test du cache à deux niveaux des analyses de descriptions de poste"""
+        db_path = os.path.join(self.temp_dir, 'cache.sqlite')
+        cache = AnalysisCache(db_path=db_path, max_entries=1)
+        processor = CVProcessor(self.upload_dir, self.download_dir, cache=cache)
+        
+        keywords = processor.extract_keywords_from_job_description("Python Flask Python Flask")
+        self.assertEqual(processor.extract_keywords_from_job_description("Python Flask Python Flask  \r\n"), keywords)
+        processor.analyze_job_description("Python Flask Python Flask")
+        
+        stats = cache.stats()
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["memory_hits"], 1)
+        self.assertEqual(stats["memory_evictions"], 1)
+        
+        # Un autre worker réutilise le résultat depuis le niveau disque
+        other = AnalysisCache(db_path=db_path)
+        self.assertEqual(other.get(other.make_key("keywords", "Python Flask Python Flask")), keywords)
+        self.assertEqual(other.stats()["disk_hits"], 1)
+        
+        # Les entrées expirées ne sont plus servies
+        expired = AnalysisCache(ttl_seconds=0)
+        expired.set("key", {"a": 1})
+        self.assertIsNone(expired.get("key"))
+        self.assertEqual(expired.stats()["expirations"], 1)
+    
+    def test_keyword_matcher_single_pass(self):
+        """Test du moteur de correspondance multi-mots-clés"""
+        matcher = KeywordMatcher(["python", "py", "flask", "django"])
+        
+        text = "Python, Flask et Django"
+        matches = matcher.find_all(text)
+        
+        # Chaque mot-clé est trouvé une seule fois, la correspondance la plus longue l'emporte
+        self.assertEqual([text[start:end] for start, end in matches], ["Python", "Flask", "Django"])
+        self.assertEqual(KeywordMatcher([]).find_all(text), [])
+        
+        # Expressions de plusieurs mots, accents, casse, limites de mots et racinisation légère
+        matcher = KeywordMatcher(["experience", "gestion", "mise en œuvre", "mise", "développer"])
+        text = "Expériences en gestion de projet, digestion, MISE EN OEUVRE ; mise à jour ; développées"
+        self.assertEqual([text[start:end] for start, end in matcher.find_all(text)],
+                         ["Expériences", "gestion", "MISE EN OEUVRE", "mise", "développées"])
+        self.assertEqual(matcher.find_keywords("Mise en œuvre"), {"mise en œuvre"})
+        self.assertTrue(matcher.contains("une expérience"))
+        self.assertFalse(matcher.contains("indigestion"))
+        
+        # Les termes de plusieurs mots sont extraits des descriptions de poste
+        processor = CVProcessor(self.upload_dir, self.download_dir)
+        keywords = processor.extract_keywords_from_job_description(
+            "Mise en œuvre des projets. Expérience requise, experience en Python."
+        )
+        self.assertEqual(set(keywords["termes_cv"]), {"mise en œuvre", "expérience", "projet"})
+        self.assertEqual(keywords["général"], {"expérience": 2})
+    
+    def test_adapt_docx_keeps_all_highlights(self):
+        """Test de la mise en évidence de plusieurs mots-clés dans un même paragraphe"""
+        processor = CVProcessor(self.upload_dir, self.download_dir)
+        
+        cv_path = os.path.join(self.upload_dir, "cv.docx")
+        document = Document()
+        document.add_paragraph("Développeur Python avec Flask et Django")
+        document.add_paragraph("Loisirs : randonnée")
+        document.save(cv_path)
+        
+        job_description = "Python Flask Django. Python Flask Django."
+        result = processor.adapt_cv(cv_path, job_description)
+        
+        self.assertEqual(result["stats"]["paragraphs_modified"], 1)
+        self.assertEqual(result["stats"]["highlighted_keywords"], 3)
+        
+        adapted = Document(os.path.join(self.download_dir, result["filename"]))
+        underlined = [run.text for run in adapted.paragraphs[0].runs if run.underline]
+        self.assertEqual(underlined, ["Python", "Flask", "Django"])
+        self.assertEqual(adapted.paragraphs[0].text, "Développeur Python avec Flask et Django")
+    
+    def test_adapt_docx_covers_tables_headers_and_formatting(self):
+        """Test de la mise en évidence dans les tableaux et en-têtes, mise en forme conservée"""
+        document = Document()
+        paragraph = document.add_paragraph()
+        paragraph.add_run("Développeur ").italic = True
+        bold = paragraph.add_run("Python senior")
+        bold.bold = True
+        document.add_table(rows=1, cols=1).cell(0, 0).text = "Expert Django"
+        document.sections[0].header.paragraphs[0].text = "CV Python"
+        buffer = BytesIO()
+        document.save(buffer)
+        
+        output = BytesIO()
+        stats = DocxHighlighter(KeywordMatcher(["python", "django"])).highlight(BytesIO(buffer.getvalue()), output)
+        self.assertEqual(stats, {"highlighted_keywords": 3, "paragraphs_modified": 3})
+        
+        adapted = Document(BytesIO(output.getvalue()))
+        runs = [(run.text, run.bold, run.italic, run.underline) for run in adapted.paragraphs[0].runs]
+        self.assertEqual(runs, [
+            ("Développeur ", None, True, None),
+            ("Python", True, None, True),
+            (" senior", True, None, None)
+        ])
+        cell_runs = adapted.tables[0].cell(0, 0).paragraphs[0].runs
+        self.assertEqual([run.text for run in cell_runs if run.underline], ["Django"])
+        header_runs = adapted.sections[0].header.paragraphs[0].runs
+        self.assertEqual([run.text for run in header_runs if run.underline], ["Python"])
+        
+        # Les autres parties du paquet sont recopiées à l'identique
+        with zipfile.ZipFile(BytesIO(buffer.getvalue())) as original, zipfile.ZipFile(output) as result:
+            self.assertEqual(original.namelist(), result.namelist())
+            self.assertEqual(original.read('word/styles.xml'), result.read('word/styles.xml'))
+    
+    def test_parsed_cv_cache_retargets_documents(self):
+        """Test de l'adaptation d'un CV analysé une seule fois à plusieurs offres"""
+        docx_data = generate_docx_cv(pages=1, paragraphs=20, tables=1, keyword_density=0.2, seed=3)
+        pdf_data = generate_pdf_cv(pages=2, lines_per_page=20, keyword_density=0.2, seed=3)
+        cache = ParsedCVCache(os.path.join(self.temp_dir, 'parsed'))
+        cached = CVProcessor(self.upload_dir, self.download_dir, parsed_cache=cache)
+        plain = CVProcessor(self.upload_dir, self.download_dir)
+        
+        for ext, data in (('.docx', docx_data), ('.pdf', pdf_data)):
+            for seed in (1, 2):
+                job_description = generate_job_description(words=200, keyword_density=0.2, seed=seed)
+                expected = plain.adapt_document(BytesIO(data), ext, job_description)
+                result = cached.adapt_document(BytesIO(data), ext, job_description)
+                self.assertEqual(result["stats"], expected["stats"])
+                self.assertGreater(result["stats"]["highlighted_keywords"], 0)
+                if ext == '.docx':
+                    with zipfile.ZipFile(BytesIO(result["content"])) as adapted, \
+                            zipfile.ZipFile(BytesIO(expected["content"])) as reference:
+                        self.assertEqual(adapted.read('word/document.xml'), reference.read('word/document.xml'))
+        
+        # Chaque CV n'a été analysé qu'une fois ; un nouveau processus relit le disque
+        self.assertEqual(cache.stats()["misses"], 2)
+        self.assertEqual(cache.stats()["memory_hits"], 2)
+        self.assertEqual(len(os.listdir(cache.directory)), 2)
+        key = cache.make_key(hashlib.sha256(docx_data).hexdigest(), '.docx')
+        self.assertIsNotNone(ParsedCVCache(cache.directory).get(key))
+        
+        # Éviction des entrées les moins récemment utilisées au-delà de la taille maximale
+        small = ParsedCVCache(os.path.join(self.temp_dir, 'small'), max_bytes=1)
+        small.set('a', {"pages": []})
+        self.assertEqual(os.listdir(small.directory), [])
+        self.assertEqual(small.stats()["evictions"], 1)
+    
+    def test_cv_ranking_scores_and_removals(self):
+        """Test du classement TF-IDF des CV stockés, partagé entre workers"""
+        db_path = os.path.join(self.temp_dir, 'ranking.sqlite')
+        ranker = CVRanker(db_path, snapshot_every=2)
+        ranker.add("cv-python", "Développeur Python Django, expert Python et PostgreSQL", name="python.docx")
+        ranker.add("cv-java", "Développeur Java Spring, architecture microservices", name="java.pdf")
+        ranker.add("cv-design", "Graphiste, illustration et identité visuelle", name="design.pdf")
+        
+        results = ranker.rank("Nous recherchons un développeur Python maîtrisant Django", top_k=5)
+        self.assertEqual([result["cv_id"] for result in results], ["cv-python", "cv-java"])
+        self.assertEqual(results[0]["name"], "python.docx")
+        self.assertEqual(set(results[0]["matched_keywords"]), {"python", "django", "développeur"})
+        self.assertGreater(results[0]["score"], results[1]["score"])
+        self.assertEqual(len(ranker.rank("développeur", top_k=1)), 1)
+        self.assertEqual(ranker.rank("boulangerie"), [])
+        
+        # Un autre worker repart de l'instantané et voit les suppressions
+        other = CVRanker(db_path)
+        other.remove("cv-python")
+        self.assertTrue(os.path.exists(ranker.snapshot_path))
+        self.assertEqual([result["cv_id"] for result in ranker.rank("python django développeur")], ["cv-java"])
+        restarted = CVRanker(db_path)
+        self.assertEqual(restarted.stats()["documents"], 2)
+        self.assertEqual(restarted.rank("python django"), [])
+        # CV ajouté après la construction de la vue par colonnes : évalué sur la matrice par lignes
+        restarted.postings_refresh_ratio = 10
+        restarted.add("cv-data", "Data engineer Python Spark", name="data.pdf")
+        self.assertEqual([result["cv_id"] for result in restarted.rank("python spark java")], ["cv-data", "cv-java"])
+        
+        # Point d'entrée de l'API
+        cv_ranker.add("test-rank-cv", "Ingénieur Kubernetes Terraform", name="devops.pdf")
+        try:
+            response = self.client.post('/api/rank', json={"job_description": "Kubernetes Terraform", "top_k": 3})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()["results"][0]["cv_id"], "test-rank-cv")
+        finally:
+            cv_ranker.remove("test-rank-cv")
+        self.assertEqual(self.client.post('/api/rank', json={"job_description": ""}).status_code, 400)
+        self.assertEqual(self.client.post('/api/rank', json={"job_description": "x", "top_k": 0}).status_code, 400)
+    
+    def test_inverted_index_boolean_search(self):
+        """Test de l'index inversé persistant : requêtes booléennes, segments, fusion et suppressions"""
+        texts = {
+            "cv-1": "Développeur Python Flask et Django, stage de fin d'études",
+            "cv-2": "Développeur Python Django senior, machine learning",
+            "cv-3": "Ingénieur Java, Flask pour les outils internes",
+        }
+        paths = {}
+        for doc_id, text in texts.items():
+            paths[doc_id] = os.path.join(self.temp_dir, f"{doc_id}.txt")
+            with open(paths[doc_id], 'w', encoding='utf-8') as f:
+                f.write(text)
+        
+        def read_text(path):
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        
+        directory = os.path.join(self.temp_dir, 'search_index')
+        index = InvertedIndex(directory, extract_text=read_text, flush_every=2, max_segments=1, merge_factor=2)
+        
+        def ids(query):
+            return sorted(result["cv_id"] for result in index.search(query)["results"])
+        
+        # Un document en file n'est consultable qu'après extraction de son texte
+        index.submit("cv-1", paths["cv-1"], "un.docx")
+        self.assertEqual(index.search("python")["total"], 0)
+        self.assertTrue(index.run_once())
+        self.assertEqual(index.search("python")["results"], [{"cv_id": "cv-1", "name": "un.docx"}])
+        
+        index.submit("cv-2", paths["cv-2"], "deux.pdf")
+        index.run_once()
+        self.assertEqual(index.stats()["segments"], 1)
+        index.submit("cv-3", paths["cv-3"], "trois.pdf")
+        index.run_once()
+        
+        self.assertEqual(ids("flask AND django NOT stage"), [])
+        self.assertEqual(ids("django NOT stage"), ["cv-2"])
+        self.assertEqual(ids("flask OR \"machine learning\""), ["cv-1", "cv-2", "cv-3"])
+        self.assertEqual(ids("(java OR senior) python"), ["cv-2"])
+        self.assertEqual(ids('"learning machine"'), [])
+        self.assertEqual(ids("DÉVELOPPEUR"), ["cv-1", "cv-2"])
+        with self.assertRaises(QuerySyntaxError):
+            parse_query("python AND (django")
+        
+        # Les suppressions sont appliquées à la recherche, puis effacées à la fusion
+        index.remove("cv-1")
+        self.assertEqual(ids("python"), ["cv-2"])
+        index.flush(force=True)
+        index.submit("cv-4", paths["cv-3"], "quatre.pdf")
+        index.run_once(force=True)
+        self.assertEqual(index.stats()["segments"], 1)
+        self.assertEqual(index.stats()["deleted"], 0)
+        index.stop()
+        
+        # Un autre processus relit les segments persistés sans les documents d'origine
+        for path in paths.values():
+            os.remove(path)
+        reopened = InvertedIndex(directory)
+        self.assertEqual(reopened.search("flask")["results"], [
+            {"cv_id": "cv-4", "name": "quatre.pdf"}, {"cv_id": "cv-3", "name": "trois.pdf"}
+        ])
+        self.assertEqual(reopened.search("python django")["total"], 1)
+        
+        # Une suppression pendant une fusion n'est pas effacée par celle-ci : le document reste exclu
+        writer = InvertedIndex(directory)
+        writer.add("cv-5", "Python Rust", "cinq.pdf")
+        writer.flush(force=True)
+        
+        def merge_during_remove(*args):
+            writer.remove("cv-5")
+            return merge_segments(*args)
+        
+        with mock.patch.object(inverted_index, "merge_segments", merge_during_remove):
+            self.assertIsNotNone(writer.merge(force=True))
+        self.assertEqual(writer.search("rust")["total"], 0)
+        self.assertEqual(writer.stats()["deleted"], 1)
+        
+        # Un segment supprimé par la fusion d'un autre processus avant son ouverture : la table est relue
+        writer.add("cv-6", "Python Go", "six.pdf")
+        writer.flush(force=True)
+        reader = InvertedIndex(directory)
+        merged = []
+        open_segment = inverted_index.Segment.open
+        
+        def open_after_merge(path):
+            if not merged:
+                merged.append(None)
+                merged[0] = writer.merge(force=True)
+            return open_segment(path)
+        
+        with mock.patch.object(inverted_index.Segment, "open", side_effect=open_after_merge):
+            self.assertEqual(reader.search("go")["results"], [{"cv_id": "cv-6", "name": "six.pdf"}])
+        self.assertIsNotNone(merged[0])
+        self.assertEqual(reader.search("rust")["total"], 0)
+        
+        # Point d'entrée de l'API
+        self.assertEqual(self.client.get('/api/search').status_code, 400)
+        self.assertEqual(self.client.get('/api/search?q=python+AND+(').status_code, 400)
+        response = self.client.post('/api/search', json={"query": "python OR java", "limit": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("total", response.get_json())
+    
+    def test_admission_control(self):
+        """Test de la limite de concurrence, de la file d'attente bornée et du seau à jetons par client"""
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_waiting=1, wait_timeout=0.05)
+        admitted_at = limiter.acquire()
+        # Une requête attend dans la file, puis est refusée à l'expiration du délai
+        with self.assertRaises(OverloadedError) as context:
+            limiter.acquire()
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+        limiter.release(admitted_at)
+        limiter.release(limiter.acquire())
+        self.assertEqual(limiter.stats()["timed_out"], 1)
+        self.assertEqual(limiter.stats()["active"], 0)
+        
+        buckets = TokenBucketLimiter(rate=1, burst=2)
+        self.assertTrue(buckets.acquire("a")[0])
+        self.assertTrue(buckets.acquire("a")[0])
+        self.assertEqual(buckets.acquire("a"), (False, 1))
+        self.assertTrue(buckets.acquire("b")[0])
+        
+        # Les adaptations au-delà de la limite sont refusées immédiatement (503)
+        limiter = app_module.adaptation_limiter
+        max_waiting = limiter.max_waiting
+        limiter.max_waiting = 0
+        slots = [limiter.acquire() for _ in range(limiter.max_concurrent)]
+        try:
+            response = self.client.post('/api/adapt', data={'job_description': 'Python'})
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('Retry-After', response.headers)
+        finally:
+            limiter.max_waiting = max_waiting
+            for admitted_at in slots:
+                limiter.release(admitted_at)
+        self.assertEqual(self.client.get('/').status_code, 200)
+        
+        # Au-delà du débit autorisé, le client reçoit 429
+        rate_limiter = app_module.client_rate_limiter
+        app_module.client_rate_limiter = TokenBucketLimiter(rate=0, burst=1)
+        try:
+            self.assertEqual(self.client.post('/api/adapt', data={'job_description': 'Python'}).status_code, 400)
+            response = self.client.post('/api/adapt', data={'job_description': 'Python'})
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.headers['Retry-After'], '60')
+        finally:
+            app_module.client_rate_limiter = rate_limiter
+        
+        # Derrière le proxy, le client est identifié par l'adresse ajoutée par le proxy, non par celles qu'il fournit
+        trust_proxy = app_module.RATE_LIMIT_TRUST_PROXY
+        app_module.RATE_LIMIT_TRUST_PROXY = True
+        try:
+            with app.test_request_context('/', headers={'X-Forwarded-For': '1.2.3.4, 203.0.113.7'},
+                                          environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+                self.assertEqual(app_module.client_key(), '203.0.113.7')
+        finally:
+            app_module.RATE_LIMIT_TRUST_PROXY = trust_proxy
+    
+    def test_document_guard_limits(self):
+        """Test de l'inspection préalable des documents et du budget mémoire des processus isolés"""
+        # Bombe de décompression : quelques Ko qui se décompressent en 50 Mo
+        bomb = BytesIO()
+        with zipfile.ZipFile(bomb, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('word/document.xml', b'<w:document>' + b' ' * (50 * 1024 * 1024) + b'</w:document>')
+        with self.assertRaises(DocumentRejectedError) as context:
+            DocumentGuard().inspect(bomb, '.docx')
+        self.assertEqual(context.exception.reason, "ratio")
+        with self.assertRaises(DocumentRejectedError):
+            DocumentGuard(max_compression_ratio=10 ** 6, max_uncompressed_bytes=1024 * 1024).inspect(bomb, '.docx')
+        
+        pdf = BytesIO(generate_pdf_cv(pages=3))
+        self.assertEqual(DocumentGuard().inspect(pdf, '.pdf'), {"pages": 3})
+        self.assertEqual(pdf.tell(), 0)
+        for guard, reason in ((DocumentGuard(max_pages=2), "pages"), (DocumentGuard(max_page_content_bytes=100), "page_content")):
+            with self.assertRaises(DocumentRejectedError) as context:
+                guard.inspect(pdf, '.pdf')
+            self.assertEqual(context.exception.reason, reason)
+        with self.assertRaises(DocumentRejectedError):
+            PdfHighlighter(KeywordMatcher(["python"]), max_page_text=100).parse(pdf)
+        
+        # Le processeur refuse le document avant de l'analyser
+        processor = CVProcessor(self.upload_dir, self.download_dir, guard=DocumentGuard(max_pages=2))
+        with self.assertRaises(DocumentRejectedError):
+            processor.adapt_document(pdf, '.pdf', "Python Python")
+        rejected = metrics.DOCUMENTS_REJECTED.value(reason="ratio")
+        response = self.client.post('/api/adapt', data={
+            'cv_file': (BytesIO(bomb.getvalue()), 'cv.docx'),
+            'job_description': 'Python Python'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        # Refus prononcé dans le processus isolé, compté dans le processus qui sert /metrics
+        self.assertEqual(metrics.DOCUMENTS_REJECTED.value(reason="ratio"), rejected + 1)
+        
+        # Une allocation au-delà du budget échoue dans le processus isolé, qui reste utilisable
+        sandbox = SandboxPool(memory_limit_mb=512, max_workers=1, timeout=60)
+        try:
+            with self.assertRaises(DocumentRejectedError) as context:
+                sandbox.run(bytearray, 2 * 1024 ** 3)
+            self.assertEqual(context.exception.reason, "memory")
+            self.assertEqual(len(sandbox.run(bytearray, 16)), 16)
+        finally:
+            sandbox.shutdown()
+        
+        # Le délai court depuis la prise en charge : l'attente d'un processus libre n'est pas comptée,
+        # et seul le processus bloqué est arrêté
+        from concurrent.futures import ThreadPoolExecutor
+        sandbox = SandboxPool(memory_limit_mb=0, max_workers=2, timeout=3)
+        try:
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                blocked = executor.submit(sandbox.run, time.sleep, 30)
+                queued = [executor.submit(sandbox.run, time.sleep, 1.2) for _ in range(3)]
+                self.assertEqual([future.result() for future in queued], [None, None, None])
+                with self.assertRaises(DocumentRejectedError) as context:
+                    blocked.result()
+                self.assertEqual(context.exception.reason, "timeout")
+        finally:
+            sandbox.shutdown()
+        
+        # Un document qui dépasse le budget est refusé avec un motif explicite et compté ; le processus est remplacé
+        small = BytesIO()
+        document = Document()
+        document.add_paragraph("Développeur Python")
+        document.save(small)
+        large = BytesIO()
+        run = '<w:r><w:t>' + os.urandom(5000).hex() + '</w:t></w:r>'
+        with zipfile.ZipFile(BytesIO(small.getvalue())) as source, zipfile.ZipFile(large, 'w', zipfile.ZIP_DEFLATED) as target:
+            for info in source.infolist():
+                data = source.read(info)
+                if info.filename == 'word/document.xml':
+                    data = data.replace(b'<w:body>', ('<w:body><w:p>' + run * 4000 + '</w:p>').encode())
+                target.writestr(info, data)
+        sandbox = SandboxPool(memory_limit_mb=64, max_workers=1, timeout=60)
+        previous = app_module.cv_processor.sandbox
+        app_module.cv_processor.sandbox = sandbox
+        try:
+            rejected = metrics.DOCUMENTS_REJECTED.value(reason="memory")
+            response = self.client.post('/api/adapt', data={
+                'cv_file': (BytesIO(large.getvalue()), 'cv.docx'),
+                'job_description': 'Python Python'
+            }, content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 400, response.get_data(as_text=True))
+            self.assertIn("Budget mémoire dépassé", response.get_json()["error"])
+            self.assertEqual(metrics.DOCUMENTS_REJECTED.value(reason="memory"), rejected + 1)
+            processor = CVProcessor(self.upload_dir, self.download_dir, sandbox=sandbox)
+            with self.assertRaises(DocumentRejectedError) as context:
+                processor.adapt_document(BytesIO(large.getvalue()), '.docx', "Python Python")
+            self.assertEqual(context.exception.reason, "memory")
+            self.assertEqual(processor.adapt_document(BytesIO(small.getvalue()), '.docx', "Python Python")["stats"]["highlighted_keywords"], 1)
+        finally:
+            app_module.cv_processor.sandbox = previous
+            sandbox.shutdown()
+    
+    def test_asgi_front_end(self):
+        """Test du point d'entrée ASGI : corps reçu par blocs, vues Flask et réponses transmises par blocs"""
+        import asyncio
+        from asgi_app import app as asgi_application
+        
+        async def request(method, path, body=b"", headers=(), chunk_size=None, query=b"", client="127.0.0.1"):
+            chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] if chunk_size else [body]
+            messages = [{"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+                        for index, chunk in enumerate(chunks)]
+            sent = []
+            
+            async def receive():
+                return messages.pop(0) if messages else {"type": "http.disconnect"}
+            
+            async def send(message):
+                sent.append(message)
+            
+            scope = {"type": "http", "method": method, "path": path, "query_string": query,
+                     "headers": [(name.encode(), value.encode()) for name, value in headers],
+                     "client": (client, 50000), "server": ("testserver", 80)}
+            await asgi_application(scope, receive, send)
+            response_headers = {name.decode(): value.decode() for name, value in sent[0].get("headers", [])}
+            return sent[0]["status"], response_headers, b"".join(message.get("body", b"") for message in sent[1:])
+        
+        def call(*args, **kwargs):
+            return asyncio.run(request(*args, **kwargs))
+        
+        status, headers, body = call("GET", "/")
+        self.assertEqual(status, 200)
+        self.assertIn(b"<html", body.lower())
+        
+        # Analyse d'une description de poste, traitée dans le worker
+        payload = b'{"job_description": "Expert Python et Django, Python avant tout"}'
+        status, headers, body = call("POST", "/api/analyze", payload, [("content-type", "application/json")])
+        self.assertEqual(status, 200)
+        self.assertIn("python", json.loads(body)["analysis"]["keywords"]["général"])
+        
+        # Réponses diffusées (stream_with_context) simultanées de plusieurs clients : chaque bloc
+        # est produit dans un thread quelconque, avec le contexte de sa propre requête
+        lines = "".join(json.dumps({"id": f"offre-{i}", "job_description": f"Python, Python {i} ans"}) + "\n"
+                        for i in range(8)).encode()
+        
+        async def bulk():
+            return await asyncio.gather(*[
+                request("POST", "/api/analyze/bulk", lines, [("content-type", "application/x-ndjson")], chunk_size=50,
+                        client=f"192.0.2.{index}")
+                for index in range(4)
+            ])
+        
+        for status, headers, body in asyncio.run(bulk()):
+            self.assertEqual(status, 200)
+            self.assertEqual(headers["content-type"], "application/x-ndjson")
+            results = {line["id"]: line for line in map(json.loads, body.decode().splitlines())}
+            self.assertEqual(set(results), {f"offre-{i}" for i in range(8)})
+            self.assertTrue(all(result["success"] for result in results.values()))
+        
+        # Téléversement reçu en plusieurs messages, puis CV adapté transmis en retour
+        buffer = BytesIO()
+        document = Document()
+        document.add_paragraph("Développeur Python")
+        document.save(buffer)
+        boundary = "cvanalyzerboundary"
+        multipart = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"job_description\"\r\n\r\nPython Python\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"cv_file\"; filename=\"cv.docx\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + buffer.getvalue() + f"\r\n--{boundary}--\r\n".encode()
+        status, headers, body = call("POST", "/api/adapt", multipart, [
+            ("content-type", f"multipart/form-data; boundary={boundary}"),
+            ("content-length", str(len(multipart)))
+        ], chunk_size=1000)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["x-cv-highlighted-keywords"], "1")
+        self.assertTrue(body.startswith(b"PK"))
+        
+        # Un corps trop volumineux est refusé dès l'en-tête Content-Length
+        status, _, _ = call("POST", "/api/adapt", b"", [("content-length", str(64 * 1024 * 1024))])
+        self.assertEqual(status, 413)
+    
+    def test_api_analyze_bulk_streams_ndjson(self):
+        """Test de l'analyse en masse : tableau JSON ou NDJSON lus par éléments, résultats NDJSON identifiés"""
+        # Le tableau est lu par petits blocs : les éléments chevauchent les lectures
+        items = [{"id": f"offre-{i}", "job_description": f"Développeur Python, Python {i} ans"} for i in range(5)]
+        items.append({"id": "vide", "job_description": ""})
+        decoded = [item for _, item, _ in iter_json_array(BytesIO(json.dumps(items).encode()), chunk_size=7)]
+        self.assertEqual(decoded, items)
+        with self.assertRaises(BulkInputError):
+            list(iter_json_array(BytesIO(b'[{"id": 1}, {"id"')))
+
+        response = self.client.post('/api/analyze/bulk', data=json.dumps(items), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        results = {line["id"]: line for line in map(json.loads, response.data.decode().splitlines())}
+        self.assertEqual(set(results), {item["id"] for item in items})
+        self.assertIn("python", results["offre-3"]["analysis"]["keywords"]["général"])
+        self.assertFalse(results["vide"]["success"])
+
+        # Flux NDJSON : une ligne invalide est signalée sans interrompre le lot, l'identifiant vaut la ligne par défaut
+        body = '{"job_description": "Chef de projet Agile"}\n{invalide\n{"id": 7, "job_description": "Data Python"}\n'
+        response = self.client.post('/api/analyze/bulk', data=body, content_type='application/x-ndjson')
+        results = {line["id"]: line for line in map(json.loads, response.data.decode().splitlines())}
+        self.assertTrue(results[1]["success"])
+        self.assertFalse(results[2]["success"])
+        self.assertTrue(results[7]["success"])
+
+        # Fenêtre bornée : au plus max_in_flight analyses soumises avant le premier résultat
+        read = []
+        analyzer = BulkAnalyzer(app_module.cv_processor, max_workers=2, max_in_flight=2)
+
+        def source():
+            for index in range(10):
+                read.append(index)
+                yield index, {"job_description": f"Python {index}"}, None
+
+        stream = analyzer.analyze(source())
+        next(stream)
+        self.assertLessEqual(len(read), 3)
+        self.assertEqual(len(list(stream)), 9)
+        
+        # Analyses faites hors du processus courant, identiques à l'analyse locale et mises en cache à leur retour
+        job_description = f"Ingénieur Docker Kubernetes {uuid.uuid4().hex}"
+        cache = app_module.cv_processor.cache
+        key = cache.make_key("analysis", job_description)
+        [result] = analyzer.analyze([(0, {"job_description": job_description}, None)])
+        self.assertEqual(result["analysis"], app_module.cv_processor._build_analysis(job_description))
+        self.assertEqual(cache.get(key), result["analysis"])
+        self.assertNotIn(os.getpid(), analyzer._executor._processes)
+        self.assertTrue(analyzer._executor._processes)
+        analyzer.shutdown()
+
+        response = self.client.post('/api/analyze/bulk', data='x', content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+
+    def test_document_backends_registry(self):
+        """Test du registre des moteurs de documents chargés au premier usage"""
+        self.assertEqual(get_backend('.DOCX'), DocxHighlighter)
+        self.assertTrue(is_loaded('.docx'))
+        self.assertEqual(get_backend('.pdf'), PdfHighlighter)
+        with self.assertRaises(ValueError):
+            get_backend('.txt')
+    
+    def test_api_upload_runs_in_background(self):
+        """Test de l'adaptation asynchrone avec suivi de la tâche"""
+        buffer = BytesIO()
+        document = Document()
+        document.add_paragraph("Développeur Python")
+        document.save(buffer)
+        buffer.seek(0)
+        
+        response = self.client.post('/api/upload', data={
+            'cv_file': (buffer, 'cv.docx'),
+            'job_description': 'Python Python'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()["job_id"]
+        
+        # Attendre la fin de la tâche
+        for _ in range(100):
+            job = self.client.get(f'/api/jobs/{job_id}').get_json()
+            if job["status"] in ('done', 'failed'):
+                break
+            time.sleep(0.05)
+        
+        self.assertEqual(job["status"], 'done')
+        self.assertEqual(job["stats"]["highlighted_keywords"], 1)
+        self.assertEqual(self.client.get('/api/jobs/inconnu').status_code, 404)
+    
+    def test_api_batch_isolates_file_errors(self):
+        """Test de l'adaptation par lots avec une erreur isolée"""
+        cv_buffer = BytesIO()
+        document = Document()
+        document.add_paragraph("Développeur Python")
+        document.save(cv_buffer)
+        
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zip_file:
+            zip_file.writestr("equipe/alice.docx", cv_buffer.getvalue())
+            zip_file.writestr("bob.docx", b"pas un document Word")
+            zip_file.writestr("notes.txt", b"ignore")
+        archive.seek(0)
+        
+        response = self.client.post('/api/batch', data={
+            'cv_archive': (archive, 'lot.zip'),
+            'job_description': 'Python Python'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_json()["files"], 2)
+        job_id = response.get_json()["job_id"]
+        
+        # Le lot est adapté en arrière-plan par la file de tâches
+        for _ in range(200):
+            job = self.client.get(f'/api/jobs/{job_id}').get_json()
+            if job["status"] in ('done', 'failed'):
+                break
+            time.sleep(0.05)
+        
+        self.assertEqual(job["status"], 'done')
+        manifest = {entry["file"]: entry for entry in job["manifest"]}
+        self.assertEqual(set(manifest), {"alice.docx", "bob.docx"})
+        self.assertEqual(manifest["alice.docx"]["status"], "ok")
+        self.assertEqual(manifest["alice.docx"]["stats"]["highlighted_keywords"], 1)
+        self.assertEqual(manifest["bob.docx"]["status"], "error")
+        self.assertTrue(os.path.isfile(os.path.join(app_module.cv_processor.download_folder, job["filename"])))
+        # Les CV du lot sont supprimés une fois l'archive produite
+        self.assertEqual(os.listdir(self.upload_dir), [])
+        
+        # Un lot sans CV est refusé avant d'être mis en file
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zip_file:
+            zip_file.writestr("notes.txt", b"ignore")
+        archive.seek(0)
+        response = self.client.post('/api/batch', data={
+            'cv_archive': (archive, 'lot.zip'),
+            'job_description': 'Python Python'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_batch_archive_limits(self):
+        """Test des limites de décompression d'une archive de lot"""
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr("bombe.docx", b"\0" * (4 * 1024 * 1024))
+        archive.seek(0)
+        with self.assertRaisesRegex(ValueError, "Taux de compression"):
+            app_module.batch_processor.extract_archive(archive)
+        
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zip_file:
+            for index in range(3):
+                zip_file.writestr(f"cv{index}.docx", os.urandom(1024))
+        processor = BatchProcessor(app_module.cv_processor, max_total_size=2500)
+        archive.seek(0)
+        with self.assertRaisesRegex(ValueError, "taille maximale de 2500"):
+            processor.extract_archive(archive)
+        processor.max_total_size = 4096
+        archive.seek(0)
+        self.assertEqual(len(processor.extract_archive(archive)), 3)
+    
+    def test_api_adapt_in_memory(self):
+        """Test de l'adaptation synchrone en mémoire et de la validation des fichiers"""
+        buffer = BytesIO()
+        document = Document()
+        document.add_paragraph("Développeur Python")
+        document.save(buffer)
+        
+        response = self.client.post('/api/adapt', data={
+            'cv_file': (BytesIO(buffer.getvalue()), 'cv.docx'),
+            'job_description': 'Python Python'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-CV-Highlighted-Keywords'], '1')
+        adapted = Document(BytesIO(response.data))
+        self.assertEqual(adapted.paragraphs[0].text, "Développeur Python")
+        
+        # Un fichier dont le contenu ne correspond pas à l'extension est refusé
+        response = self.client.post('/api/adapt', data={
+            'cv_file': (BytesIO(b"%PDF-1.4 faux document"), 'cv.docx'),
+            'job_description': 'Python Python'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        
+        with self.assertRaises(UploadRejectedError):
+            SpooledUpload(BytesIO(buffer.getvalue()), 'cv.docx', max_size=10)
+        with SpooledUpload(BytesIO(buffer.getvalue()), 'cv.docx', max_size=len(buffer.getvalue())) as upload:
+            self.assertEqual(upload.sha256, hashlib.sha256(buffer.getvalue()).hexdigest())
+
+    def test_get_file_conditional_and_range(self):
+        """Test des ETags, requêtes conditionnelles et partielles au téléchargement"""
+        content = b"0123456789" * 100
+        with open(os.path.join(self.download_dir, 'cv_adapte_test.pdf'), 'wb') as f:
+            f.write(content)
+        
+        response = self.client.get('/get_file/cv_adapte_test.pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, content)
+        self.assertEqual(response.headers['ETag'], f'"{hashlib.sha256(content).hexdigest()}"')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        
+        # Un nouveau téléchargement du même fichier ne renvoie pas le contenu
+        response = self.client.get('/get_file/cv_adapte_test.pdf', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        
+        # Reprise d'un téléchargement interrompu
+        response = self.client.get('/get_file/cv_adapte_test.pdf', headers={'Range': 'bytes=990-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, content[990:])
+        
+        self.assertEqual(self.client.get('/get_file/absent.pdf').status_code, 404)
+
+    def test_metrics_endpoint(self):
+        """Test de l'exposition des métriques et des statistiques"""
+        buffer = BytesIO()
+        document = Document()
+        # Contenu unique : ni le cache des CV analysés ni les CV adaptés réutilisables ne court-circuitent les étapes
+        document.add_paragraph(f"Développeur Python {time.time_ns()}")
+        document.save(buffer)
+        processed = metrics.FILES_PROCESSED.value(file_type='docx')
+        stages = {stage: metrics.STAGE_DURATION.count(stage=stage, file_type='docx')
+                  for stage in ('parse', 'highlight', 'write')}
+        paragraphs = metrics.PARAGRAPHS_PROCESSED.value(file_type='docx')
+
+        response = self.client.post('/api/adapt', data={
+            'cv_file': (BytesIO(buffer.getvalue()), 'cv.docx'),
+            'job_description': 'Python Python'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Response-Time-Ms', response.headers)
+        self.assertEqual(metrics.FILES_PROCESSED.value(file_type='docx'), processed + 1)
+        # Étapes mesurées dans le processus isolé, enregistrées dans le processus qui sert /metrics
+        for stage, count in stages.items():
+            self.assertGreater(metrics.STAGE_DURATION.count(stage=stage, file_type='docx'), count)
+        self.assertGreater(metrics.PARAGRAPHS_PROCESSED.value(file_type='docx'), paragraphs)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        body = response.get_data(as_text=True)
+        for stage in ('parse', 'highlight', 'write'):
+            self.assertIn(f'cv_analyzer_stage_duration_seconds_count{{stage="{stage}",file_type="docx"}}', body)
+        self.assertIn('cv_analyzer_http_request_duration_seconds_bucket{method="POST",endpoint="api_adapt"', body)
+        self.assertIn('cv_analyzer_jobs{status="queued"}', body)
+
+        stats = self.client.get('/stats').get_json()
+        self.assertGreater(stats["uptime_seconds"], 0)
+        self.assertGreaterEqual(stats["files_processed"]["docx"], 1)
+        
+        # Registres partagés (un par worker gunicorn) : la collecte d'un worker additionne ceux des autres
+        shared_dir = os.path.join(self.temp_dir, "metrics")
+        workers = []
+        for files in (2, 3):
+            registry = metrics.MetricsRegistry()
+            registry.counter("test_files_total", "Fichiers", ("file_type",)).inc(files, file_type="pdf")
+            registry.histogram("test_duration_seconds", "Durée").observe(0.2)
+            registry.gauge("test_uptime_seconds", "Disponibilité").set(files)
+            registry.share(shared_dir, interval=3600)
+            workers.append(registry)
+        body = workers[0].render()
+        self.assertIn('test_files_total{file_type="pdf"} 5', body)
+        self.assertIn('test_duration_seconds_count 2', body)
+        self.assertIn('test_uptime_seconds 2', body)
+        # Valeurs enregistrées depuis : publiées au plus tard à la collecte suivante du worker qui les porte
+        workers[1]._metrics["test_files_total"].inc(file_type="pdf")
+        self.assertIn('test_files_total{file_type="pdf"} 6', workers[1].render())
+        self.assertIn('test_files_total{file_type="pdf"} 6', workers[0].render())
+        metrics.clear_shared(shared_dir)
+        self.assertIn('test_files_total{file_type="pdf"} 2', workers[0].render())
+
+    def test_adapt_pdf_highlights_real_positions(self):
+        """Test de la mise en évidence des mots-clés dans un PDF"""
+        processor = CVProcessor(self.upload_dir, self.download_dir)
+        
+        cv_path = os.path.join(self.upload_dir, "cv.pdf")
+        pdf = canvas.Canvas(cv_path)
+        pdf.setFont("Helvetica", 12)
+        pdf.drawString(100, 700, "Développeur Python")
+        pdf.showPage()
+        pdf.showPage()  # Page sans texte extractible
+        pdf.drawString(100, 700, "Loisirs : randonnée")
+        pdf.showPage()
+        pdf.save()
+        
+        result = processor.adapt_cv(cv_path, "Python Python")
+        
+        self.assertEqual(result["stats"]["highlighted_keywords"], 1)
+        self.assertEqual(result["stats"]["pages_modified"], 1)
+        adapted = PyPDF2.PdfReader(os.path.join(self.download_dir, result["filename"]))
+        self.assertEqual(len(adapted.pages), 3)
+        contents = [b"".join(part.get_object().get_data() for part in page["/Contents"])
+                    if isinstance(page["/Contents"], list) else page["/Contents"].get_data()
+                    for page in adapted.pages]
+        self.assertIn(b"/CVAnalyzerHighlight gs", contents[0])
+        self.assertNotIn(b"/CVAnalyzerHighlight", contents[2])
+        self.assertIn("Développeur Python", adapted.pages[0].extract_text())
+        
+        # Le rectangle de surlignage est placé sur le mot-clé
+        highlighter = PdfHighlighter(KeywordMatcher(["python"]))
+        count, boxes = highlighter.find_boxes(highlighter.extract_layout(PyPDF2.PdfReader(cv_path).pages[0]))
+        self.assertEqual(count, 1)
+        x, y, width, height = boxes[0]
+        self.assertAlmostEqual(x, 100 + stringWidth("Développeur ", "Helvetica", 12), places=2)
+        self.assertAlmostEqual(width, stringWidth("Python", "Helvetica", 12), places=2)
+
+    def test_pdf_pages_processed_in_parallel(self):
+        """Test du traitement des pages PDF réparti sur un pool de processus, réassemblé dans l'ordre"""
+        data = generate_pdf_cv(pages=5, lines_per_page=20, keyword_density=0.3, seed=7)
+        matcher = KeywordMatcher(["python", "docker", "sql"])
+        serial = PdfHighlighter(matcher, parallel_min_pages=0)
+        parallel = PdfHighlighter(matcher, pages_per_chunk=2, parallel_min_pages=2)
+        cv_path = os.path.join(self.upload_dir, "cv.pdf")
+        with open(cv_path, "wb") as f:
+            f.write(data)
+
+        # Pool forcé à deux processus, quel que soit le nombre de cœurs de la machine de test
+        previous = os.environ.get('PDF_PAGE_WORKERS')
+        os.environ['PDF_PAGE_WORKERS'] = '2'
+        try:
+            serial_output, parallel_output = BytesIO(), BytesIO()
+            serial_stats = serial.highlight(BytesIO(data), serial_output)
+            self.assertEqual(parallel.highlight(BytesIO(data), parallel_output), serial_stats)
+            self.assertGreater(serial_stats["highlighted_keywords"], 0)
+            self.assertEqual(parallel_output.getvalue(), serial_output.getvalue())
+            self.assertEqual(parallel.parse(cv_path), serial.parse(cv_path))
+
+            # Un refus levé dans un processus du pool conserve son motif
+            with self.assertRaises(DocumentRejectedError) as context:
+                PdfHighlighter(matcher, max_page_text=10, pages_per_chunk=2, parallel_min_pages=2).parse(cv_path)
+            self.assertEqual(context.exception.reason, "page_text")
+            
+            # Configuration par défaut (processus isolés) : les pages restent réparties,
+            # chaque processus de pages sous le budget mémoire du processus isolé
+            sandbox = SandboxPool()
+            try:
+                processor = CVProcessor(self.upload_dir, self.download_dir, sandbox=sandbox)
+                long_cv = generate_pdf_cv(pages=12, lines_per_page=20, keyword_density=0.3, seed=7)
+                result = processor.adapt_document(BytesIO(long_cv), '.pdf', generate_job_description(words=200, keyword_density=0.3, seed=7))
+                self.assertGreater(result["stats"]["highlighted_keywords"], 0)
+                worker = sandbox._idle[0].process.pid
+                page_processes = []
+                for entry in os.listdir('/proc'):
+                    if not entry.isdigit():
+                        continue
+                    try:
+                        with open(f'/proc/{entry}/stat') as f:
+                            ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                        with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                            cmdline = f.read()
+                        with open(f'/proc/{entry}/limits') as f:
+                            limits = f.read()
+                    except OSError:
+                        continue
+                    if ppid == worker and b'resource_tracker' not in cmdline:
+                        page_processes.append(int(entry))
+                        self.assertIn(str(1024 * 1024 * 1024), limits)
+                self.assertGreater(len(page_processes), 1)
+            finally:
+                sandbox.shutdown()
+            # Les processus de pages sont arrêtés avec le processus isolé
+            def running(pid):
+                try:
+                    with open(f'/proc/{pid}/stat') as f:
+                        return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+                except FileNotFoundError:
+                    return False
+            deadline = time.time() + 5
+            while any(running(pid) for pid in page_processes) and time.time() < deadline:
+                time.sleep(0.1)
+            self.assertFalse([pid for pid in page_processes if running(pid)])
+        finally:
+            if previous is None:
+                os.environ.pop('PDF_PAGE_WORKERS')
+            else:
+                os.environ['PDF_PAGE_WORKERS'] = previous
+
+    def test_pdf_output_optimization(self):
+        """Test de l'optimisation du PDF produit : objets fusionnés, flux compressés, ressources inutilisées retirées"""
+        # PDF assemblé à partir de pages produites séparément : chacune apporte ses propres polices
+        writer = PyPDF2.PdfWriter()
+        for number in range(4):
+            buffer = BytesIO()
+            can = canvas.Canvas(buffer, pageCompression=0)
+            can.setFont("Times-Roman", 12)
+            can.drawString(100, 700, f"Page {number} Développeur Python")
+            can.setFont("Courier", 10)
+            can.drawString(100, 650, "Docker")
+            can.save()
+            writer.add_page(PyPDF2.PdfReader(buffer).pages[0])
+        # En-tête dessiné par un formulaire (Form XObject) : sa police n'est nommée que par le formulaire
+        buffer = BytesIO()
+        can = canvas.Canvas(buffer, pageCompression=0)
+        can.beginForm("entete")
+        can.setFont("Helvetica-Bold", 14)
+        can.drawString(100, 750, "En-tête du CV")
+        can.endForm()
+        can.doForm("entete")
+        can.setFont("Times-Roman", 12)
+        can.drawString(100, 700, "Développeur Python")
+        can.save()
+        writer.add_page(PyPDF2.PdfReader(buffer).pages[0])
+        # Police déclarée mais jamais utilisée par le contenu de la première page
+        fonts = writer.pages[0]["/Resources"]["/Font"].get_object()
+        fonts[PyPDF2.generic.NameObject("/Inutilisee")] = fonts[list(fonts)[0]]
+        source = BytesIO()
+        writer.write(source)
+
+        matcher = KeywordMatcher(["python"])
+        plain, optimized = BytesIO(), BytesIO()
+        plain_stats = PdfHighlighter(matcher, parallel_min_pages=0, optimize=()).highlight(BytesIO(source.getvalue()), plain)
+        stats = PdfHighlighter(matcher, parallel_min_pages=0, measure_optimization=True).highlight(
+            BytesIO(source.getvalue()), optimized)
+        # Sans mesure demandée, le document n'est écrit qu'une fois et sa taille d'origine est estimée
+        default_stats = PdfHighlighter(matcher, parallel_min_pages=0).highlight(BytesIO(source.getvalue()), BytesIO())
+        self.assertEqual(default_stats["size_after_bytes"], stats["size_after_bytes"])
+        self.assertAlmostEqual(default_stats["size_before_bytes"], stats["size_before_bytes"],
+                               delta=0.02 * stats["size_before_bytes"])
+
+        self.assertNotIn("optimization", plain_stats)
+        self.assertEqual(plain_stats["size_before_bytes"], plain_stats["size_after_bytes"])
+        self.assertEqual(stats["size_before_bytes"], len(plain.getvalue()))
+        self.assertEqual(stats["size_after_bytes"], len(optimized.getvalue()))
+        self.assertLess(stats["size_after_bytes"], stats["size_before_bytes"])
+        self.assertGreater(stats["optimization"]["objects_merged"], 0)
+        self.assertGreaterEqual(stats["optimization"]["streams_compressed"], 4)
+        self.assertEqual(stats["optimization"]["resources_removed"], 1)
+        self.assertEqual(stats["highlighted_keywords"], plain_stats["highlighted_keywords"])
+
+        # Le document optimisé reste lisible, avec le même texte et le même surlignage
+        original = PyPDF2.PdfReader(plain)
+        result = PyPDF2.PdfReader(optimized, strict=True)
+        self.assertEqual([page.extract_text() for page in result.pages], [page.extract_text() for page in original.pages])
+        self.assertIn("En-tête du CV", result.pages[4].extract_text())
+        self.assertNotIn("/Inutilisee", result.pages[0]["/Resources"]["/Font"])
+        self.assertIn(b"/CVAnalyzerHighlight gs", b"".join(part.get_object().get_data() for part in result.pages[3]["/Contents"]))
+
+    def test_adapt_cv_reuses_content_addressed_artifact(self):
+        """Test de la réutilisation d'un CV déjà adapté à la même offre"""
+        storage = StorageManager(base_path=self.temp_dir)
+        processor = CVProcessor(str(storage.get_upload_path()), str(storage.get_download_path()), storage=storage)
+        
+        cv_path = os.path.join(self.upload_dir, "cv.docx")
+        document = Document()
+        document.add_paragraph("Développeur Python")
+        document.save(cv_path)
+        
+        first = processor.adapt_cv(cv_path, "Python Python")
+        second = processor.adapt_cv(cv_path, "Python Python\r\n")
+        other = processor.adapt_cv(cv_path, "Flask Flask")
+        
+        self.assertFalse(first["reused"])
+        self.assertTrue(second["reused"])
+        self.assertEqual(second["filename"], first["filename"])
+        self.assertEqual(second["stats"], first["stats"])
+        self.assertNotEqual(other["filename"], first["filename"])
+        
+        # Chaque réutilisation prolonge la durée de vie ; l'artefact est supprimé une fois expiré
+        key = processor._artifact_key(cv_path, '.docx', "Python Python")
+        conn = storage._index_connection()
+        with conn:
+            conn.execute("UPDATE artifacts SET expires_at = 0 WHERE key = ?", (key,))
+        self.assertIsNone(storage.acquire_artifact(key))
+        storage.cleanup_old_files(max_age_hours=24)
+        self.assertFalse(storage.get_download_file_path(first["filename"]).exists())
+        self.assertTrue(storage.get_download_file_path(other["filename"]).exists())
+        self.assertFalse(processor.adapt_cv(cv_path, "Python Python")["reused"])
+    
+    def test_benchmark_corpus_and_regressions(self):
+        """Test du corpus synthétique et de la détection des régressions"""
+        docx_data = generate_docx_cv(pages=2, paragraphs=10, tables=1, seed=1)
+        self.assertEqual(len(Document(BytesIO(docx_data)).tables), 1)
+        pdf_data = generate_pdf_cv(pages=3, lines_per_page=5, seed=1)
+        self.assertEqual(len(PyPDF2.PdfReader(BytesIO(pdf_data)).pages), 3)
+        self.assertEqual(generate_job_description(seed=2), generate_job_description(seed=2))
+        
+        baselines = {"docx_small": {"highlighting": {"seconds": 0.1, "peak_kb": 1000}}}
+        stable = {"docx_small": {"highlighting": {"seconds": 0.12, "peak_kb": 1100}}}
+        slower = {"docx_small": {"highlighting": {"seconds": 0.3, "peak_kb": 1100}}}
+        self.assertEqual(compare(stable, baselines), [])
+        self.assertEqual(len(compare(slower, baselines)), 1)
+        # Machine trois fois plus lente que celle des références (voir calibrate) : pas de régression
+        self.assertEqual(compare(slower, baselines, speed=3), [])
+        self.assertGreater(calibrate(repeat=1), 0)
+        with open(BASELINES_PATH, encoding='utf-8') as f:
+            recorded = json.load(f)
+        self.assertGreater(recorded["calibration_seconds"], 0)
+        for stage in ("parsing", "highlighting", "saving"):
+            self.assertIn("peak_kb", recorded["scenarios"]["pdf_large"][stage])
+    
     def test_error_pages(self):
         """Test des pages d'erreur"""
         # Test de la page 404
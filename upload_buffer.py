@@ -0,0 +1,139 @@
+import os
+import shutil
+import hashlib
+import tempfile
+
+# Signatures (magic bytes) attendues pour chaque format accepté
+MAGIC_BYTES = {
+    '.docx': (b'PK\x03\x04',),
+    '.pdf': (b'%PDF-',)
+}
+
+# Le standard PDF tolère des octets parasites avant l'en-tête dans le premier Ko
+PDF_HEADER_WINDOW = 1024
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadRejectedError(ValueError):
+    """
+    Levée lorsqu'un fichier téléchargé est trop volumineux ou ne correspond pas à son format.
+    """
+
+
+class SpooledUpload:
+    """
+    Tampon de téléchargement borné, haché et validé au fil de la réception.
+
+    Le contenu reste en mémoire jusqu'à spool_size octets puis bascule dans un
+    fichier temporaire local ; l'écriture sur le stockage persistant n'est
+    qu'une étape optionnelle (save).
+    """
+
+    def __init__(self, stream, filename, max_size, spool_size=1024 * 1024):
+        """
+        Lit et valide un flux téléchargé.
+
+        Args:
+            stream: Flux binaire à lire
+            filename (str): Nom du fichier d'origine (détermine le format attendu)
+            max_size (int): Taille maximale acceptée en octets
+            spool_size (int): Taille au-delà de laquelle le tampon bascule sur disque local
+
+        Raises:
+            UploadRejectedError: Si le fichier est trop volumineux ou de format invalide
+        """
+        self.filename = filename
+        self.extension = os.path.splitext(filename)[1].lower()
+        if self.extension not in MAGIC_BYTES:
+            raise UploadRejectedError(f"Format de fichier non autorisé: {filename}")
+
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        self.size = 0
+        digest = hashlib.sha256()
+        header = b''
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.size += len(chunk)
+                if self.size > max_size:
+                    raise UploadRejectedError(f"Fichier trop volumineux (limite: {max_size} octets)")
+                if len(header) < PDF_HEADER_WINDOW:
+                    header += chunk[:PDF_HEADER_WINDOW - len(header)]
+                    # La signature est vérifiée dès que l'en-tête est disponible
+                    if len(header) >= PDF_HEADER_WINDOW:
+                        self._check_magic(header)
+                digest.update(chunk)
+                self.file.write(chunk)
+            if len(header) < PDF_HEADER_WINDOW:
+                self._check_magic(header)
+        except Exception:
+            self.file.close()
+            raise
+
+        self.sha256 = digest.hexdigest()
+        self.file.seek(0)
+
+    @classmethod
+    def from_file_storage(cls, file_storage, max_size, spool_size=1024 * 1024):
+        """
+        Construit le tampon à partir d'un fichier de requête Werkzeug.
+
+        Args:
+            file_storage (FileStorage): Fichier de la requête
+            max_size (int): Taille maximale acceptée en octets
+            spool_size (int): Taille au-delà de laquelle le tampon bascule sur disque local
+
+        Returns:
+            SpooledUpload: Tampon validé
+        """
+        return cls(file_storage.stream, file_storage.filename, max_size, spool_size)
+
+    def _check_magic(self, header):
+        """
+        Vérifie que l'en-tête correspond au format annoncé par l'extension.
+        """
+        if self.extension == '.pdf':
+            valid = any(magic in header[:PDF_HEADER_WINDOW] for magic in MAGIC_BYTES['.pdf'])
+        else:
+            valid = header.startswith(MAGIC_BYTES[self.extension])
+        if not valid:
+            raise UploadRejectedError(f"Le contenu du fichier ne correspond pas au format {self.extension}")
+
+    def save(self, path):
+        """
+        Étape de persistance optionnelle : écrit le contenu sur disque.
+
+        Args:
+            path (str): Chemin de destination
+        """
+        self.file.seek(0)
+        with open(path, 'wb') as target:
+            shutil.copyfileobj(self.file, target, CHUNK_SIZE)
+        self.file.seek(0)
+
+    def getvalue(self):
+        """
+        Retourne le contenu complet du tampon.
+
+        Returns:
+            bytes: Contenu du fichier
+        """
+        self.file.seek(0)
+        data = self.file.read()
+        self.file.seek(0)
+        return data
+
+    def close(self):
+        """
+        Libère le tampon.
+        """
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()